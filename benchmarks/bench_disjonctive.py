@@ -0,0 +1,79 @@
+"""
+Compares the runtime of "OR" requests between the score accumulator of 'InvertedFile.request_words_disjonctive'
+and the previous implementation, which scanned the list of results for each posting.
+It needs an on-disk IF generated by 'src/main_build_and_save_if.py'.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import utilities  # noqa: E402
+import voc  # noqa: E402
+from doc_parser import pre_work_word  # noqa: E402
+from global_values import DEFAULT_PL_FILE, DEFAULT_REGISTER_FILE, DEFAULT_VOC_FILE  # noqa: E402
+from inverted_file import InvertedFile, RequestResult  # noqa: E402
+
+DEFAULT_REQUESTS = ["said", "zayak", "said will one two also", "zayak mbonu 5835 pfingst aaron's"]
+
+
+def request_words_disjonctive_linear_scan(inverted_file: InvertedFile, words: List[str]) -> List[RequestResult]:
+    """
+    Previous implementation of 'InvertedFile.request_words_disjonctive', kept as a reference.
+    """
+    request = list(set(pre_work_word(word) for word in words))
+    results: List[RequestResult] = []
+    for word_to_test in request:
+        if word_to_test in inverted_file.voc:
+            pl_infos = inverted_file.voc[word_to_test]
+            for pl_entry in inverted_file.pl.get_pl(pl_id=pl_infos.pl_id, size=pl_infos.pl_size):
+                document = inverted_file.register[pl_entry.docID]
+                for item in results:
+                    if item.doc == document:
+                        item.score += pl_entry.score
+                        break
+                else:
+                    results.append(RequestResult(doc=document, score=pl_entry.score))
+    results.sort(key=lambda req_res: req_res.score, reverse=True)
+    return results
+
+
+def time_request(function, inverted_file: InvertedFile, words: List[str], repeat: int) -> float:
+    """
+    Returns the best runtime in milliseconds of 'repeat' runs of the request.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = utilities.timepoint()
+        function(inverted_file, words)
+        best = min(best, utilities.timepoint() - start)
+    return 1000 * best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--request", "-r", help="Request to benchmark, can be repeated", type=str, action="append")
+    parser.add_argument("--repeat", help="Number of runs of each request", type=int, default=5)
+    parser.add_argument("--voc", help="Filename of the VOC", type=str, default=DEFAULT_VOC_FILE)
+    parser.add_argument("--pl", help="Filename of the PL", type=str, default=DEFAULT_PL_FILE)
+    parser.add_argument("--reg", help="Filename of the Doc Register", type=str, default=DEFAULT_REGISTER_FILE)
+    parser.add_argument("--voc_type", help="Type of the VOC to instantiate", type=str, default="VOC_Hashmap")
+    args = parser.parse_args()
+
+    voc_type: type = eval(f"voc.{args.voc_type}")
+    inverted_file = InvertedFile.read_from_files(args.voc, args.pl, args.reg, voc_type)
+
+    print("request,nb_results,accumulator_ms,linear_scan_ms")
+    for request in args.request or DEFAULT_REQUESTS:
+        words = utilities.convert_str_to_tokens(request)
+        nb_results = len(inverted_file.request_words_disjonctive(words))
+        new_runtime = time_request(InvertedFile.request_words_disjonctive, inverted_file, words, args.repeat)
+        old_runtime = time_request(request_words_disjonctive_linear_scan, inverted_file, words, args.repeat)
+        print(f"\"{request}\",{nb_results},{new_runtime:.3f},{old_runtime:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Builds the IF with each normalizer of 'doc_parser.NORMALIZERS' and compares
+the number of terms and postings, the sizes of the VOC and PL files, and the build throughput.
+"""
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import utilities  # noqa: E402
+from doc_parser import NORMALIZERS  # noqa: E402
+from main import build_if  # noqa: E402
+from pl import PL_PythonLists  # noqa: E402
+from voc import VOC_Hashmap  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nbfiles", "-n", help="Number of files to read", default=5, type=int)
+    args = parser.parse_args()
+
+    files = utilities.make_list_of_files(nbr=args.nbfiles)
+    print("normalizer,terms,postings,voc_bytes,pl_bytes,build_seconds,docs_per_second")
+    with tempfile.TemporaryDirectory() as folder:
+        for normalizer in NORMALIZERS:
+            start = utilities.timepoint()
+            inverted_file = build_if(
+                VOC_Hashmap(), PL_PythonLists(), nbr_files=len(files), random_files=False, files=files,
+                normalizer=normalizer)
+            build_time = utilities.timepoint() - start
+
+            voc_file, pl_file, register_file = (str(Path(folder) / name) for name in ("voc.bin", "pl.bin", "reg.bin"))
+            inverted_file.write_to_files(voc_file, pl_file, register_file)
+            nb_terms = sum(1 for _ in inverted_file.voc.iterate())
+            nb_postings = sum(voc_entry.pl_size for voc_entry in inverted_file.voc.iterate())
+            nb_docs = len(inverted_file.register)
+            print(f"{normalizer},{nb_terms},{nb_postings},{Path(voc_file).stat().st_size},"
+                  f"{Path(pl_file).stat().st_size},{build_time:.3f},{nb_docs / build_time:.0f}")
+            inverted_file.pl.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compares the runtime of "OR" requests without cache of decoded PLs, with a LRU cache and with a TinyLFU cache.
+The requests follow a skewed mix: most of them are drawn from a few popular requests (Zipf distribution),
+the others are one-off requests on random terms, that a LRU cache keeps at the expense of the popular ones.
+It needs an on-disk IF generated by 'src/main_build_and_save_if.py'.
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import utilities  # noqa: E402
+import voc  # noqa: E402
+from global_values import DEFAULT_PL_FILE, DEFAULT_REGISTER_FILE, DEFAULT_VOC_FILE  # noqa: E402
+from inverted_file import InvertedFile  # noqa: E402
+from pl_cache import PL_Cached  # noqa: E402
+
+
+def generate_requests(terms: List[str], count: int, nb_popular: int, one_off_ratio: float, seed: int) -> List[str]:
+    """
+    Popular requests are made of terms with long PLs, their popularity follows a Zipf distribution.
+    """
+    rng = random.Random(seed)
+    popular = [" ".join(rng.sample(terms[:10 * nb_popular], 3)) for _ in range(nb_popular)]
+    weights = [1 / rank for rank in range(1, nb_popular + 1)]
+    requests = []
+    for _ in range(count):
+        if rng.random() < one_off_ratio:
+            requests.append(" ".join(rng.sample(terms, 3)))
+        else:
+            requests.append(rng.choices(popular, weights)[0])
+    return requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", "-n", help="Number of requests", type=int, default=2000)
+    parser.add_argument("--popular", help="Number of distinct popular requests", type=int, default=50)
+    parser.add_argument("--one_off", help="Ratio of one-off requests", type=float, default=0.3)
+    parser.add_argument("--seed", help="Seed of the random mix of requests", type=int, default=0)
+    parser.add_argument(
+        "--memory", help="Maximal memory of the PL cache (ex: 1M)", type=utilities.parse_size, default="1M")
+    parser.add_argument("--voc", help="Filename of the VOC", type=str, default=DEFAULT_VOC_FILE)
+    parser.add_argument("--pl", help="Filename of the PL", type=str, default=DEFAULT_PL_FILE)
+    parser.add_argument("--reg", help="Filename of the Doc Register", type=str, default=DEFAULT_REGISTER_FILE)
+    parser.add_argument("--voc_type", help="Type of the VOC to instantiate", type=str, default="VOC_Hashmap")
+    args = parser.parse_args()
+
+    voc_type: type = eval(f"voc.{args.voc_type}")
+    inverted_file = InvertedFile.read_from_files(args.voc, args.pl, args.reg, voc_type)
+    terms = [term for term, _ in sorted(inverted_file.voc.iterate2(), key=lambda item: -item[1].pl_size)]
+    requests = [
+        utilities.convert_str_to_tokens(request)
+        for request in generate_requests(terms, args.count, args.popular, args.one_off, args.seed)]
+
+    uncached_pl = inverted_file.pl
+    print("cache,mean_ms,p50_ms,p99_ms,hit_ratio")
+    for policy in (None, "lru", "tinylfu"):
+        inverted_file.pl = PL_Cached(uncached_pl, args.memory, policy) if policy else uncached_pl
+        latencies = []
+        for words in requests:
+            start = utilities.timepoint()
+            inverted_file.request_words_disjonctive(words)
+            latencies.append(1000 * (utilities.timepoint() - start))
+
+        hit_ratio = ""
+        if policy:
+            stats = inverted_file.pl.stats()
+            hit_ratio = f"{stats['hits'] / max(1, stats['hits'] + stats['misses']):.3f}"
+        print(f"{policy or 'none'},{sum(latencies) / len(latencies):.3f},"
+              f"{utilities.percentile(latencies, 50):.3f},{utilities.percentile(latencies, 99):.3f},{hit_ratio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Benchmark suite, run in a single process on the files of the datasets folder:
+  - build: parsing throughput (docs/sec) for each VOC backend, then 'compute_scores';
+  - save and load: 'write_to_files' and 'read_from_files' for each VOC backend and PL format;
+  - requests: throughput of requests on terms of rare, medium and frequent PLs, for each VOC backend and PL format.
+    Each run of a request measure is one pass over all the requests of the class.
+Each measure is repeated after some warmup runs. Results are written as JSON or CSV.
+With --baseline, results are compared to a previous JSON output: measures whose fastest run is slower than the
+slowest runs (p95) of the baseline by more than the tolerance are reported as regressions, and the exit code is 1.
+Measures whose total time over all runs is shorter than --min_duration are mostly noise: they are reported but never
+count as regressions.
+"""
+
+import argparse
+import csv
+import json
+import random
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import utilities  # noqa: E402
+import voc  # noqa: E402
+from inverted_file import InvertedFile  # noqa: E402
+from main import parse_files  # noqa: E402
+from pl import PL_PythonLists  # noqa: E402
+
+VOC_TYPES = ["VOC_Hashmap", "VOC_FrontCoded", "VOC_BTree"]
+PL_FORMATS = ["raw", "compressed"]
+FREQUENCY_CLASSES = ["rare", "medium", "frequent"]
+TERMS_PER_CLASS = 20  # Number of terms whose requests are timed in each frequency class.
+
+
+def summarize(name: str, timings: List[float], args, items: int = None) -> Dict[str, Any]:
+    """
+    Statistics of the timings in seconds. If 'items' is given, the throughput in items per second is added.
+    """
+    summary = {
+        "name": name,
+        "runs": len(timings),
+        "warmup": args.warmup,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.mean(timings),
+        "stdev_s": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "p95_s": utilities.percentile(timings, 95),
+        "total_s": sum(timings),
+    }
+    if items is not None:
+        summary["per_second"] = items / summary["median_s"]
+    return summary
+
+
+def time_runs(function: Callable[[], Any], repeat: int, warmup: int) -> List[float]:
+    """
+    Runs the function 'warmup' times, then returns the runtimes in seconds of 'repeat' runs.
+    """
+    timings = []
+    for run in range(warmup + repeat):
+        start = utilities.timepoint()
+        function()
+        if run >= warmup:
+            timings.append(utilities.timepoint() - start)
+    return timings
+
+
+def frequency_classes(inverted_file: InvertedFile, seed: int) -> Dict[str, List[str]]:
+    """
+    Splits the terms in three classes of PL sizes: the lowest third, the middle third and the highest third.
+    Returns a sample of TERMS_PER_CLASS terms of each class.
+    """
+    terms = [term for term, _ in sorted(inverted_file.voc.iterate2(), key=lambda item: (item[1].pl_size, item[0]))]
+    rng = random.Random(seed)
+    classes = {}
+    for i, frequency_class in enumerate(FREQUENCY_CLASSES):
+        class_terms = terms[i * len(terms) // 3:(i + 1) * len(terms) // 3]
+        classes[frequency_class] = rng.sample(class_terms, min(TERMS_PER_CLASS, len(class_terms)))
+    return classes
+
+
+def index_files(folder: Path, voc_type: str, pl_format: str) -> List[str]:
+    return [str(folder / f"{voc_type}_{pl_format}.{extension}") for extension in ("voc", "pl", "reg")]
+
+
+def bench_build_and_save(args, files: List[str], folder: Path) -> List[Dict[str, Any]]:
+    results = []
+    for voc_type in VOC_TYPES:
+        parse_timings, scores_timings = [], []
+        save_timings: Dict[str, List[float]] = {pl_format: [] for pl_format in PL_FORMATS}
+        nb_docs = 0
+        for run in range(args.warmup + args.repeat):
+            inverted_file = InvertedFile(voc=eval(f"voc.{voc_type}()"), pl=PL_PythonLists())
+            start = utilities.timepoint()
+            parse_files(files, inverted_file)
+            parse_time = utilities.timepoint() - start
+            inverted_file.compute_scores()
+            scores_time = utilities.timepoint() - start - parse_time
+
+            # Once written, the PL is read from the file: it can be written again in another format.
+            for pl_format in PL_FORMATS:
+                start = utilities.timepoint()
+                inverted_file.write_to_files(*index_files(folder, voc_type, pl_format), pl_format=pl_format)
+                if run >= args.warmup:
+                    save_timings[pl_format].append(utilities.timepoint() - start)
+            inverted_file.pl.close()
+
+            if run >= args.warmup:
+                parse_timings.append(parse_time)
+                scores_timings.append(scores_time)
+            nb_docs = len(inverted_file.register)
+
+        results.append(summarize(f"build/{voc_type}", parse_timings, args, items=nb_docs))
+        results.append(summarize(f"compute_scores/{voc_type}", scores_timings, args))
+        for pl_format in PL_FORMATS:
+            results.append(summarize(f"save/{voc_type}/{pl_format}", save_timings[pl_format], args))
+    return results
+
+
+def bench_load_and_requests(args, folder: Path) -> List[Dict[str, Any]]:
+    results = []
+    for voc_type in VOC_TYPES:
+        for pl_format in PL_FORMATS:
+            files = index_files(folder, voc_type, pl_format)
+            load_timings = time_runs(
+                lambda: InvertedFile.read_from_files(*files, voc_type=eval(f"voc.{voc_type}")).pl.close(),
+                args.repeat, args.warmup)
+            results.append(summarize(f"load/{voc_type}/{pl_format}", load_timings, args))
+
+            inverted_file = InvertedFile.read_from_files(*files, voc_type=eval(f"voc.{voc_type}"))
+            for frequency_class, terms in frequency_classes(inverted_file, args.seed).items():
+                for kind, request in (
+                        ("or", lambda words: inverted_file.request_words_disjonctive(words)),
+                        ("or_top10", lambda words: inverted_file.request_words_disjonctive(words, k=10)),
+                        ("and", lambda words: inverted_file.request_words_conjonctive(words))):
+                    # Single-term requests for "or", requests on pairs of terms of the class otherwise.
+                    requests = [[term] for term in terms] if kind == "or" else [
+                        [term, terms[(i + 1) % len(terms)]] for i, term in enumerate(terms)]
+                    timings = time_runs(
+                        lambda: [request(words) for words in requests], args.repeat, args.warmup)
+                    results.append(summarize(f"request/{voc_type}/{pl_format}/{frequency_class}/{kind}", timings,
+                                             args, items=len(requests)))
+            inverted_file.pl.close()
+    return results
+
+
+def compare_to_baseline(
+        results: List[Dict[str, Any]], baseline_file: str, tolerance: float, min_duration: float) -> List[str]:
+    """
+    Prints the ratio of the median times to the baseline ones. Returns the names of the regressions.
+    The spread of the runs is taken into account: a measure is a regression if its fastest run is slower than the
+    baseline p95 by more than the tolerance, and an improvement if its p95 is faster than the baseline fastest run.
+    Measures are compared only if their total time over all runs, or the baseline one, reaches 'min_duration'.
+    """
+    baseline = {result["name"]: result for result in json.loads(Path(baseline_file).read_text())["results"]}
+    regressions = []
+    print("name,baseline_median_s,median_s,ratio,status", file=sys.stderr)
+    for result in results:
+        if result["name"] not in baseline:
+            continue
+        base = baseline[result["name"]]
+        ratio = result["median_s"] / base["median_s"]
+        status = "ok"
+        # Baselines written before 'total_s' was added only have the median of the runs.
+        base_total_s = base.get("total_s", base["median_s"] * base["runs"])
+        if max(base_total_s, result["total_s"]) < min_duration:
+            status = "too_short"
+        elif result["min_s"] > base["p95_s"] * (1 + tolerance):
+            status = "REGRESSION"
+            regressions.append(result["name"])
+        elif base["min_s"] > result["p95_s"] * (1 + tolerance):
+            status = "improvement"
+        print(f"{result['name']},{base['median_s']:.6f},{result['median_s']:.6f},{ratio:.3f},{status}",
+              file=sys.stderr)
+    return regressions
+
+
+def write_results(results: List[Dict[str, Any]], config: Dict[str, Any], output: str, output_format: str) -> None:
+    f = sys.stdout if output == "-" else open(output, "w", newline="")
+    if output_format == "json":
+        json.dump({"config": config, "results": results}, f, indent=2)
+        f.write("\n")
+    else:
+        writer = csv.DictWriter(f, fieldnames=list(dict.fromkeys(key for result in results for key in result)))
+        writer.writeheader()
+        writer.writerows(results)
+    if f is not sys.stdout:
+        f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nbfiles", "-n", help="Number of files to read", default=5, type=int)
+    parser.add_argument("--repeat", help="Number of timed runs of each measure", type=int, default=5)
+    parser.add_argument("--warmup", help="Number of runs before the timed ones", type=int, default=1)
+    parser.add_argument("--seed", help="Seed of the choice of the terms of the requests", type=int, default=0)
+    parser.add_argument("--output", "-o", help="File of the results ('-' for stdout)", type=str, default="-")
+    parser.add_argument("--format", help="Format of the results", type=str, default="json", choices=["json", "csv"])
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with", type=str)
+    parser.add_argument(
+        "--tolerance", help="Relative slowdown beyond the spread of the runs reported as a regression (runs in "
+                            "different processes often differ by more than 10%%)", type=float, default=0.25)
+    parser.add_argument(
+        "--min_duration", help="Total time in seconds of the runs of a measure below which it is not compared",
+        type=float, default=0.1)
+    args = parser.parse_args()
+
+    files = utilities.make_list_of_files(nbr=args.nbfiles)
+    config = {"files": len(files), "repeat": args.repeat, "warmup": args.warmup, "seed": args.seed}
+    with tempfile.TemporaryDirectory() as folder:
+        results = bench_build_and_save(args, files, Path(folder))
+        results += bench_load_and_requests(args, Path(folder))
+    write_results(results, config, args.output, args.format)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance, args.min_duration)
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares the throughput in tokens per second of 'doc_parser.count_terms'
+and of the previous tokenization of 'parse_document' ('pre_work_word' on each word, then 'words.count').
+Both must give the same terms, with the same numbers of occurences in the same order.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import utilities  # noqa: E402
+from doc_parser import count_terms, pre_work_word, read_documents  # noqa: E402
+
+
+def count_terms_word_by_word(text: str) -> Dict[str, int]:
+    """
+    Previous tokenization of 'parse_document', kept as a reference.
+    """
+    words: List[str] = []
+    for word in text.split():
+        word_to_add = pre_work_word(word)
+        if word_to_add:
+            words.append(word_to_add)
+    return {word: words.count(word) for word in words}
+
+
+def time_tokenizer(function, texts: List[str], repeat: int) -> float:
+    """
+    Returns the best runtime in seconds of 'repeat' runs of the function on all texts.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = utilities.timepoint()
+        for text in texts:
+            function(text)
+        best = min(best, utilities.timepoint() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nbfiles", "-n", help="Number of files to read", default=5, type=int)
+    parser.add_argument("--repeat", help="Number of runs of each tokenizer", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = [text for file in utilities.make_list_of_files(nbr=args.nbfiles)
+             for _, text in read_documents(file)]
+    nb_tokens = sum(len(text.split()) for text in texts)
+
+    for text in texts:
+        if list(count_terms(text).items()) != list(count_terms_word_by_word(text).items()):
+            raise RuntimeError("the tokenizers give different terms")
+
+    print("tokenizer,tokens,seconds,tokens_per_second")
+    for name, function in (("count_terms", count_terms), ("word_by_word", count_terms_word_by_word)):
+        runtime = time_tokenizer(function, texts, args.repeat)
+        print(f"{name},{nb_tokens},{runtime:.3f},{nb_tokens / runtime:.0f}")
+
+
+if __name__ == "__main__":
+    main()
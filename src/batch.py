@@ -0,0 +1,140 @@
+"""
+Batch mode: runs many requests on an on-disk IF and yields their results in the order of the requests.
+The terms of all requests are looked up once in the VOC and their PLs are read once, before running any request:
+requests then only use these PLs.
+Requests are split in consecutive chunks, run by a pool of processes. Processes forked from the parent share the
+PLs it read, and map the same files: the OS shares their pages.
+"""
+
+import copy
+from functools import partial
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, List, Tuple
+
+import utilities
+import voc
+from instrumentation import timer
+from inverted_file import InvertedFile
+from pl_cache import PL_Cached
+from voc import VOC_Hashmap
+
+CHUNK_SIZE = 64  # Number of requests sent at once to a process.
+
+_worker_inverted_file: InvertedFile = None  # IF of the batch, in the parent and in each process of the pool.
+_reported_pl_reads = 0  # Number of PL reads of the process already reported.
+
+
+def _open_inverted_file(
+        voc_file: str, pl_file: str, registry_file: str, voc_type_name: str, requests: List[List[str]],
+        max_memory: int) -> None:
+    """
+    Opens the IF and reads the PLs of the terms of all requests.
+    Processes forked after the parent opened it keep its IF, so they read nothing.
+    """
+    global _worker_inverted_file
+    if _worker_inverted_file is not None:
+        return
+    voc_type: type = eval(f"voc.{voc_type_name}")
+    inverted_file = InvertedFile.read_from_files(voc_file, pl_file, registry_file, voc_type)
+    with timer("request/batch_prefetch"):
+        _worker_inverted_file = _batch_inverted_file(inverted_file, requests, max_memory)
+
+
+def _batch_inverted_file(inverted_file: InvertedFile, requests: List[List[str]], max_memory: int) -> InvertedFile:
+    """
+    Returns a copy of the IF whose VOC only has the terms of the requests and whose PLs are read once.
+    """
+    batch_voc = VOC_Hashmap()
+    batch_pl = PL_Cached(inverted_file.pl, max_memory, policy="lru")
+    for term in set(inverted_file.prepare_word(word) for words in requests for word in words):
+        if term and term in inverted_file.voc:
+            voc_entry = inverted_file.voc[term]
+            batch_voc.voc[term] = voc_entry
+            batch_pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size)
+
+    batch_inverted_file = copy.copy(inverted_file)
+    batch_inverted_file.voc = batch_voc
+    batch_inverted_file.pl = batch_pl
+    return batch_inverted_file
+
+
+def _new_pl_reads() -> int:
+    """
+    Returns the number of PLs read by the process since the last call: PLs that did not fit in the memory budget
+    are read again by the requests.
+    """
+    global _reported_pl_reads
+    pl_reads = _worker_inverted_file.pl.misses - _reported_pl_reads
+    _reported_pl_reads = _worker_inverted_file.pl.misses
+    return pl_reads
+
+
+def _run_chunk(
+        requests: List[List[str]], mode: str, k: int, slop: int
+) -> Tuple[List[Tuple[List[Dict[str, Any]], float]], int]:
+    """
+    Runs the requests on the IF of the process.
+    Returns the results and the runtime in milliseconds of each one, and the number of PLs read.
+    """
+    answers = []
+    for words in requests:
+        start = utilities.timepoint()
+        if mode == "phrase":
+            results = _worker_inverted_file.request_words_phrase(words, slop=slop, k=k)
+        elif mode == "conjonctive":
+            results = _worker_inverted_file.request_words_conjonctive(words, k=k)
+        elif mode == "disjonctive":
+            results = _worker_inverted_file.request_words_disjonctive(words, k=k)
+        else:
+            raise RuntimeError(f"wrong parameter for mode: {mode}")
+        runtime = utilities.timepoint() - start
+        answers.append((
+            [{"id": req_res.doc.id, "no": req_res.doc.no, "title": req_res.doc.title, "score": req_res.score}
+             for req_res in results],
+            1000 * runtime))
+    return answers, _new_pl_reads()
+
+
+def run_batch(
+        requests: List[str], voc_file: str, pl_file: str, registry_file: str, voc_type_name: str = "VOC_Hashmap",
+        mode: str = "disjonctive", k: int = None, slop: int = 0, workers: int = 1, max_memory: int = 256 * 1024 ** 2,
+        stats: Dict[str, int] = None
+) -> Iterable[Tuple[str, List[Dict[str, Any]], float]]:
+    """
+    Yields, for each request, the request, its results and its runtime in milliseconds.
+    The time spent reading the PLs of the batch is not part of the runtimes of the requests.
+    :param mode: "disjonctive", "conjonctive" or "phrase".
+    :param max_memory: memory budget of the PLs of the batch.
+    :param stats: if given, "pl_reads" is set to the number of PLs read so far, by all processes.
+    """
+    global _worker_inverted_file, _reported_pl_reads
+    if stats is None:
+        stats = {}
+    tokenized_requests = [InvertedFile.split_request(request, phrase=mode == "phrase") for request in requests]
+    chunks = [requests[i:i + CHUNK_SIZE] for i in range(0, len(requests), CHUNK_SIZE)]
+    tokenized_chunks = [tokenized_requests[i:i + CHUNK_SIZE] for i in range(0, len(requests), CHUNK_SIZE)]
+    run_chunk = partial(_run_chunk, mode=mode, k=k, slop=slop)
+    open_args = (voc_file, pl_file, registry_file, voc_type_name, tokenized_requests, max_memory)
+
+    _worker_inverted_file = None
+    _reported_pl_reads = 0
+    try:
+        _open_inverted_file(*open_args)
+        stats["pl_reads"] = _new_pl_reads()
+        if workers > 1:
+            # Only processes that are not forked need the initializer to open the IF.
+            with Pool(processes=workers, initializer=_open_inverted_file, initargs=open_args) as pool:
+                for chunk, (answers, pl_reads) in zip(chunks, pool.imap(run_chunk, tokenized_chunks)):
+                    stats["pl_reads"] += pl_reads
+                    for request, (results, runtime) in zip(chunk, answers):
+                        yield request, results, runtime
+        else:
+            for chunk, tokenized_chunk in zip(chunks, tokenized_chunks):
+                answers, pl_reads = run_chunk(tokenized_chunk)
+                stats["pl_reads"] += pl_reads
+                for request, (results, runtime) in zip(chunk, answers):
+                    yield request, results, runtime
+    finally:
+        if _worker_inverted_file is not None:
+            _worker_inverted_file.pl.close()
+            _worker_inverted_file = None
@@ -1,15 +1,30 @@
 import string
 from pathlib import Path
-from typing import List
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 from document import Document
 from xml.dom import minidom
+from xml.etree import ElementTree
 from global_values import PRINT_FILE_WHILE_PARSING
+import instrumentation
+from instrumentation import timer
+from stemmer import porter_stem
 from utilities import get_stop_words
 
 
 STOP_WORDS = get_stop_words()
 ALLOWED_CHARACTERS = string.ascii_lowercase + string.digits
+_ALLOWED_CHARACTERS_SET = frozenset(ALLOWED_CHARACTERS)
+READ_CHUNK_SIZE = 64 * 1024  # Bytes read at once by the streaming parser.
+NORMALIZER_CACHE_SIZE = 64 * 1024  # Number of distinct words whose normalized form is memorized.
+
+# Normalizations applied to the preprocessed words, memorized as most words appear many times.
+NORMALIZERS = {
+    "none": None,
+    "porter": lru_cache(maxsize=NORMALIZER_CACHE_SIZE)(porter_stem),
+}
 
 
 def pre_work_word(word: str) -> str:
@@ -39,11 +54,51 @@ def pre_work_word(word: str) -> str:
     return word
 
 
-def parse_document(filename: str, invf):
-    # https://docs.python.org/fr/3/library/xml.dom.html#module-xml.dom
-    if PRINT_FILE_WHILE_PARSING:
-        print(f"Parsing file '{filename}'")
+def get_normalizer(name: str) -> Optional[Callable[[str], str]]:
+    """
+    Returns the normalization of the given name (see NORMALIZERS), None if words are not normalized.
+    """
+    if name not in NORMALIZERS:
+        raise RuntimeError(f"wrong parameter for normalizer: {name}")
+    return NORMALIZERS[name]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Preprocesses all words of the text at once, with the same result as 'pre_work_word' on each of them
+    except for stop words, which are kept. Ignored words are kept as empty strings,
+    so that the index of a word in the list is its position in the text.
+    """
+    text = text.lower()
+    # Every character of the text that is not allowed is stripped, in a single call per word.
+    characters_to_strip = "".join(set(text) - _ALLOWED_CHARACTERS_SET)
+    return [word.strip(characters_to_strip) for word in text.split()]
 
+
+def count_terms(text: str, normalize: Callable[[str], str] = None) -> Counter:
+    """
+    Returns the number of occurences of each term of the text, in the order of their first occurence.
+    Terms are the words of the text preprocessed by 'pre_work_word', ignored words excluded,
+    then normalized by 'normalize' if given.
+    """
+    counts = Counter(tokenize(text))
+    for ignored_word in STOP_WORDS.intersection(counts) | {""}:
+        counts.pop(ignored_word, None)
+    if normalize is None:
+        return counts
+
+    normalized_counts = Counter()
+    for word, nbr in counts.items():
+        normalized_counts[normalize(word)] += nbr
+    return normalized_counts
+
+
+def _read_documents_minidom(filename: str) -> Iterable[Tuple[Document, str]]:
+    """
+    Builds the full DOM of the file, then yields pairs of <Document, text of its paragraphs>.
+    Kept to compare throughput and peak memory with the streaming parser.
+    """
+    # https://docs.python.org/fr/3/library/xml.dom.html#module-xml.dom
     with open(filename, "r") as f:
         document_text = f.read()
 
@@ -82,16 +137,99 @@ def parse_document(filename: str, invf):
                 text_paragraphs += paragraph_element.firstChild.data
         # document_instance.text = text_paragraphs
 
+        yield document_instance, text_paragraphs
+
+
+def _paragraphs_text(element: Optional[ElementTree.Element]) -> str:
+    """
+    Concatenates the leading text of the direct "P" children of the element, like the minidom parser does.
+    """
+    return "".join(child.text for child in element if child.tag == "P" and child.text)
+
+
+def _read_documents_streaming(filename: str) -> Iterable[Tuple[Document, str]]:
+    """
+    Reads the file by chunks and yields pairs of <Document, text of its paragraphs> as soon as a DOC is closed.
+    Each DOC element is discarded once yielded, so memory usage does not depend on the file size.
+    """
+    xml_parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root_element: Optional[ElementTree.Element] = None
+
+    with open(filename, "r") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if chunk:
+                # Line breaks are removed to get exactly the same text as the minidom parser.
+                xml_parser.feed(chunk.replace("\n", ""))
+            else:
+                xml_parser.close()
+
+            for event, element in xml_parser.read_events():
+                if event == "start":
+                    if root_element is None:
+                        root_element = element
+                    continue
+                if element.tag != "DOC":
+                    continue
+
+                document_instance = Document()
+                document_instance.id = int(element.find(".//DOCID").text.strip())
+                document_instance.no = element.find(".//DOCNO").text.strip()
+
+                headline_element = element.find(".//HEADLINE")
+                text_element = element.find(".//TEXT")
+                if headline_element is not None and text_element is not None:
+                    document_instance.title = _paragraphs_text(headline_element)
+                    yield document_instance, _paragraphs_text(text_element)
+
+                # Forget the DOC we just processed.
+                root_element.remove(element)
+
+            if not chunk:
+                break
+
+
+def read_documents(filename: str, parser: str = "stream") -> Iterable[Tuple[Document, str]]:
+    """
+    Yields pairs of <Document, text of its paragraphs> for each indexable DOC of the given file.
+    Documents without headline or without text are skipped.
+
+    :param parser: "stream" (incremental parsing, constant memory) or "minidom" (full DOM in memory).
+    """
+    if PRINT_FILE_WHILE_PARSING:
+        print(f"Parsing file '{filename}'")
+
+    if parser == "stream":
+        return _read_documents_streaming(filename)
+    elif parser == "minidom":
+        return _read_documents_minidom(filename)
+    else:
+        raise RuntimeError(f"wrong parameter for parser: {parser}")
+
+
+def parse_document(filename: str, invf, parser: str = "stream"):
+    normalize = get_normalizer(invf.normalizer)
+    documents = read_documents(filename, parser)
+    if instrumentation.ENABLED:
+        documents = instrumentation.timed_iterator("build/parse/xml", documents)
+    for document_instance, text_paragraphs in documents:
         # Send the document to the IF
         invf.register_document(document_instance)
 
         # For each word in the doc, send it to the IF
-        words: List[str] = []
-        for word in text_paragraphs.split():
-            word_to_add = pre_work_word(word)
-            if word_to_add:
-                words.append(word_to_add)
-
-        freq = {word: words.count(word) for word in words}
-        for word, nbr in freq.items():
-            invf.notify_word_appeared(word, document_instance.id, nbr)
+        if invf.positions is None:
+            with timer("build/parse/tokenize"):
+                terms = count_terms(text_paragraphs, normalize)
+            with timer("build/parse/index"):
+                for word, nbr in terms.items():
+                    invf.notify_word_appeared(word, document_instance.id, nbr)
+        else:
+            # Positions of each word among all words of the text.
+            positions: Dict[str, List[int]] = {}
+            with timer("build/parse/tokenize"):
+                for position, word in enumerate(tokenize(text_paragraphs)):
+                    if word and word not in STOP_WORDS:
+                        positions.setdefault(normalize(word) if normalize else word, []).append(position)
+            with timer("build/parse/index"):
+                for word, word_positions in positions.items():
+                    invf.notify_word_appeared(word, document_instance.id, len(word_positions), word_positions)
@@ -1,15 +1,45 @@
-from typing import List, Iterable
+import mmap
+import struct
+from array import array
+from itertools import repeat
+from typing import Iterable
+
+import numpy as np
 
 from document import Document
 import utilities
 
 
 class DocRegister:
+    """
+    Stores the ID, title and number of the documents, without their text.
+    Titles and numbers are UTF-8 strings of a string table, found by their offsets, as in the file of the register.
+    Documents are found by ID in constant time, with a dense index from each docID to its position.
+    """
+
+    # On-disk format: header, then the arrays described in the header, then the string table.
+    MAGIC = b"REG1"
+    _HEADER = struct.Struct("<4sQQQ")  # MAGIC, number of documents, length of the docID index, string table size.
+
     def __init__(self) -> None:
-        self.registry: List[Document] = []
+        self.ids = array("I")
+        # Titles and numbers of the documents are in their own string table until the register is written.
+        self.titles_strings = bytearray()
+        self.nos_strings = bytearray()
+        self.titles_offsets = array("Q", [0])  # Offsets of the strings, with one more than documents.
+        self.nos_offsets = array("Q", [0])
+        self.index = array("i")  # Position of each docID from 0 to the maximal docID, -1 if there is none.
 
     def add_doc(self, doc: Document) -> None:
-        self.registry.append(doc)
+        if doc.id >= len(self.index):
+            self.index.extend(repeat(-1, doc.id + 1 - len(self.index)))
+        if self.index[doc.id] < 0:
+            self.index[doc.id] = len(self.ids)
+        self.ids.append(doc.id)
+        self.titles_strings += doc.title.encode("utf-8")
+        self.titles_offsets.append(len(self.titles_strings))
+        self.nos_strings += doc.no.encode("utf-8")
+        self.nos_offsets.append(len(self.nos_strings))
 
     def __iadd__(self, doc: Document) -> None:
         """
@@ -18,10 +48,26 @@ class DocRegister:
         self.add_doc(doc)
         return self
 
+    @staticmethod
+    def _get_string(strings, offsets, position: int) -> str:
+        return str(strings[offsets[position]:offsets[position + 1]], "utf-8")
+
+    def _get_by_position(self, position: int) -> Document:
+        return Document(
+            id=int(self.ids[position]),
+            title=self._get_string(self.titles_strings, self.titles_offsets, position),
+            no=self._get_string(self.nos_strings, self.nos_offsets, position))
+
     def get_by_id(self, id: int) -> Document:
-        for doc in self.registry:
-            if doc.id == id:
-                return doc
+        """
+        Returns the document with that ID, or None if it is not registered.
+        """
+        if not 0 <= id < len(self.index):
+            return None
+        position = int(self.index[id])
+        if position < 0:
+            return None
+        return self._get_by_position(position)
 
     def __getitem__(self, id: int) -> Document:
         """
@@ -30,17 +76,90 @@ class DocRegister:
         return self.get_by_id(id)
 
     def iterate(self) -> Iterable[Document]:
-        for doc in self.registry:
-            yield doc
+        for position in range(len(self.ids)):
+            yield self._get_by_position(position)
 
     def __len__(self) -> int:
-        return len(self.registry)
+        return len(self.ids)
 
     def to_disk(self, name: str) -> None:
-        return utilities.write_pyobj_to_disk(self.registry, name)
+        """
+        Writes the register in a format that DocRegister_MMap reads without loading it:
+          - offsets of the titles then of the numbers in the string table (8 bytes each, one more than documents);
+          - docIDs (4 bytes each);
+          - position of each docID from 0 to the maximal docID, -1 if there is none (4 bytes each);
+          - string table: all titles then all numbers, in UTF-8.
+        """
+        # The numbers follow the titles in the string table: the last title ends where the first number starts.
+        offsets = np.concatenate([
+            np.array(self.titles_offsets, dtype="<u8"),
+            np.array(self.nos_offsets, dtype="<u8") + len(self.titles_strings)])
+        ids = np.array(self.ids, dtype="<u4")
+        index = np.array(self.index, dtype="<i4")
+
+        with open(name, "wb") as f:
+            f.write(self._HEADER.pack(
+                self.MAGIC, len(ids), len(index), len(self.titles_strings) + len(self.nos_strings)))
+            f.write(offsets.tobytes())
+            f.write(ids.tobytes())
+            f.write(index.tobytes())
+            f.write(self.titles_strings)
+            f.write(self.nos_strings)
+
+    def close(self) -> None:
+        """
+        Releases the file of a register read by 'from_disk'.
+        """
+        pass
 
     @classmethod
     def from_disk(cls, name: str):
+        """
+        Opens a register written by 'to_disk' as a DocRegister_MMap.
+        Registers pickled by previous versions are loaded in memory.
+        """
+        with open(name, "rb") as f:
+            magic = f.read(len(cls.MAGIC))
+        if magic == cls.MAGIC:
+            return DocRegister_MMap(name)
+
         newregistry = DocRegister()
-        newregistry.registry = utilities.read_pyobj_from_disk(name)
+        for doc in utilities.read_pyobj_from_disk(name):
+            newregistry.add_doc(doc)
         return newregistry
+
+
+class DocRegister_MMap(DocRegister):
+    """
+    READ-ONLY DOC REGISTER.
+    Arrays and the string table are views of the memory-mapped file, so opening it reads nothing but the header.
+    """
+
+    def __init__(self, filename: str) -> None:
+        super().__init__()
+        self.file = open(filename, mode="rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, nb_docs, index_length, strings_size = self._HEADER.unpack_from(self.mmap)
+        offset = self._HEADER.size
+        offsets = np.frombuffer(self.mmap, dtype="<u8", count=2 * nb_docs + 2, offset=offset)
+        self.titles_offsets = offsets[:nb_docs + 1]
+        self.nos_offsets = offsets[nb_docs + 1:]
+        offset += offsets.nbytes
+        self.ids = np.frombuffer(self.mmap, dtype="<u4", count=nb_docs, offset=offset)
+        offset += self.ids.nbytes
+        self.index = np.frombuffer(self.mmap, dtype="<i4", count=index_length, offset=offset)
+        offset += self.index.nbytes
+        # Offsets of the titles and of the numbers are both from the start of the string table.
+        self.titles_strings = self.nos_strings = memoryview(self.mmap)[offset:offset + strings_size]
+
+    def add_doc(self, doc: Document) -> None:
+        raise RuntimeError("read-only register")
+
+    def close(self) -> None:
+        # The views of the mapped file must be released before closing it.
+        self.titles_strings.release()
+        self.titles_strings = self.nos_strings = None
+        self.titles_offsets = self.nos_offsets = self.ids = self.index = None
+        self.mmap.close()
+        self.file.close()
@@ -2,3 +2,5 @@ DEFAULT_VOC_FILE = "./voc.bin"
 DEFAULT_PL_FILE = "./pl.bin"
 DEFAULT_REGISTER_FILE = "./register.bin"
 PRINT_FILE_WHILE_PARSING = False
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8765
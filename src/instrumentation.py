@@ -0,0 +1,177 @@
+"""
+Named timers and counters of the build and request stages, reported by the '--profile' option of the scripts.
+Disabled by default: timers only test ENABLED, and hot paths must test it before calling 'count'.
+Names are paths like "build/parse/tokenize": a timer includes the time of the timers below it.
+Only the current process is measured, so the work of parallel workers is not detailed.
+If memory is traced, timers also record the peak of the memory allocated by Python (tracemalloc) during their block.
+"""
+
+import functools
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+ENABLED = False
+TRACE_MEMORY = False
+
+_timers: Dict[str, List[float]] = {}  # Name -> [number of measures, total, minimum, maximum] in seconds.
+_counters: Dict[str, int] = {}
+_memory: Dict[str, List[int]] = {}  # Name -> [highest peak, highest retained] in bytes above the start of the block.
+_memory_stack: List[List[int]] = []  # For each running timer: [memory at its start, highest peak seen].
+
+
+def enable(trace_memory: bool = False) -> None:
+    """
+    Tracing memory slows down all allocations: the timers are then much less accurate.
+    """
+    global ENABLED, TRACE_MEMORY
+    ENABLED = True
+    if trace_memory:
+        if not hasattr(tracemalloc, "reset_peak"):
+            raise RuntimeError("tracing memory needs Python 3.9 or above")
+        TRACE_MEMORY = True
+        tracemalloc.start()
+
+
+def reset() -> None:
+    _timers.clear()
+    _counters.clear()
+    _memory.clear()
+
+
+def add_time(name: str, seconds: float) -> None:
+    measures = _timers.get(name)
+    if measures is None:
+        _timers[name] = [1, seconds, seconds, seconds]
+    else:
+        measures[0] += 1
+        measures[1] += seconds
+        measures[2] = min(measures[2], seconds)
+        measures[3] = max(measures[3], seconds)
+
+
+def count(name: str, value: int = 1) -> None:
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def _start_memory() -> None:
+    current, peak = tracemalloc.get_traced_memory()
+    # The peak is reset for the new block: the running blocks keep the peak reached so far.
+    for block in _memory_stack:
+        block[1] = max(block[1], peak)
+    tracemalloc.reset_peak()
+    _memory_stack.append([current, current])
+
+
+def _stop_memory(name: str) -> None:
+    start, peak = _memory_stack.pop()
+    current, tracemalloc_peak = tracemalloc.get_traced_memory()
+    peak = max(peak, tracemalloc_peak)
+    if _memory_stack:
+        _memory_stack[-1][1] = max(_memory_stack[-1][1], peak)
+    measures = _memory.setdefault(name, [0, 0])
+    measures[0] = max(measures[0], peak - start)
+    measures[1] = max(measures[1], current - start)
+
+
+class timer:
+    """
+    Context manager adding the time spent in its block to the timer of that name.
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> None:
+        if ENABLED:
+            if TRACE_MEMORY:
+                _start_memory()
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exception_info) -> None:
+        if ENABLED:
+            add_time(self.name, time.perf_counter() - self.start)
+            if TRACE_MEMORY:
+                _stop_memory(self.name)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator adding the runtime of each call of the function to the timer of that name.
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_iterator(name: str, iterable: Iterable) -> Iterator:
+    """
+    Yields the items of the iterable, adding the time spent to get each of them to the timer of that name.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            add_time(name, time.perf_counter() - start)
+        yield item
+
+
+def report() -> Dict[str, Any]:
+    """
+    Returns the timers, the counters and the throughputs of the build, if it was measured.
+    If memory is traced, the highest peak and retained memory of the timers, in bytes above the start of their block.
+    """
+    timers = {
+        name: {"count": nb, "total_s": total, "mean_ms": 1000 * total / nb, "min_ms": 1000 * low, "max_ms": 1000 * high}
+        for name, (nb, total, low, high) in sorted(_timers.items())}
+    rates = {}
+    if "build" in _timers:
+        build_time = _timers["build"][1]
+        rates["docs_per_second"] = _counters.get("documents", 0) / build_time
+        rates["postings_per_second"] = _counters.get("postings", 0) / build_time
+    rates["bytes_written"] = sum(value for name, value in _counters.items() if name.startswith("bytes_written/"))
+    result = {"timers": timers, "counters": dict(sorted(_counters.items())), "rates": rates, "folded": folded_stacks()}
+    if TRACE_MEMORY:
+        result["memory"] = {
+            name: {"peak_bytes": peak, "retained_bytes": retained}
+            for name, (peak, retained) in sorted(_memory.items())}
+    return result
+
+
+def folded_stacks() -> List[str]:
+    """
+    Returns the timers in the "folded stacks" format of flame graph tools: "build;parse;tokenize 1234",
+    with the time spent in each timer but not in the timers below it, in microseconds.
+    """
+    lines = []
+    for name, (_, total, _, _) in sorted(_timers.items()):
+        children_total = sum(
+            measures[1] for child, measures in _timers.items()
+            if child.startswith(f"{name}/") and "/" not in child[len(name) + 1:])
+        lines.append(f"{name.replace('/', ';')} {max(0, int(1e6 * (total - children_total)))}")
+    return lines
+
+
+def write_report(filename: str) -> None:
+    """
+    Writes the report as JSON, or only the folded stacks if the filename ends with ".folded".
+    """
+    with open(filename, "w") as f:
+        if filename.endswith(".folded"):
+            f.write("\n".join(folded_stacks()) + "\n")
+        else:
+            json.dump(report(), f, indent=2)
+            f.write("\n")
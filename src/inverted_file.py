@@ -1,12 +1,23 @@
+import bisect
+import heapq
 import math
-from typing import List, final
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, final
 
-from doc_parser import pre_work_word
+import numpy as np
+
+import instrumentation
+import utilities
+from doc_parser import get_normalizer, pre_work_word
 from doc_register import DocRegister
-from voc import VOC
-from pl import PL, PLEntry, PL_MMap, ReadOnlyPL
+from voc import VOC, VOCEntry
+from pl import PL, PLEntry, ReadOnlyPL, create_pl_writer, open_pl
+from positions import Positions_MMap, decode_positions, encode_positions
 
 from document import Document
+from instrumentation import timed, timer
 
 
 # https://www.geeksforgeeks.org/python-positional-index/
@@ -22,52 +33,242 @@ class RequestResult:
         return f"RequestResult[doc={self.doc}, score={self.score}]"
 
 
+class PLCursor:
+    """
+    Position in a PL sorted by docID, which can jump forward over the entries.
+    The cursor works on the arrays of the PL given by 'get_pl_array', which are views of the file for raw PLs.
+    'doc_id' is None once the end of the PL is reached.
+    """
+
+    def __init__(self, pl: PL, pl_infos: VOCEntry) -> None:
+        self.pl_infos = pl_infos
+        self.doc_ids, self.scores = pl.get_pl_array(pl_infos.pl_id, pl_infos.pl_size)
+        self.index = 0
+        self.doc_id: int = None
+        self.score: int = None
+        self._read_current_entry()
+
+    def _read_current_entry(self) -> None:
+        if self.index < len(self.doc_ids):
+            self.doc_id = self.doc_ids.item(self.index)
+            self.score = self.scores.item(self.index)
+        else:
+            self.doc_id = None
+            self.score = None
+
+    def seek(self, doc_id: int) -> None:
+        """
+        Moves forward to the first entry whose docID is not lower than 'doc_id', by a binary search
+        in the rest of the PL.
+        """
+        if self.doc_id is None or self.doc_id >= doc_id:
+            return
+        self.index += int(np.searchsorted(self.doc_ids[self.index:], doc_id))
+        self._read_current_entry()
+
+    @property
+    def block_max_score(self) -> int:
+        """
+        Maximal score of the block of the current entry.
+        """
+        return self.pl_infos.block_max_scores[self.index // VOCEntry.SCORES_BLOCK_SIZE]
+
+    @property
+    def block_last_doc_id(self) -> int:
+        """
+        DocID of the last entry of the block of the current entry, as given by the VOC.
+        """
+        block = self.index // VOCEntry.SCORES_BLOCK_SIZE
+        block_last_doc_ids = getattr(self.pl_infos, "block_last_doc_ids", None)
+        if block_last_doc_ids is None:  # VOC saved before the last docIDs of the blocks were kept.
+            return self.doc_ids.item(min((block + 1) * VOCEntry.SCORES_BLOCK_SIZE, len(self.doc_ids)) - 1)
+        return block_last_doc_ids[block]
+
+
 class InvertedFile:
-    def __init__(self, voc: VOC, pl: PL) -> None:
+    GENERATION_FILE_SUFFIX = ".gen"  # Suffix added to the PL filename to get the generation filename.
+    POSITIONS_FILE_SUFFIX = ".pos"  # Suffix added to the PL filename to get the positions filename.
+    NORMALIZER_FILE_SUFFIX = ".norm"  # Suffix added to the PL filename to get the normalizer filename.
+    TEMPORARY_FILE_SUFFIX = ".tmp"  # Suffix of the files being written, until they replace the previous ones.
+    WRITE_CHUNK_SIZE = 1 << 16  # Number of postings read, scored and written together by 'generate_mmap_pl'.
+
+    def __init__(self, voc: VOC, pl: PL, with_positions: bool = False, normalizer: str = "none") -> None:
         self.register = DocRegister()
         self.voc: VOC = voc
         self.pl: PL = pl
         self.read_only_pl: ReadOnlyPL = None
+        # Positional index, needed by phrase requests. While parsing, encoded positions by term then by docID.
+        # Once written or read, the positions file.
+        self.positions: Dict[str, Dict[int, bytes]] = {} if with_positions else None
+        self.positions_file: Positions_MMap = None
+        # Normalization of the terms (see 'doc_parser.NORMALIZERS'), applied to documents and requests.
+        self.normalizer = normalizer
+        # Identifies the content of the index: it changes each time the index is written.
+        self.generation: str = uuid.uuid4().hex
+
+    def prepare_word(self, word: str) -> str:
+        """
+        Returns the term of a word of a request, as terms of the documents are indexed.
+        """
+        word = pre_work_word(word)
+        normalize = get_normalizer(self.normalizer)
+        return normalize(word) if word and normalize else word
 
     def register_document(self, doc: Document) -> None:
         self.register += doc
+        if instrumentation.ENABLED:
+            instrumentation.count("documents")
 
+    @timed("build/compute_scores")
     def compute_scores(self, convert_to_int: bool = True):
         """
         When all documents are parsed, we re-compute scores for all PL entries.
+        PLs are also sorted by docID, as files may not be parsed in docID order.
+        All PLs are sorted and scored at once, as a single array of postings.
+        The IF may instead be saved with 'compute_scores=True', which scores the PLs while writing them.
         """
         D = len(self.register)  # Number total of documents
+        voc_entries = list(self.voc.iterate())
+        for voc_entry, (doc_ids, scores) in zip(
+                voc_entries, self._sorted_pls_with_scores(voc_entries, D, convert_to_int)):
+            self.pl.set_pl_array(voc_entry.pl_id, doc_ids, scores)
 
-        for voc_entry in self.voc.iterate():
-            pl_id = voc_entry.pl_id
-            pl_size = voc_entry.pl_size
-
-            current_pl = self.pl.get_pl(pl_id=pl_id, size=pl_size)
-            for pl_entry in current_pl:
-                tf = 1 + math.log(pl_entry.score)
-                idf = math.log(D / (1 + pl_size))
-                final_score = 100 * tf * idf
-                if convert_to_int:
-                    final_score = int(final_score)
-                pl_entry.score = final_score
-
-    def generate_mmap_pl(self, pl_file: str):
-        total_of_pl_entries = sum(voc_entry.pl_size for voc_entry in self.voc.iterate())
-        mmap_file_size = total_of_pl_entries * PL_MMap.PL_ENTRY_LENGTH
-        new_pl = PL_MMap(filename=pl_file, filesize=mmap_file_size, mode="write")
+    def _sorted_pls_with_scores(
+            self, voc_entries: List[VOCEntry], D: int, convert_to_int: bool = True
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns the docIDs and the scores of the PLs of the entries, sorted by docID, and updates their maximal scores.
+        """
+        pls_arrays = [self.pl.get_pl_array(pl_id=voc_entry.pl_id, size=voc_entry.pl_size) for voc_entry in voc_entries]
+        return self.sort_and_score_pls(pls_arrays, voc_entries, D, convert_to_int)
+
+    @classmethod
+    def sort_and_score_pls(
+            cls, pls_arrays: List[Tuple[np.ndarray, np.ndarray]], voc_entries: List[VOCEntry], D: int,
+            convert_to_int: bool = True
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns the docIDs and the scores of the PLs given by their docIDs and occurences, sorted by docID,
+        and updates the maximal scores of their entries.
+        The PLs are sorted and scored at once, as a single array of postings.
+        """
+        if not voc_entries:
+            return []
+        pl_sizes = np.array([voc_entry.pl_size for voc_entry in voc_entries], dtype=np.int64)
+        doc_ids = np.concatenate([doc_ids for doc_ids, _ in pls_arrays])
+        occurences = np.concatenate([occurences for _, occurences in pls_arrays])
+        del pls_arrays
+
+        # Sorts by PL, then by docID: the same as sorting each PL by docID.
+        order = np.lexsort((doc_ids, np.repeat(np.arange(len(voc_entries)), pl_sizes)))
+        doc_ids = doc_ids[order]
+        scores = cls.compute_flat_scores(occurences[order], D, pl_sizes, convert_to_int)
+        del occurences, order
+
+        VOCEntry.update_all_max_scores(voc_entries, doc_ids, scores)
+        pl_ends = np.cumsum(pl_sizes).tolist()
+        return [
+            (doc_ids[pl_start:pl_end], scores[pl_start:pl_end]) for pl_start, pl_end in zip([0] + pl_ends, pl_ends)]
+
+    @staticmethod
+    def _tf(occurences: np.ndarray) -> np.ndarray:
+        """
+        The logarithm of each distinct number of occurences is computed with 'math.log'
+        so that scores are exactly the same as computing them one by one.
+        """
+        distinct_occurences, occurences_indexes = np.unique(occurences, return_inverse=True)
+        logs = np.array([math.log(nbr) for nbr in distinct_occurences.tolist()], dtype=np.float64)
+        return 1 + logs[occurences_indexes]
+
+    @classmethod
+    def compute_pl_scores(cls, occurences: np.ndarray, D: int, pl_size: int, convert_to_int: bool = True) -> np.ndarray:
+        """
+        Returns the scores of the entries of a PL, given the number of occurences of its term in each document.
+        """
+        idf = math.log(D / (1 + pl_size))
+        final_scores = 100 * cls._tf(occurences) * idf
+        if convert_to_int:
+            final_scores = final_scores.astype(np.int64)
+        return final_scores
+
+    @classmethod
+    def compute_flat_scores(
+            cls, occurences: np.ndarray, D: int, pl_sizes: np.ndarray, convert_to_int: bool = True) -> np.ndarray:
+        """
+        Same as 'compute_pl_scores' on consecutive PLs at once: 'occurences' is the concatenation of their occurences,
+        'pl_sizes' gives the size of each PL.
+        """
+        distinct_pl_sizes, pl_sizes_indexes = np.unique(pl_sizes, return_inverse=True)
+        idfs = np.array([math.log(D / (1 + pl_size)) for pl_size in distinct_pl_sizes.tolist()], dtype=np.float64)
+        final_scores = 100 * cls._tf(occurences) * np.repeat(idfs[pl_sizes_indexes], pl_sizes)
+        if convert_to_int:
+            final_scores = final_scores.astype(np.int64)
+        return final_scores
+
+    def generate_mmap_pl(self, pl_file: str, pl_format: str = "raw", compute_scores: bool = False):
+        """
+        Writes the PLs to the given file, then uses that file as the PL of the IF.
+        PLs are handled by chunks of about WRITE_CHUNK_SIZE postings, whose in-memory postings are freed
+        as soon as they are written: the whole index is never held twice.
+        :param pl_format: "raw" (PL_MMap) or "compressed" (PL_MMapCompressed).
+        :param compute_scores: if the PLs have the occurences of the terms, they are sorted and scored
+          while written, instead of calling 'compute_scores' before.
+        """
+        new_pl = create_pl_writer(pl_file, pl_format)
+        D = len(self.register)  # Number total of documents
+
+        for chunk in self._voc_entries_chunks():
+            if compute_scores:
+                pls_arrays = self._sorted_pls_with_scores(chunk, D)
+            else:
+                pls_arrays = [self.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size) for voc_entry in chunk]
+            for voc_entry, (doc_ids, scores) in zip(chunk, pls_arrays):
+                if isinstance(self.pl, PL):
+                    self.pl.free_pl(voc_entry.pl_id)
+                voc_entry.pl_id = new_pl.add_array(doc_ids, scores)
+
+        new_pl.close()
+        self.pl = open_pl(pl_file)
 
+    def _voc_entries_chunks(self) -> Iterable[List[VOCEntry]]:
+        """
+        Yields the entries of the VOC by consecutive chunks of about WRITE_CHUNK_SIZE postings.
+        """
+        chunk: List[VOCEntry] = []
+        chunk_size = 0
         for voc_entry in self.voc.iterate():
-            pl_to_copy = self.pl.get_pl(voc_entry.pl_id, voc_entry.pl_size)
-            pl_id = new_pl.add(pl_to_copy)
-            voc_entry.pl_id = pl_id
+            chunk.append(voc_entry)
+            chunk_size += voc_entry.pl_size
+            if chunk_size >= self.WRITE_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+                chunk_size = 0
+        if chunk:
+            yield chunk
 
-        self.pl = new_pl
+    def write_positions(self, positions_file: str) -> None:
+        """
+        Writes the positions of the PL entries in the order of the written PL, then uses that file.
+        """
+        pls = []
+        for word, voc_entry in self.voc.iterate2():
+            doc_ids, _ = self.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size)
+            word_positions = self.positions[word]
+            pls.append((voc_entry.pl_id, [word_positions[doc_id] for doc_id in doc_ids.tolist()]))
+        Positions_MMap.write(positions_file, pls)
+        self.positions = None
+        self.positions_file = Positions_MMap(positions_file)
 
-    def notify_word_appeared(self, word: str, docID: int, occurences: int) -> None:
+    def notify_word_appeared(self, word: str, docID: int, occurences: int, positions: List[int] = None) -> None:
         """
         When parsing a document, this function takes note that the given word appeared in the given file.
         This must not be called several times with the same pair(word, document).
+        'positions' are the increasing positions of the word in the document, kept if the IF has positions.
         """
+        if self.positions is not None:
+            self.positions.setdefault(word, {})[docID] = encode_positions(positions)
+        if instrumentation.ENABLED:
+            instrumentation.count("postings")
         score = occurences
         if word in self.voc:
             pl_id = self.voc[word].pl_id
@@ -77,56 +278,334 @@ class InvertedFile:
             pl_id = self.pl.create_new_pl(docID, score)
             self.voc.add_entry(word, pl_id)
 
-    def request_words_disjonctive(self, words: List[str]) -> List[RequestResult]:
+    def merge_partial_index(
+            self, documents: Iterable[Document], postings: Iterable[Tuple[str, np.ndarray, np.ndarray]]) -> None:
+        """
+        Appends a partial IF built on other files, before scores are computed.
+        'postings' gives for each term the arrays of its docIDs and of its occurences, appended at once to its PL.
+        Partial IFs must be merged in the order of their files to get the same IF as a serial build.
+        """
+        for doc in documents:
+            self.register_document(doc)
+
+        for word, doc_ids, occurences in postings:
+            if word in self.voc:
+                self.pl.append_pl_array(self.voc[word].pl_id, doc_ids, occurences)
+                self.voc.increment_pl_size(word, len(doc_ids))
+            else:
+                pl_id = self.pl.create_new_pl(int(doc_ids[0]), int(occurences[0]))
+                self.pl.append_pl_array(pl_id, doc_ids[1:], occurences[1:])
+                self.voc.add_entry(word, pl_id, len(doc_ids))
+            if instrumentation.ENABLED:
+                instrumentation.count("postings", len(doc_ids))
+
+    @staticmethod
+    def split_request(request: str, phrase: bool = False) -> List[str]:
+        """
+        Returns the words of a request typed by the user. For phrase requests, all words are kept in their order:
+        'request_words_phrase' prepares them and counts the ignored ones. Other requests get unique prepared words.
+        """
+        if phrase:
+            return request.split()
+        return utilities.convert_str_to_tokens(request)
+
+    @staticmethod
+    def _check_k(k: int) -> None:
+        if k is not None and k < 1:
+            raise ValueError(f"wrong parameter for k: {k}")
+
+    @timed("request/or")
+    def request_words_disjonctive(self, words: List[str], k: int = None) -> List[RequestResult]:
         """
         Makes an "OR" request of the words.
         The words are preprocessed first.
+        If 'k' is given, only the 'k' best results are returned (see '_request_top_k').
+        """
+        self._check_k(k)
+        request = list(set(self.prepare_word(word) for word in words))
+        if k is not None:
+            return self._request_top_k(request, k)
+
+        with timer("request/or/read_pls"):
+            pls_arrays = [
+                self.pl.get_pl_array(pl_id=self.voc[word].pl_id, size=self.voc[word].pl_size)
+                for word in request if word in self.voc]
+        if not pls_arrays:
+            return []
+
+        with timer("request/or/accumulate"):
+            doc_ids = np.concatenate([doc_ids for doc_ids, _ in pls_arrays])
+            scores = np.concatenate([scores for _, scores in pls_arrays])
+            if scores.dtype.kind in "ui":
+                scores = scores.astype(np.int64)
+
+            # Accumulates the scores of each document.
+            distinct_doc_ids, first_indexes, doc_indexes = np.unique(
+                doc_ids, return_index=True, return_inverse=True)
+            total_scores = np.zeros(len(distinct_doc_ids), dtype=scores.dtype)
+            np.add.at(total_scores, doc_indexes, scores)
+
+            # Sort by descending order of the scores.
+            # Documents with the same score stay in the order they are found in the PLs.
+            order = np.argsort(first_indexes, kind="stable")
+            order = order[np.argsort(-total_scores[order], kind="stable")]
+
+        with timer("request/or/results"):
+            return [
+                RequestResult(doc=self.register[doc_id], score=score)
+                for doc_id, score in zip(distinct_doc_ids[order].tolist(), total_scores[order].tolist())]
+
+    @timed("request/and")
+    def request_words_conjonctive(self, words: List[str], k: int = None) -> List[RequestResult]:
+        """
+        Makes an "AND" request of the words.
+        The words are preprocessed first.
+        If 'k' is given, only the 'k' best results are returned.
         """
-        request = list(set(pre_work_word(word) for word in words))
+        self._check_k(k)
+        # Ignored words, such as stop words, are not required.
+        return self._request_terms_conjonctive(
+            list(set(term for term in (self.prepare_word(word) for word in words) if term)), k)
 
-        results: List[RequestResult] = []
+    def _request_terms_conjonctive(self, request: List[str], k: int = None) -> List[RequestResult]:
+        """
+        Makes an "AND" request of distinct terms, already prepared by 'prepare_word'.
+        PLs are intersected from the shortest to the longest: only the shortest one is walked entirely,
+        the others are searched by binary search over their sorted docIDs.
+        """
+        if not request or not all(word in self.voc for word in request):
+            return []
+
+        pls_infos = sorted((self.voc[word] for word in request), key=lambda voc_entry: voc_entry.pl_size)
 
-        for word_to_test in request:
-            if word_to_test in self.voc:
-                pl_infos = self.voc[word_to_test]
-                pl_size = pl_infos.pl_size
-                pl_id = pl_infos.pl_id
+        shortest_pl_infos = pls_infos[0]
+        with timer("request/and/read_shortest"):
+            candidates: List[PLEntry] = [
+                PLEntry(docID=pl_entry.docID, score=pl_entry.score)
+                for pl_entry in self.pl.get_pl(pl_id=shortest_pl_infos.pl_id, size=shortest_pl_infos.pl_size)]
 
-                pl_for_that_term: List[PLEntry] = self.pl.get_pl(pl_id=pl_id, size=pl_size)
+        with timer("request/and/intersect"):
+            for pl_infos in pls_infos[1:]:
+                remaining_candidates: List[PLEntry] = []
+                cursor = PLCursor(self.pl, pl_infos)
+                for candidate in candidates:
+                    cursor.seek(candidate.docID)
+                    if cursor.doc_id is None:
+                        break
+                    if cursor.doc_id == candidate.docID:
+                        candidate.score += cursor.score
+                        remaining_candidates.append(candidate)
+                candidates = remaining_candidates
+                if not candidates:
+                    break
 
-                for pl_entry in pl_for_that_term:
-                    doc_id = pl_entry.docID
-                    document = self.register[doc_id]
-                    score = pl_entry.score
+        with timer("request/and/results"):
+            results = [
+                RequestResult(doc=self.register[candidate.docID], score=candidate.score) for candidate in candidates]
 
-                    # If the document is already there, don't add a new entry but adapt the score.
-                    doc_already_here = False
-                    for item in results:
-                        if item.doc == document:
-                            item.score += score
-                            doc_already_here = True
-                            break
-                    if not doc_already_here:
-                        result = RequestResult(doc=document, score=score)
-                        results.append(result)
+            # Sort by descending order of the scores
+            results.sort(key=lambda req_res: req_res.score, reverse=True)
+            return results[:k]
+
+    @timed("request/phrase")
+    def request_words_phrase(self, words: List[str], slop: int = 0, k: int = None) -> List[RequestResult]:
+        """
+        Makes a phrase request: the words must appear in this order in the documents,
+        at most 'slop' positions further from each other than in the request (0 for the exact phrase).
+        Positions are counted with the ignored words, so "city of angeles" does not match "city angeles".
+        Candidates are the results of the "AND" request: positions are only read for them.
+        If 'k' is given, only the 'k' best results are returned.
+        """
+        self._check_k(k)
+        if self.positions is None and self.positions_file is None:
+            raise RuntimeError("the IF has no positions")
 
-        # Sort by descending order of the scores
-        results.sort(key=lambda req_res: req_res.score, reverse=True)
-        return results
+        # Terms of the request and their positions in the request.
+        request = [(self.prepare_word(word), offset) for offset, word in enumerate(words)]
+        request = [(word, offset) for word, offset in request if word]
+        if not request:
+            return []
+        gaps = [offset - previous_offset for (_, previous_offset), (_, offset) in zip(request, request[1:])]
+
+        # The terms are already prepared: preparing them again could change them, stems are not stable.
+        candidates = self._request_terms_conjonctive(list(set(word for word, _ in request)))
+        # Without candidates, some words may not be in the VOC.
+        if len(request) == 1 or not candidates:
+            return candidates[:k]
+
+        # Cursors find the index of the candidates in each PL, candidates are visited by increasing docID.
+        cursors = {word: PLCursor(self.pl, self.voc[word]) for word, _ in request}
+        matching_doc_ids = set()
+        with timer("request/phrase/positions"):
+            for candidate in sorted(candidates, key=lambda req_res: req_res.doc.id):
+                doc_id = candidate.doc.id
+                words_positions: Dict[str, List[int]] = {}
+                for word, cursor in cursors.items():
+                    cursor.seek(doc_id)
+                    words_positions[word] = self._get_positions(word, cursor.pl_infos, cursor.index, doc_id)
+                if self._phrase_matches([words_positions[word] for word, _ in request], gaps, slop):
+                    matching_doc_ids.add(doc_id)
+
+        return [candidate for candidate in candidates if candidate.doc.id in matching_doc_ids][:k]
+
+    def _get_positions(self, word: str, pl_infos: VOCEntry, index: int, doc_id: int) -> List[int]:
+        if self.positions_file is not None:
+            return self.positions_file.get_positions(pl_infos.pl_id, index)
+        return decode_positions(self.positions[word][doc_id])
+
+    @staticmethod
+    def _phrase_matches(words_positions: List[List[int]], gaps: List[int], slop: int) -> bool:
+        """
+        Tells if there is a position of each word such that each one follows the previous one
+        by a distance between its gap and its gap + 'slop'.
+        """
+        current_positions = words_positions[0]
+        for positions, gap in zip(words_positions[1:], gaps):
+            next_positions = []
+            for position in positions:
+                # Is there a previous position in [position - gap - slop, position - gap]?
+                previous_index = bisect.bisect_left(current_positions, position - gap - slop)
+                if previous_index < len(current_positions) and current_positions[previous_index] <= position - gap:
+                    next_positions.append(position)
+            if not next_positions:
+                return False
+            current_positions = next_positions
+        return True
+
+    @timed("request/or/top_k")
+    def _request_top_k(self, request: List[str], k: int) -> List[RequestResult]:
+        """
+        Block-Max WAND: returns the 'k' best documents for the "OR" request without scoring all postings.
+        PLs are walked in docID order. A document is only scored if the maximal scores of its terms
+        can beat the k-th best score found so far, otherwise whole blocks of postings are skipped.
+        Results are sorted by descending score, then by ascending docID.
+        """
+        cursors = [PLCursor(self.pl, self.voc[word]) for word in request if word in self.voc]
+        best: List[Tuple[int, int]] = []  # Min-heap of <score, -docID> of the k best documents.
+        threshold = -math.inf  # Score to beat to enter the k best documents.
+
+        while True:
+            cursors = [cursor for cursor in cursors if cursor.doc_id is not None]
+            if not cursors:
+                break
+            cursors.sort(key=lambda cursor: cursor.doc_id)
+
+            # The pivot is the first document whose terms could beat the threshold.
+            upper_bound = 0
+            pivot_doc_id = None
+            for cursor in cursors:
+                upper_bound += cursor.pl_infos.max_score
+                if upper_bound > threshold:
+                    pivot_doc_id = cursor.doc_id
+                    break
+            if pivot_doc_id is None:
+                break
+
+            if cursors[0].doc_id != pivot_doc_id:
+                # Documents before the pivot cannot be in the results.
+                for cursor in cursors:
+                    if cursor.doc_id >= pivot_doc_id:
+                        break
+                    cursor.seek(pivot_doc_id)
+                continue
+
+            aligned_cursors = [cursor for cursor in cursors if cursor.doc_id == pivot_doc_id]
+            if sum(cursor.block_max_score for cursor in aligned_cursors) > threshold:
+                if instrumentation.ENABLED:
+                    instrumentation.count("request/or/top_k/postings_scored", len(aligned_cursors))
+                score = sum(cursor.score for cursor in aligned_cursors)
+                if len(best) < k:
+                    heapq.heappush(best, (score, -pivot_doc_id))
+                elif score > threshold:
+                    heapq.heapreplace(best, (score, -pivot_doc_id))
+                if len(best) == k:
+                    threshold = best[0][0]
+                next_doc_id = pivot_doc_id + 1
+            else:
+                # Until the end of the current blocks, only the aligned terms can score a document.
+                next_doc_id = min(cursor.block_last_doc_id for cursor in aligned_cursors) + 1
+                if len(aligned_cursors) < len(cursors):
+                    next_doc_id = min(next_doc_id, cursors[len(aligned_cursors)].doc_id)
+            for cursor in aligned_cursors:
+                cursor.seek(next_doc_id)
+
+        best.sort(key=lambda item: (-item[0], -item[1]))
+        return [RequestResult(doc=self.register[-minus_doc_id], score=score) for score, minus_doc_id in best]
 
     @classmethod
     def read_from_files(cls, voc_file: str, pl_file: str, registry_file: str, voc_type: type):
         newinvf = InvertedFile(None, None)
         newinvf.voc = voc_type.from_disk(voc_file)
-        newinvf.pl = PL_MMap(filename=pl_file, mode="read")
+        newinvf.pl = open_pl(pl_file)
         newinvf.register = DocRegister.from_disk(registry_file)
+        generation_file = Path(f"{pl_file}{cls.GENERATION_FILE_SUFFIX}")
+        newinvf.generation = generation_file.read_text().strip() if generation_file.exists() else None
+        normalizer_file = Path(f"{pl_file}{cls.NORMALIZER_FILE_SUFFIX}")
+        if normalizer_file.exists():
+            newinvf.normalizer = normalizer_file.read_text().strip()
+        positions_file = Path(f"{pl_file}{cls.POSITIONS_FILE_SUFFIX}")
+        if positions_file.exists():
+            newinvf.positions_file = Positions_MMap(str(positions_file))
         return newinvf
 
-    def write_to_files(self, voc_file: str, pl_file: str, registry_file: str):
-        self.generate_mmap_pl(pl_file)
-        self.voc.to_disk(voc_file)
-        self.register.to_disk(registry_file)
+    def close(self) -> None:
+        """
+        Releases the files of an IF read by 'read_from_files'.
+        """
+        self.voc.close()
+        self.pl.close()
+        self.register.close()
+        if self.positions_file is not None:
+            self.positions_file.close()
+
+    @timed("save")
+    def write_to_files(
+            self, voc_file: str, pl_file: str, registry_file: str, pl_format: str = "raw",
+            compute_scores: bool = False):
+        """
+        'compute_scores' scores the PLs while writing them, see 'generate_mmap_pl'.
+        All files are written under temporary names, then renamed over the previous ones: a process which maps
+        the previous files keeps reading them. The generation file is renamed last, once the others are in place.
+        """
+        positions_file = f"{pl_file}{self.POSITIONS_FILE_SUFFIX}"
+        normalizer_file = f"{pl_file}{self.NORMALIZER_FILE_SUFFIX}"
+        generation_file = f"{pl_file}{self.GENERATION_FILE_SUFFIX}"
+        written_files: List[str] = []
+
+        def temporary(filename: str) -> str:
+            written_files.append(filename)
+            return f"{filename}{self.TEMPORARY_FILE_SUFFIX}"
+
+        with timer("save/pl"):
+            self.generate_mmap_pl(temporary(pl_file), pl_format, compute_scores)
+        if self.positions is not None:
+            with timer("save/positions"):
+                self.write_positions(temporary(positions_file))
+        if self.normalizer != "none":
+            Path(temporary(normalizer_file)).write_text(self.normalizer)
+        with timer("save/voc"):
+            self.voc.to_disk(temporary(voc_file))
+        with timer("save/register"):
+            self.register.to_disk(temporary(registry_file))
+        self.generation = uuid.uuid4().hex
+        Path(temporary(generation_file)).write_text(self.generation)
+
+        for filename in written_files[:-1]:
+            os.replace(f"{filename}{self.TEMPORARY_FILE_SUFFIX}", filename)
+        for filename in (positions_file, normalizer_file):
+            if filename not in written_files and Path(filename).exists():
+                Path(filename).unlink()  # Written by a previous build, it does not match the new PL.
+        os.replace(f"{generation_file}{self.TEMPORARY_FILE_SUFFIX}", generation_file)
+        # The files opened while writing are the same once renamed.
+        self.pl.filename = pl_file
+        if self.positions_file is not None:
+            self.positions_file.filename = positions_file
 
+        if instrumentation.ENABLED:
+            for name, filename in (("pl", pl_file), ("positions", positions_file), ("voc", voc_file),
+                                   ("register", registry_file)):
+                if Path(filename).exists():
+                    instrumentation.count(f"bytes_written/{name}", Path(filename).stat().st_size)
 
 """
 MEMORY MAPPED FILES
@@ -1,16 +1,31 @@
+from functools import partial
+from multiprocessing import Pool
 from typing import *
 
+import numpy as np
+
 from doc_parser import parse_document
 from document import Document
 from global_values import DEFAULT_PL_FILE
+from instrumentation import timed, timer
 from inverted_file import InvertedFile
-from pl import PL, PL_PythonLists
+from pl import PL, PL_Arrays, PL_PythonLists
+from spimi import SPIMIInvertedFile
 from utilities import make_list_of_files, timepoint, convert_str_to_tokens
 from voc import VOC, VOC_Hashmap
 
+PARALLEL_CHUNKS_PER_WORKER = 4  # More chunks than workers to balance the load between processes.
+
 
-def run_search(user_keywords: List[str], inverted_file: InvertedFile) -> None:
-    results: List[Document] = inverted_file.request_words_disjonctive(user_keywords)
+def run_search(
+        user_keywords: List[str], inverted_file: InvertedFile, conjonctive: bool = False, k: int = None,
+        phrase: bool = False, slop: int = 0) -> None:
+    if phrase:
+        results: List[Document] = inverted_file.request_words_phrase(user_keywords, slop=slop, k=k)
+    elif conjonctive:
+        results: List[Document] = inverted_file.request_words_conjonctive(user_keywords, k=k)
+    else:
+        results: List[Document] = inverted_file.request_words_disjonctive(user_keywords, k=k)
 
     if results:
         print(f"Found {len(results)} results:")
@@ -20,15 +35,91 @@ def run_search(user_keywords: List[str], inverted_file: InvertedFile) -> None:
         print("No results found.")
 
 
-def build_if(voc: VOC, pl: PL, nbr_files: int, random_files: bool) -> InvertedFile:
-    inverted_file = InvertedFile(voc=voc, pl=pl)
-    list_of_files = make_list_of_files(nbr=nbr_files, random_pick=random_files)
-    for file in list_of_files:
-        parse_document(file, inverted_file)
-    inverted_file.compute_scores()
+@timed("build")
+def build_if(
+        voc: VOC, pl: PL, nbr_files: int, random_files: bool, parser: str = "stream", workers: int = 1,
+        max_memory: int = 0, files: List[str] = None, with_positions: bool = False, normalizer: str = "none",
+        compute_scores: bool = True
+) -> InvertedFile:
+    """
+    Parses the files and returns the IF with its scores computed.
+    If not 'compute_scores', the PLs have the occurences of the terms: the IF must be saved with
+    'write_to_files(..., compute_scores=True)', which scores each PL while writing it.
+    The files are picked from the datasets folder, unless 'files' lists them.
+    'with_positions' builds the positional index, which needs a single worker and no 'max_memory'.
+    'normalizer' is the normalization of the terms, see 'doc_parser.NORMALIZERS'.
+    If 'max_memory' is given (in bytes), 'pl' is unused and the IF is a SPIMIInvertedFile:
+    it must be saved with 'write_to_files' before being used.
+    """
+    if with_positions and (max_memory or workers > 1):
+        raise RuntimeError("positions are only built by a single worker without memory budget")
+    if max_memory:
+        inverted_file = SPIMIInvertedFile(voc=voc, max_memory=max_memory)
+        inverted_file.normalizer = normalizer
+    else:
+        inverted_file = InvertedFile(voc=voc, pl=pl, with_positions=with_positions, normalizer=normalizer)
+    if files is None:
+        files = make_list_of_files(nbr=nbr_files, random_pick=random_files)
+    with timer("build/parse"):
+        parse_files(files, inverted_file, parser=parser, workers=workers)
+    if compute_scores:
+        inverted_file.compute_scores()
     return inverted_file
 
 
+def parse_files(list_of_files: List[str], inverted_file: InvertedFile, parser: str = "stream", workers: int = 1):
+    """
+    Parses the files into the IF, without computing the scores.
+    """
+    if workers > 1:
+        _parse_documents_in_parallel(list_of_files, inverted_file, parser=parser, workers=workers)
+    else:
+        for file in list_of_files:
+            parse_document(file, inverted_file, parser=parser)
+
+
+def _build_partial_if(
+        list_of_files: List[str], parser: str, normalizer: str
+) -> Tuple[List[Document], List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Worker of '_parse_documents_in_parallel': parses the files into a partial IF.
+    It is returned as its terms, the sizes of their PLs, and all docIDs and occurences concatenated in two arrays,
+    which are much cheaper to send to the main process than one object per posting.
+    """
+    partial_if = InvertedFile(voc=VOC_Hashmap(), pl=PL_Arrays(), normalizer=normalizer)
+    for file in list_of_files:
+        parse_document(file, partial_if, parser=parser)
+
+    words, pl_sizes, pls_doc_ids, pls_occurences = [], [], [], []
+    for word, voc_entry in partial_if.voc.iterate2():
+        doc_ids, occurences = partial_if.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size)
+        words.append(word)
+        pl_sizes.append(len(doc_ids))
+        pls_doc_ids.append(doc_ids)
+        pls_occurences.append(occurences)
+    if not words:
+        return list(partial_if.register.iterate()), [], np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    return (list(partial_if.register.iterate()), words, np.array(pl_sizes, dtype=np.int64),
+            np.concatenate(pls_doc_ids), np.concatenate(pls_occurences))
+
+
+def _parse_documents_in_parallel(list_of_files: List[str], inverted_file: InvertedFile, parser: str, workers: int):
+    """
+    Splits the files in consecutive chunks parsed by a pool of processes,
+    then merges the partial IFs in the files order so that the result is the same as a serial build.
+    """
+    nbr_chunks = min(len(list_of_files), workers * PARALLEL_CHUNKS_PER_WORKER) or 1
+    chunks = [list_of_files[i * len(list_of_files) // nbr_chunks:(i + 1) * len(list_of_files) // nbr_chunks]
+              for i in range(nbr_chunks)]
+
+    with Pool(processes=workers) as pool:
+        for documents, words, pl_sizes, doc_ids, occurences in pool.imap(
+                partial(_build_partial_if, parser=parser, normalizer=inverted_file.normalizer), chunks):
+            pl_ends = np.cumsum(pl_sizes)[:-1]
+            inverted_file.merge_partial_index(
+                documents, zip(words, np.split(doc_ids, pl_ends), np.split(occurences, pl_ends)))
+
+
 if __name__ == "__main__":
     user_input = "violence vIOLeNce,,, VIOLENCE"  # or input()
     user_keywords = convert_str_to_tokens(user_input)
@@ -5,7 +5,10 @@ from psutil import Process
 
 from global_values import *
 from main import build_if
-from pl import PL_PythonLists
+import memory_report
+import pl
+from segments import SegmentedIndex
+import instrumentation
 import utilities
 import voc
 
@@ -14,13 +17,38 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--nbfiles", "-n", help="Number of files to read", default=5, type=int)
     parser.add_argument("--shufflefiles", "-s", help="Shuffle the files ordering", action="store_true")
+    parser.add_argument("--files", help="Files to read, instead of picking them in the datasets folder", nargs="+")
 
     parser.add_argument("--voc", help="Filename of the VOC", type=str, default=DEFAULT_VOC_FILE)
     parser.add_argument("--pl", help="Filename of the PL", type=str, default=DEFAULT_PL_FILE)
     parser.add_argument("--reg", help="Filename of the Doc Register", type=str, default=DEFAULT_REGISTER_FILE)
 
     parser.add_argument("--voc_type", help="Class name of the VOC to instantiate", type=str, default="VOC_Hashmap")
-    # parser.add_argument("--pl_type", help="Class name of the PL to instantiate", type=str, default="PL_PythonLists")
+    parser.add_argument(
+        "--parser", help="XML parser: 'stream' (constant memory) or 'minidom' (full DOM)",
+        type=str, default="stream", choices=["stream", "minidom"])
+    parser.add_argument("--workers", "-w", help="Number of processes parsing the files", type=int, default=1)
+    parser.add_argument(
+        "--max-memory",
+        help="Memory budget of the postings (ex: 512M). When reached, postings are flushed to disk then merged",
+        type=utilities.parse_size, default=0)
+    parser.add_argument(
+        "--pl_format", help="Format of the PL file: 'raw' (fixed-size entries) or 'compressed'",
+        type=str, default="raw", choices=["raw", "compressed"])
+    parser.add_argument(
+        "--pl_type", help="Class name of the in-memory PL to instantiate", type=str, default="PL_Arrays",
+        choices=["PL_Arrays", "PL_PythonLists"])
+
+    parser.add_argument(
+        "--normalizer", help="Normalization of the terms of the documents and of the requests",
+        type=str, default="none", choices=["none", "porter"])
+    parser.add_argument(
+        "--positions", help="Also build the positional index, needed by phrase requests", action="store_true")
+    parser.add_argument(
+        "--append", help="Add the files as a new segment of the segmented index in that folder", type=str)
+    parser.add_argument(
+        "--merge", help="With --append, how to merge the segments afterwards: size-tiered, all into one, or none",
+        type=str, default="tiered", choices=["tiered", "all", "none"])
 
     parser.add_argument("--do_not_save", help="Generate in-memory but do not save in files", action="store_true")
     parser.add_argument("--time", "-t", help="Output runtime in milliseconds", action="store_true")
@@ -28,22 +56,66 @@ def main():
         "--memory", "-m",
         help="Last output line is the RAM used in bytes (diff between start and end RAM values)",
         action="store_true")
+    parser.add_argument(
+        "--profile", help="Write the timers and counters of the stages to that file: JSON, or folded stacks for "
+                          "flame graphs if it ends with '.folded'. Parsing workers are not detailed", type=str)
+    parser.add_argument(
+        "--memory_report",
+        help="Write to that file the deep size and the objects of the VOC, PL and Doc Register before saving, "
+             "the size of their files, and the peak of the memory allocated during each stage (slows the build)",
+        type=str)
     args = parser.parse_args()
+    if args.max_memory and args.do_not_save:
+        parser.error("--max-memory builds the IF on disk, it cannot be used with --do_not_save")
+    if args.append and (args.max_memory or args.do_not_save):
+        parser.error("--append cannot be used with --max-memory or --do_not_save")
+    if args.positions and (args.max_memory or args.workers > 1 or args.append):
+        parser.error("--positions cannot be used with --max-memory, --workers or --append")
+    if args.normalizer != "none" and args.append:
+        parser.error("--normalizer cannot be used with --append")
+    if args.memory_report and args.append:
+        parser.error("--memory_report cannot be used with --append")
 
+    if args.profile or args.memory_report:
+        instrumentation.enable(trace_memory=bool(args.memory_report))
     pr = Process()
     start_time = utilities.timepoint()
     start_ram = pr.memory_info().rss
-    inverted_file = build_if(
-        voc=eval(f"voc.{args.voc_type}()"),
-        pl=PL_PythonLists(),
-        nbr_files=args.nbfiles,
-        random_files=args.shufflefiles)
+    if args.append:
+        files = args.files or utilities.make_list_of_files(nbr=args.nbfiles, random_pick=args.shufflefiles)
+        segmented_index = SegmentedIndex(args.append, voc_type=eval(f"voc.{args.voc_type}"), pl_format=args.pl_format)
+        if files:
+            try:
+                segmented_index.add_segment(files, parser=args.parser, workers=args.workers)
+            except ValueError as e:
+                parser.error(str(e))
+        if args.merge != "none":
+            segmented_index.merge(merge_all=args.merge == "all")
+    else:
+        inverted_file = build_if(
+            voc=eval(f"voc.{args.voc_type}()"),
+            pl=eval(f"pl.{args.pl_type}()"),
+            nbr_files=args.nbfiles,
+            random_files=args.shufflefiles,
+            parser=args.parser,
+            workers=args.workers,
+            max_memory=args.max_memory,
+            files=args.files,
+            with_positions=args.positions,
+            normalizer=args.normalizer,
+            compute_scores=args.do_not_save)
+
+    if args.memory_report:
+        # Once saved, the PL is read from its file: the structures are measured before.
+        structures = memory_report.structures_report(inverted_file)
 
-    if not args.do_not_save:
+    if not args.do_not_save and not args.append:
         inverted_file.write_to_files(
             args.voc,
             args.pl,
-            args.reg)
+            args.reg,
+            pl_format=args.pl_format,
+            compute_scores=True)
 
     end_time = utilities.timepoint()
     gc.collect()
@@ -56,6 +128,11 @@ def main():
     if args.memory:
         output_str += f"Memory(bytes) {end_ram - start_ram}"
     print(output_str)
+    if args.profile:
+        instrumentation.write_report(args.profile)
+    if args.memory_report:
+        files = None if args.do_not_save else memory_report.files_report(structures, args.voc, args.pl, args.reg)
+        memory_report.write_memory_report(args.memory_report, structures, files)
 
 
 if __name__ == "__main__":
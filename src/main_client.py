@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import sys
+
+from global_values import *
+from query_server import QueryClient, generate_load
+
+
+async def print_stats(args) -> None:
+    client = await QueryClient.connect(args.host, args.port, args.unix)
+    response = await client.send({"stats": True})
+    await client.close()
+    print(response["stats"])
+    if response.get("pl_cache"):
+        print(response["pl_cache"])
+
+
+async def run_single_request(args) -> None:
+    client = await QueryClient.connect(args.host, args.port, args.unix)
+    response = await client.request(args.request, conjonctive=args.conjonctive, k=args.top)
+    await client.close()
+
+    if "error" in response:
+        print(f"Error: {response['error']}")
+        sys.exit(1)
+    results = response["results"]
+    if results:
+        print(f"Found {len(results)} results:")
+        for result in results:
+            print(f"> Document[id={result['id']},title={result['title']}] with score={result['score']}")
+    else:
+        print("No results found.")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--request", "-r",
+        help="User request, use quotes to handle multiwords request (with whitespaces between keywords)",
+        type=str)
+    parser.add_argument(
+        "--conjonctive", "-c", help="All keywords must be in the results (AND request)", action="store_true")
+    parser.add_argument("--top", "-k", help="Only output the k best results", type=int, default=None)
+    parser.add_argument("--host", help="TCP address of the server", type=str, default=DEFAULT_SERVER_HOST)
+    parser.add_argument("--port", "-p", help="TCP port of the server", type=int, default=DEFAULT_SERVER_PORT)
+    parser.add_argument("--unix", help="Connect to that Unix socket instead of TCP", type=str, default=None)
+
+    parser.add_argument(
+        "--load", "-l",
+        help="Load generator: send many requests (the --request one, or the lines of --requests_file)",
+        action="store_true")
+    parser.add_argument("--requests_file", help="File with one request per line, for --load", type=str)
+    parser.add_argument("--connections", help="Number of concurrent connections, for --load", type=int, default=8)
+    parser.add_argument("--count", "-n", help="Total number of requests, for --load", type=int, default=1000)
+    parser.add_argument("--stats", help="Print the statistics of the caches of the server", action="store_true")
+    args = parser.parse_args()
+
+    if args.stats:
+        asyncio.run(print_stats(args))
+        return
+    if not args.load:
+        if args.request is None:
+            parser.error("--request is required")
+        asyncio.run(run_single_request(args))
+        return
+
+    if args.requests_file:
+        with open(args.requests_file) as f:
+            requests = [line.strip() for line in f if line.strip()]
+    elif args.request is not None:
+        requests = [args.request]
+    else:
+        parser.error("--load needs --request or --requests_file")
+
+    stats = asyncio.run(generate_load(
+        args.host, args.port, args.unix, requests, args.connections, args.count, args.conjonctive, args.top))
+    print(f"Requests {stats['requests']} QPS {stats['qps']:.1f} "
+          f"p50(ms) {stats['p50_ms']:.3f} p99(ms) {stats['p99_ms']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,118 @@
 import argparse
+import json
+import sys
 
 from psutil import Process
 
 import gc
+import instrumentation
 import utilities
 from global_values import *
 from inverted_file import InvertedFile
+from batch import run_batch
 from main import run_search
+from segments import SegmentedIndex
 import voc
 
 
+def run_single_request(args) -> None:
+    voc_type: type = eval(f"voc.{args.voc_type}")
+    if args.index:
+        inverted_file = SegmentedIndex(args.index, voc_type=voc_type)
+    else:
+        inverted_file = InvertedFile.read_from_files(args.voc, args.pl, args.reg, voc_type)
+
+    user_keywords = InvertedFile.split_request(args.request, phrase=args.phrase)
+    run_search(
+        user_keywords, inverted_file, conjonctive=args.conjonctive, k=args.top, phrase=args.phrase, slop=args.slop)
+
+
+def run_batch_requests(args) -> None:
+    """
+    Writes one JSON line per request, then prints the throughput and the latencies to stderr.
+    """
+    if args.batch == "-":
+        requests = [line.strip() for line in sys.stdin if line.strip()]
+    else:
+        with open(args.batch) as f:
+            requests = [line.strip() for line in f if line.strip()]
+    mode = "phrase" if args.phrase else "conjonctive" if args.conjonctive else "disjonctive"
+
+    start = utilities.timepoint()
+    latencies = []
+    stats = {}
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    for request, results, runtime in run_batch(
+            requests, args.voc, args.pl, args.reg, args.voc_type, mode=mode, k=args.top, slop=args.slop,
+            workers=args.workers, stats=stats):
+        output.write(json.dumps({"request": request, "results": results}) + "\n")
+        latencies.append(runtime)
+    if output is not sys.stdout:
+        output.close()
+    total_time = utilities.timepoint() - start
+
+    print(f"Requests {len(requests)} QPS {len(requests) / total_time:.1f} "
+          f"p50(ms) {utilities.percentile(latencies, 50):.3f} p99(ms) {utilities.percentile(latencies, 99):.3f} "
+          f"PL_reads {stats['pl_reads']}", file=sys.stderr)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--request", "-r",
         help="User request, use quotes to handle multiwords request (with whitespaces between keywords)",
         type=str)
+    parser.add_argument(
+        "--conjonctive", "-c", help="All keywords must be in the results (AND request)", action="store_true")
+    parser.add_argument(
+        "--phrase", help="The keywords must be consecutive, in this order (needs --positions when building)",
+        action="store_true")
+    parser.add_argument(
+        "--slop", help="With --phrase, number of extra words allowed between the keywords", type=int, default=0)
+    parser.add_argument("--top", "-k", help="Only output the k best results", type=int, default=None)
     parser.add_argument("--voc", help="Filename of the VOC", type=str, default=DEFAULT_VOC_FILE)
     parser.add_argument("--pl", help="Filename of the PL", type=str, default=DEFAULT_PL_FILE)
     parser.add_argument("--reg", help="Filename of the Doc Register", type=str, default=DEFAULT_REGISTER_FILE)
     parser.add_argument("--voc_type", help="Type of the PL to instantiate", type=str, default="VOC_Hashmap")
+    parser.add_argument(
+        "--index", help="Folder of a segmented index (see --append of main_build_and_save_if.py)", type=str)
+    parser.add_argument(
+        "--batch", help="File of requests, one per line ('-' for stdin): results are written as JSON lines",
+        type=str)
+    parser.add_argument("--output", "-o", help="With --batch, file of the results ('-' for stdout)", default="-")
+    parser.add_argument("--workers", "-w", help="With --batch, number of processes running requests", type=int,
+                        default=1)
     parser.add_argument("--time", "-t", help="Output runtime in milliseconds", action="store_true")
     parser.add_argument(
         "--memory", "-m",
         help="Last output line is the RAM used in bytes (diff between start and end RAM values)",
         action="store_true")
+    parser.add_argument(
+        "--profile", help="Write the timers and counters of the stages to that file: JSON, or folded stacks for "
+                          "flame graphs if it ends with '.folded'. Batch workers are not detailed", type=str)
     args = parser.parse_args()
+    if args.top is not None and args.top < 1:
+        parser.error("--top must be at least 1")
+    if args.phrase and args.index:
+        parser.error("--phrase cannot be used with --index")
+    if args.batch and args.index:
+        parser.error("--batch cannot be used with --index")
+    if not args.batch and args.request is None:
+        parser.error("--request or --batch is required")
 
+    if args.profile:
+        instrumentation.enable()
     pr = Process()
     start_time = utilities.timepoint()
     start_ram = pr.memory_info().rss
 
-    voc_type: type = eval(f"voc.{args.voc_type}")
-    inverted_file = InvertedFile.read_from_files(args.voc, args.pl, args.reg, voc_type)
-
-    user_keywords = utilities.convert_str_to_tokens(args.request)
-    run_search(user_keywords, inverted_file)
+    if args.batch:
+        run_batch_requests(args)
+    else:
+        run_single_request(args)
 
     end_time = utilities.timepoint()
+
     gc.collect()
     end_ram = pr.memory_info().rss
     output_str = ""
@@ -47,7 +122,10 @@ def main():
         output_str += " "
     if args.memory:
         output_str += f"Memory(bytes) {end_ram - start_ram}"
-    print(output_str)
+    # In batch mode, the standard output may be the results.
+    print(output_str, file=sys.stderr if args.batch else sys.stdout)
+    if args.profile:
+        instrumentation.write_report(args.profile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+import argparse
+import asyncio
+
+from global_values import *
+from inverted_file import InvertedFile
+from pl_cache import PL_Cached
+from query_cache import QueryCache
+from query_server import QueryServer
+import utilities
+import voc
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--voc", help="Filename of the VOC", type=str, default=DEFAULT_VOC_FILE)
+    parser.add_argument("--pl", help="Filename of the PL", type=str, default=DEFAULT_PL_FILE)
+    parser.add_argument("--reg", help="Filename of the Doc Register", type=str, default=DEFAULT_REGISTER_FILE)
+    parser.add_argument("--voc_type", help="Type of the VOC to instantiate", type=str, default="VOC_Hashmap")
+    parser.add_argument("--host", help="TCP address to listen on", type=str, default=DEFAULT_SERVER_HOST)
+    parser.add_argument("--port", "-p", help="TCP port to listen on", type=int, default=DEFAULT_SERVER_PORT)
+    parser.add_argument("--unix", help="Listen on that Unix socket instead of TCP", type=str, default=None)
+    parser.add_argument(
+        "--cache_entries", help="Maximal number of requests in the result cache, 0 to disable it",
+        type=int, default=1024)
+    parser.add_argument(
+        "--cache_memory", help="Maximal memory of the result cache (ex: 64M)", type=utilities.parse_size, default="64M")
+    parser.add_argument(
+        "--pl_cache_memory", help="Maximal memory of the cache of decoded PLs (ex: 256M), 0 to disable it",
+        type=utilities.parse_size, default="0")
+    parser.add_argument(
+        "--pl_cache_policy", help="Eviction policy of the cache of decoded PLs", type=str,
+        choices=["tinylfu", "lru"], default="tinylfu")
+    args = parser.parse_args()
+
+    voc_type: type = eval(f"voc.{args.voc_type}")
+
+    def open_inverted_file() -> InvertedFile:
+        inverted_file = InvertedFile.read_from_files(args.voc, args.pl, args.reg, voc_type)
+        if args.pl_cache_memory:
+            inverted_file.pl = PL_Cached(inverted_file.pl, args.pl_cache_memory, args.pl_cache_policy)
+        return inverted_file
+
+    query_cache = None
+    if args.cache_entries:
+        query_cache = QueryCache(max_entries=args.cache_entries, max_memory=args.cache_memory)
+    # The files are reopened when a new build replaces them.
+    server = QueryServer(open_inverted_file(), query_cache, reopen=open_inverted_file)
+
+    print(f"Listening on {args.unix or f'{args.host}:{args.port}'}", flush=True)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
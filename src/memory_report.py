@@ -0,0 +1,97 @@
+"""
+Memory accounting of the structures of an IF: deep size and number of objects by type of the VOC, the PL and
+the DocRegister, compared with the size of their files. Used by '--memory_report' of main_build_and_save_if.py,
+with the memory peaks of the build stages traced by 'instrumentation'.
+"""
+
+import json
+import sys
+import types
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import instrumentation
+
+# Objects shared by the whole program, which are not part of a structure.
+_IGNORED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_size(obj: Any) -> Tuple[int, Counter]:
+    """
+    Returns the size in bytes of the object and of all objects it refers to, and their number by type name.
+    Each object is counted once. Numpy arrays are counted with their data only if they own it,
+    so arrays on a mmap only count their header.
+    """
+    seen = set()
+    objects_by_type: Counter = Counter()
+    size = 0
+    to_visit = [obj]
+    while to_visit:
+        current = to_visit.pop()
+        if id(current) in seen or isinstance(current, _IGNORED_TYPES):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        objects_by_type[type(current).__name__] += 1
+
+        if isinstance(current, dict):
+            to_visit.extend(current.keys())
+            to_visit.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            to_visit.extend(current)
+        if hasattr(current, "__dict__"):
+            to_visit.append(current.__dict__)
+        slots = getattr(type(current), "__slots__", ())
+        for slot in (slots,) if isinstance(slots, str) else slots:
+            if hasattr(current, slot):
+                to_visit.append(getattr(current, slot))
+    return size, objects_by_type
+
+
+def structures_report(inverted_file) -> Dict[str, Dict[str, Any]]:
+    """
+    Deep size and objects of the VOC, the PL and the DocRegister of the IF.
+    Objects shared by several structures, such as the terms, are counted in each one.
+    """
+    report = {}
+    for name, structure in (("voc", inverted_file.voc), ("pl", inverted_file.pl), ("register", inverted_file.register)):
+        size, objects_by_type = deep_size(structure)
+        report[name] = {
+            "type": type(structure).__name__,
+            "bytes": size,
+            "objects": sum(objects_by_type.values()),
+            "objects_by_type": dict(objects_by_type.most_common()),
+        }
+    return report
+
+
+def files_report(structures: Dict[str, Dict[str, Any]], voc_file: str, pl_file: str, registry_file: str
+                 ) -> Dict[str, Dict[str, Any]]:
+    """
+    Size of the files of the IF, and the ratio of the in-memory size of each structure to it.
+    """
+    report = {}
+    for name, filename in (("voc", voc_file), ("pl", pl_file), ("register", registry_file)):
+        file_size = Path(filename).stat().st_size
+        report[name] = {
+            "file": filename,
+            "bytes": file_size,
+            "memory_to_disk_ratio": structures[name]["bytes"] / file_size if file_size else None,
+        }
+    return report
+
+
+def write_memory_report(filename: str, structures: Dict[str, Dict[str, Any]], files: Dict[str, Dict[str, Any]] = None
+                        ) -> None:
+    """
+    Writes the structures and files reports as JSON, with the memory peaks of the stages if memory was traced.
+    """
+    report = {"structures": structures}
+    if files is not None:
+        report["files"] = files
+    if instrumentation.TRACE_MEMORY:
+        report["stages"] = instrumentation.report()["memory"]
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
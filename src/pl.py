@@ -1,8 +1,13 @@
+from array import array
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 import mmap
+import struct
 from global_values import DEFAULT_PL_FILE
 
+import numpy as np
+
+import instrumentation
 import utilities
 
 
@@ -38,12 +43,44 @@ class PL:
         """
         raise NotImplementedError()
 
+    def set_pl_array(self, pl_id: int, doc_ids: np.ndarray, scores: np.ndarray) -> None:
+        """
+        Replaces all entries of the given PL by the given docIDs and scores.
+        """
+        raise NotImplementedError()
+
+    def append_pl_array(self, pl_id: int, doc_ids: np.ndarray, scores: np.ndarray) -> None:
+        """
+        Adds the given docIDs and scores at the end of the given PL.
+        """
+        for doc_id, score in zip(doc_ids.tolist(), scores.tolist()):
+            self.update(pl_id, doc_id, score)
+
+    def free_pl(self, pl_id: int) -> None:
+        """
+        Releases the memory of the given PL, which must not be used anymore.
+        """
+        pass
+
     def get_pl(self, pl_id: int, size: int) -> List[PLEntry]:
         """
         Returns a Python list with all entries for the given PL.
         """
         raise NotImplementedError()
 
+    def get_entry(self, pl_id: int, size: int, index: int) -> PLEntry:
+        """
+        Returns the entry at the given index of the PL, without reading the whole PL if possible.
+        """
+        return self.get_pl(pl_id, size)[index]
+
+    def get_pl_array(self, pl_id: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the docIDs and the scores of all entries of the given PL, as two NumPy arrays.
+        """
+        pl = self.get_pl(pl_id, size)
+        return np.array([pl_entry.docID for pl_entry in pl]), np.array([pl_entry.score for pl_entry in pl])
+
 
 class ReadOnlyPL:
     """
@@ -62,6 +99,25 @@ class ReadOnlyPL:
         """
         raise NotImplementedError()
 
+    def close(self) -> None:
+        """
+        Releases the file. In "write" mode, it ensures everything is written.
+        """
+        pass
+
+    def get_entry(self, pl_id: int, size: int, index: int) -> PLEntry:
+        """
+        Returns the entry at the given index of the PL, without reading the whole PL if possible.
+        """
+        return self.get_pl(pl_id, size)[index]
+
+    def get_pl_array(self, pl_id: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the docIDs and the scores of all entries of the given PL, as two NumPy arrays.
+        """
+        pl = self.get_pl(pl_id, size)
+        return np.array([pl_entry.docID for pl_entry in pl]), np.array([pl_entry.score for pl_entry in pl])
+
 
 class PL_PythonLists(PL):
     """
@@ -87,6 +143,64 @@ class PL_PythonLists(PL):
     def get_pl(self, pl_id: int, size: int) -> List[PLEntry]:
         return self.pl[pl_id]
 
+    def set_pl_array(self, pl_id: int, doc_ids: np.ndarray, scores: np.ndarray) -> None:
+        self.pl[pl_id] = [
+            PLEntry(docID=doc_id, score=score) for doc_id, score in zip(doc_ids.tolist(), scores.tolist())]
+
+    def free_pl(self, pl_id: int) -> None:
+        self.pl[pl_id] = None
+
+
+class PL_Arrays(PL):
+    """
+    Compact implementation: each PL is an array of docIDs and an array of scores (of occurences while parsing),
+    instead of a PLEntry object per entry.
+    pl_id = index in the Python lists.
+    size is unused.
+    """
+
+    def __init__(self) -> None:
+        super(PL_Arrays, self).__init__()
+        self.doc_ids: List[array] = []
+        self.scores: List[array] = []
+
+    def update(self, pl_id: int, doc_id: int, score: int) -> None:
+        self.doc_ids[pl_id].append(doc_id)
+        self.scores[pl_id].append(score)
+
+    def create_new_pl(self, doc_id: int, score: int) -> int:
+        pl_id = len(self.doc_ids)
+        self.doc_ids.append(array("I", (doc_id,)))
+        self.scores.append(array("I", (score,)))
+        return pl_id
+
+    def get_pl(self, pl_id: int, size: int) -> List[PLEntry]:
+        return [
+            PLEntry(docID=doc_id, score=score)
+            for doc_id, score in zip(self.doc_ids[pl_id].tolist(), self.scores[pl_id].tolist())]
+
+    def get_entry(self, pl_id: int, size: int, index: int) -> PLEntry:
+        return PLEntry(docID=self.doc_ids[pl_id][index], score=self.scores[pl_id][index])
+
+    def get_pl_array(self, pl_id: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Copies: an array cannot grow while a NumPy array uses its memory.
+        return np.array(self.doc_ids[pl_id]), np.array(self.scores[pl_id])
+
+    def append_pl_array(self, pl_id: int, doc_ids: np.ndarray, scores: np.ndarray) -> None:
+        self.doc_ids[pl_id].frombytes(np.asarray(doc_ids, dtype=np.uint32).tobytes())
+        self.scores[pl_id].frombytes(np.asarray(scores, dtype=self.scores[pl_id].typecode).tobytes())
+
+    def set_pl_array(self, pl_id: int, doc_ids: np.ndarray, scores: np.ndarray) -> None:
+        self.doc_ids[pl_id] = array("I", np.asarray(doc_ids, dtype=np.uint32).tobytes())
+        if scores.dtype.kind == "f":
+            self.scores[pl_id] = array("d", np.asarray(scores, dtype=np.float64).tobytes())
+        else:
+            self.scores[pl_id] = array("q", np.asarray(scores, dtype=np.int64).tobytes())
+
+    def free_pl(self, pl_id: int) -> None:
+        self.doc_ids[pl_id] = None
+        self.scores[pl_id] = None
+
 
 class PL_PythonLists_ReadOnly(ReadOnlyPL):
     def __init__(self, filename: str) -> None:
@@ -104,7 +218,7 @@ class PL_MMap(ReadOnlyPL):
     On construction, 2 modes are possible:
       - "read" (try to open the file from disk, filesize can be omitted)
       - "write" (try to create and write to file in disk).
-    The size is fixed at construction.
+    In "write" mode, PLs are packed in bulk and appended to the file through a buffer, so its size is not needed.
     pl_id is offset in file.
     size is number of consecutive entries.
     """
@@ -112,6 +226,9 @@ class PL_MMap(ReadOnlyPL):
     _DOC_ID_LENGTH = 4  # A doc ID is encoded in 4 bytes.
     _SCORE_LENGTH = 2  # A score is encoded in 2 bytes.
     PL_ENTRY_LENGTH = _DOC_ID_LENGTH + _SCORE_LENGTH
+    # Layout of an entry, to read a whole PL as a NumPy array without copy.
+    PL_ENTRY_DTYPE = np.dtype([("docID", "<u4"), ("score", "<u2")])
+    WRITE_BUFFER_SIZE = 1024 ** 2  # Size of the buffer of the file in "write" mode, in bytes.
 
     def __init__(self, filename: str, mode: str, filesize: int = 0) -> None:
         super(PL_MMap, self).__init__(filename=filename or DEFAULT_PL_FILE)
@@ -121,44 +238,65 @@ class PL_MMap(ReadOnlyPL):
         if mode == "read":
             if not filesize:
                 self.filesize = Path(self.filename).stat().st_size
-            file_open_mode = "rb"
-            mmap_open_mode = mmap.ACCESS_READ
             self.current_size = None  # Using it is illegal in read mode
+            self.file = open(self.filename, mode="rb", buffering=0)
+            self.mmap = mmap.mmap(self.file.fileno(), self.filesize, access=mmap.ACCESS_READ)
         elif mode == "write":
-            if filesize == 0:
-                raise RuntimeError("missing 'filesize' argument")
-            file_open_mode = "ab+"
-            mmap_open_mode = mmap.ACCESS_WRITE
             self.current_size = 0  # Currently used bytes in the file, starting from 0.
-            utilities.create_empty_file_with_size(file=self.filename, size=self.filesize, erase_if_present=True)
+            self.file = open(self.filename, mode="wb", buffering=self.WRITE_BUFFER_SIZE)
         else:
             raise RuntimeError(f"wrong parameter for mode: {mode}")
 
-        self.file = open(self.filename, mode=file_open_mode, buffering=0)
-        self.mmap = mmap.mmap(self.file.fileno(), self.filesize, access=mmap_open_mode)
+    def add(self, pl_to_add: List[PLEntry]) -> int:
+        return self.add_array(
+            np.array([pl_entry.docID for pl_entry in pl_to_add]), np.array([pl_entry.score for pl_entry in pl_to_add]))
 
-    def add(self, pl_to_add: List[PLEntry]):
+    def add_array(self, doc_ids: np.ndarray, scores: np.ndarray) -> int:
+        """
+        Appends a PL given as arrays of docIDs and scores. Returns its pl_id.
+        """
         if not self.mode == "write":
             raise RuntimeError("wrong mode, expected write")
+        check_scores(scores)
+        entries = np.empty(len(doc_ids), dtype=self.PL_ENTRY_DTYPE)
+        entries["docID"] = doc_ids
+        entries["score"] = scores
         used_pl_id = self.current_size
-        written_length = self._write_pl_of_single_word(used_pl_id, pl_to_add)
-        self.current_size += written_length
+        self.file.write(entries.data)
+        self.current_size += entries.nbytes
         return used_pl_id
 
+    def close(self) -> None:
+        if self.mode == "read":
+            self.mmap.close()
+        self.file.close()
+
     def get_pl(self, pl_id: int, size: int) -> List[PLEntry]:
         if not self.mode == "read":
             raise RuntimeError("wrong mode, expected read")
+        if instrumentation.ENABLED:
+            instrumentation.count("pl/postings_read", size)
         return self._read_pl_of_single_word(pl_id, size)
 
-    def _write_pl_of_single_word(self, pl_id: int, entries: List[PLEntry]) -> int:
-        to_write = bytearray(self.PL_ENTRY_LENGTH * len(entries))
-        i = 0
-        for entry in entries:
-            to_write[i:i+self.PL_ENTRY_LENGTH] = self._pl_entry_to_bytearray(entry)
-            i += self.PL_ENTRY_LENGTH
-        self.mmap.seek(pl_id)
-        self.mmap.write(to_write)
-        return len(to_write)
+    def get_entry(self, pl_id: int, size: int, index: int) -> PLEntry:
+        if not self.mode == "read":
+            raise RuntimeError("wrong mode, expected read")
+        if instrumentation.ENABLED:
+            instrumentation.count("pl/entries_read")
+        offset = pl_id + index * self.PL_ENTRY_LENGTH
+        return self._bytearray_to_pl_entry(self.mmap[offset:offset + self.PL_ENTRY_LENGTH])
+
+    def get_pl_array(self, pl_id: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The arrays are read-only views of the mmap: nothing is copied nor decoded.
+        The PL cannot be closed while they are in use.
+        """
+        if not self.mode == "read":
+            raise RuntimeError("wrong mode, expected read")
+        if instrumentation.ENABLED:
+            instrumentation.count("pl/postings_read", size)
+        entries = np.frombuffer(self.mmap, dtype=self.PL_ENTRY_DTYPE, count=size, offset=pl_id)
+        return entries["docID"], entries["score"]
 
     def _read_pl_of_single_word(self, pl_id: int, size: int) -> List[PLEntry]:
         result = []
@@ -170,16 +308,203 @@ class PL_MMap(ReadOnlyPL):
             result.append(entry)
         return result
 
-    @classmethod
-    def _pl_entry_to_bytearray(cls, entry: PLEntry) -> bytearray:
-        result = bytearray(cls.PL_ENTRY_LENGTH)
-        result[:cls._DOC_ID_LENGTH] = int(entry.docID).to_bytes(cls._DOC_ID_LENGTH, "little")
-        result[cls._DOC_ID_LENGTH:] = int(entry.score).to_bytes(cls._SCORE_LENGTH, "little")
-        return result
-
     @classmethod
     def _bytearray_to_pl_entry(cls, bar: bytearray) -> PLEntry:
         result = PLEntry()
         result.docID = int.from_bytes(bar[:cls._DOC_ID_LENGTH], "little")
         result.score = int.from_bytes(bar[cls._DOC_ID_LENGTH:], "little")
         return result
+
+
+class PL_MMapCompressed(ReadOnlyPL):
+    """
+    Compressed version of PL_MMap, with the same 2 modes.
+    In "write" mode, PLs are packed in bulk and appended to the file through a buffer, so its size is not needed.
+    The file starts with MAGIC. Then each PL is split in blocks of BLOCK_SIZE consecutive entries:
+      - first, the header of each block: docID of its last entry and offset of its data after the headers;
+      - then, the data of each block: docIDs as gaps with the previous docID in variable-byte encoding,
+        followed by the scores.
+    A single entry can be read by decoding only its block.
+    pl_id is offset in file.
+    size is number of entries.
+    """
+
+    MAGIC = b"PLC1"
+    BLOCK_SIZE = 128  # Number of entries in a block.
+    _BLOCK_HEADER = struct.Struct("<II")  # Last docID of the block, offset of the block data.
+    _SCORE_FORMAT = "<{}H"  # A score is encoded in 2 bytes.
+
+    def __init__(self, filename: str, mode: str) -> None:
+        super(PL_MMapCompressed, self).__init__(filename=filename or DEFAULT_PL_FILE)
+        self.mode = mode
+        self._last_decoded_block = (None, None, None, None)  # pl_id, block number, docIDs, scores
+
+        if mode == "read":
+            self.file = open(self.filename, mode="rb")
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.mmap[:len(self.MAGIC)] != self.MAGIC:
+                raise RuntimeError(f"'{self.filename}' is not a compressed PL file")
+            self.current_size = None  # Using it is illegal in read mode
+        elif mode == "write":
+            self.file = open(self.filename, mode="wb", buffering=PL_MMap.WRITE_BUFFER_SIZE)
+            self.file.write(self.MAGIC)
+            self.current_size = len(self.MAGIC)  # Currently used bytes in the file.
+        else:
+            raise RuntimeError(f"wrong parameter for mode: {mode}")
+
+    def add(self, pl_to_add: List[PLEntry]) -> int:
+        return self.add_array(
+            np.array([pl_entry.docID for pl_entry in pl_to_add]), np.array([pl_entry.score for pl_entry in pl_to_add]))
+
+    def add_array(self, doc_ids: np.ndarray, scores: np.ndarray) -> int:
+        """
+        Appends a PL given as arrays of docIDs and scores. Returns its pl_id.
+        """
+        if not self.mode == "write":
+            raise RuntimeError("wrong mode, expected write")
+        check_scores(scores)
+        used_pl_id = self.current_size
+        to_write = self._encode_pl(np.asarray(doc_ids, dtype=np.int64), np.asarray(scores, dtype="<u2"))
+        self.file.write(to_write)
+        self.current_size += len(to_write)
+        return used_pl_id
+
+    def close(self) -> None:
+        if self.mode == "read":
+            self.mmap.close()
+        self.file.close()
+
+    def get_pl(self, pl_id: int, size: int) -> List[PLEntry]:
+        if not self.mode == "read":
+            raise RuntimeError("wrong mode, expected read")
+        if instrumentation.ENABLED:
+            instrumentation.count("pl/postings_read", size)
+        result = []
+        for block in range(self._nb_blocks(size)):
+            doc_ids, scores = self._decode_block(pl_id, size, block)
+            result.extend(PLEntry(docID=doc_id, score=score) for doc_id, score in zip(doc_ids, scores))
+        return result
+
+    def get_entry(self, pl_id: int, size: int, index: int) -> PLEntry:
+        if not self.mode == "read":
+            raise RuntimeError("wrong mode, expected read")
+        if instrumentation.ENABLED:
+            instrumentation.count("pl/entries_read")
+        block = index // self.BLOCK_SIZE
+        last_pl_id, last_block, doc_ids, scores = self._last_decoded_block
+        if last_pl_id != pl_id or last_block != block:
+            doc_ids, scores = self._decode_block(pl_id, size, block)
+            self._last_decoded_block = (pl_id, block, doc_ids, scores)
+        index_in_block = index % self.BLOCK_SIZE
+        return PLEntry(docID=doc_ids[index_in_block], score=scores[index_in_block])
+
+    def get_pl_array(self, pl_id: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.mode == "read":
+            raise RuntimeError("wrong mode, expected read")
+        if instrumentation.ENABLED:
+            instrumentation.count("pl/postings_read", size)
+        doc_ids = np.empty(size, dtype=np.uint32)
+        scores = np.empty(size, dtype=np.uint16)
+        for block in range(self._nb_blocks(size)):
+            block_doc_ids, block_scores = self._decode_block(pl_id, size, block)
+            doc_ids[block * self.BLOCK_SIZE:block * self.BLOCK_SIZE + len(block_doc_ids)] = block_doc_ids
+            scores[block * self.BLOCK_SIZE:block * self.BLOCK_SIZE + len(block_scores)] = block_scores
+        return doc_ids, scores
+
+    @classmethod
+    def _nb_blocks(cls, size: int) -> int:
+        return (size + cls.BLOCK_SIZE - 1) // cls.BLOCK_SIZE
+
+    @classmethod
+    def _encode_pl(cls, doc_ids: np.ndarray, scores: np.ndarray) -> bytearray:
+        """
+        The gaps of all docIDs are encoded at once, then the blocks are assembled from slices of them.
+        """
+        if len(doc_ids) <= cls.BLOCK_SIZE:
+            # For a single block, encoding the gaps one by one is faster than the NumPy calls.
+            blocks = bytearray()
+            previous_doc_id = 0
+            for doc_id in doc_ids.tolist():
+                utilities.append_varbyte(blocks, doc_id - previous_doc_id)
+                previous_doc_id = doc_id
+            return cls._BLOCK_HEADER.pack(previous_doc_id, 0) + blocks + scores.tobytes()
+
+        gaps_bytes, gaps_lengths = utilities.encode_varbytes(np.diff(doc_ids, prepend=0))
+        gaps_ends = np.cumsum(gaps_lengths).tolist()
+        headers = bytearray()
+        blocks = bytearray()
+        for start in range(0, len(doc_ids), cls.BLOCK_SIZE):
+            end = min(start + cls.BLOCK_SIZE, len(doc_ids))
+            headers += cls._BLOCK_HEADER.pack(int(doc_ids[end - 1]), len(blocks))
+            blocks += gaps_bytes[gaps_ends[start - 1] if start else 0:gaps_ends[end - 1]].tobytes()
+            blocks += scores[start:end].tobytes()
+        return headers + blocks
+
+    def _decode_block(self, pl_id: int, size: int, block: int) -> Tuple[List[int], Tuple[int, ...]]:
+        """
+        Returns the docIDs and the scores of the given block of the PL.
+        """
+        if instrumentation.ENABLED:
+            instrumentation.count("pl/blocks_decoded")
+        nb_blocks = self._nb_blocks(size)
+        nb_entries = min(self.BLOCK_SIZE, size - block * self.BLOCK_SIZE)
+        header_size = self._BLOCK_HEADER.size
+        if block:
+            previous_doc_id, _ = self._BLOCK_HEADER.unpack_from(self.mmap, pl_id + (block - 1) * header_size)
+        else:
+            previous_doc_id = 0
+        _, block_offset = self._BLOCK_HEADER.unpack_from(self.mmap, pl_id + block * header_size)
+        position = pl_id + nb_blocks * header_size + block_offset
+
+        data = self.mmap
+        doc_ids = []
+        for _ in range(nb_entries):
+            # Inlined 'utilities.read_varbyte', as it is called for every entry.
+            gap = 0
+            shift = 0
+            byte = data[position]
+            while byte & 0x80:
+                gap |= (byte & 0x7F) << shift
+                shift += 7
+                position += 1
+                byte = data[position]
+            gap |= byte << shift
+            position += 1
+            previous_doc_id += gap
+            doc_ids.append(previous_doc_id)
+
+        scores = struct.unpack_from(self._SCORE_FORMAT.format(nb_entries), data, position)
+        return doc_ids, scores
+
+
+def check_scores(scores: np.ndarray) -> None:
+    """
+    PL files store the scores in 2 bytes.
+    """
+    scores = np.asarray(scores)
+    if len(scores) and (scores.min() < 0 or scores.max() > 0xFFFF):
+        raise RuntimeError("scores of PL files must be between 0 and 65535")
+
+
+def create_pl_writer(filename: str, pl_format: str):
+    """
+    Returns a PL in "write" mode.
+    :param pl_format: "raw" (PL_MMap) or "compressed" (PL_MMapCompressed).
+    """
+    if pl_format == "raw":
+        return PL_MMap(filename=filename, mode="write")
+    elif pl_format == "compressed":
+        return PL_MMapCompressed(filename=filename, mode="write")
+    else:
+        raise RuntimeError(f"wrong parameter for pl_format: {pl_format}")
+
+
+def open_pl(filename: str) -> ReadOnlyPL:
+    """
+    Opens a PL file in "read" mode, whatever the format it was written with.
+    """
+    with open(filename or DEFAULT_PL_FILE, "rb") as f:
+        magic = f.read(len(PL_MMapCompressed.MAGIC))
+    if magic == PL_MMapCompressed.MAGIC:
+        return PL_MMapCompressed(filename=filename, mode="read")
+    return PL_MMap(filename=filename, mode="read")
@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from pl import PLEntry, ReadOnlyPL
+
+
+class FrequencySketch:
+    """
+    Approximate access counts of keys (Count-Min sketch with DEPTH rows of small counters).
+    Every 'sample_size' increments, all counters are halved so that old popularity fades away.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, width: int = 4096, sample_size: int = 40960) -> None:
+        self.width = width
+        self.sample_size = sample_size
+        self.counters = [bytearray(width) for _ in range(self.DEPTH)]
+        self.nb_increments = 0
+
+    def _indexes(self, key: int) -> List[int]:
+        return [hash((row, key)) % self.width for row in range(self.DEPTH)]
+
+    def increment(self, key: int) -> None:
+        for row, index in zip(self.counters, self._indexes(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+        self.nb_increments += 1
+        if self.nb_increments >= self.sample_size:
+            self.counters = [bytearray(count >> 1 for count in row) for row in self.counters]
+            self.nb_increments //= 2
+
+    def estimate(self, key: int) -> int:
+        return min(row[index] for row, index in zip(self.counters, self._indexes(key)))
+
+
+class PL_Cached(ReadOnlyPL):
+    """
+    Keeps the decoded arrays of the most useful PLs of another ReadOnlyPL, within a budget of bytes.
+    Two policies are available:
+      - "tinylfu": recently used PLs are kept in LRU order, but a new PL only enters the cache
+        if it was accessed more often than the PLs it would evict, according to a FrequencySketch.
+        One-off requests on rare terms cannot flush the hot PLs;
+      - "lru": every PL enters the cache, the least recently used ones are evicted.
+    Only whole PLs are cached. Reading a single entry of a PL not in the cache does not add it.
+    """
+
+    def __init__(self, pl: ReadOnlyPL, max_memory: int, policy: str = "tinylfu") -> None:
+        super().__init__(filename=pl.filename)
+        if policy not in ("tinylfu", "lru"):
+            raise RuntimeError(f"wrong parameter for policy: {policy}")
+        self.pl = pl
+        self.max_memory = max_memory
+        self.policy = policy
+        self.sketch = FrequencySketch()
+        self.entries: "OrderedDict[int, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self.memory = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.rejections = 0
+        self.evictions = 0
+
+    def get_pl_array(self, pl_id: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The arrays are read-only as they are shared by all callers.
+        """
+        self.sketch.increment(pl_id)
+        arrays = self.entries.get(pl_id)
+        if arrays is not None:
+            self.hits += 1
+            self.entries.move_to_end(pl_id)
+            return arrays
+
+        self.misses += 1
+        doc_ids, scores = self.pl.get_pl_array(pl_id, size)
+        arrays = (np.array(doc_ids), np.array(scores))  # Copies, in case they are views of the file.
+        for array in arrays:
+            array.flags.writeable = False
+        self._admit(pl_id, arrays)
+        return arrays
+
+    def get_pl(self, pl_id: int, size: int) -> List[PLEntry]:
+        doc_ids, scores = self.get_pl_array(pl_id, size)
+        return [PLEntry(docID=doc_id, score=score) for doc_id, score in zip(doc_ids.tolist(), scores.tolist())]
+
+    def get_entry(self, pl_id: int, size: int, index: int) -> PLEntry:
+        arrays = self.entries.get(pl_id)
+        if arrays is None:
+            return self.pl.get_entry(pl_id, size, index)
+        return PLEntry(docID=int(arrays[0][index]), score=arrays[1][index].item())
+
+    def close(self) -> None:
+        self.entries.clear()
+        self.memory = 0
+        self.pl.close()
+
+    def _admit(self, pl_id: int, arrays: Tuple[np.ndarray, np.ndarray]) -> None:
+        size = arrays[0].nbytes + arrays[1].nbytes
+        if size > self.max_memory:
+            self.rejections += 1
+            return
+
+        # Least recently used PLs to evict to make room for the new one.
+        victims = []
+        freed_memory = 0
+        for victim_pl_id, (victim_doc_ids, victim_scores) in self.entries.items():
+            if self.memory - freed_memory + size <= self.max_memory:
+                break
+            victims.append(victim_pl_id)
+            freed_memory += victim_doc_ids.nbytes + victim_scores.nbytes
+
+        if self.policy == "tinylfu" and victims:
+            candidate_frequency = self.sketch.estimate(pl_id)
+            if any(self.sketch.estimate(victim_pl_id) >= candidate_frequency for victim_pl_id in victims):
+                self.rejections += 1
+                return
+
+        for victim_pl_id in victims:
+            del self.entries[victim_pl_id]
+        self.memory -= freed_memory
+        self.evictions += len(victims)
+        self.entries[pl_id] = arrays
+        self.memory += size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejections": self.rejections,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "memory": self.memory,
+        }
@@ -0,0 +1,102 @@
+import mmap
+import struct
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from utilities import append_varbyte, read_varbyte
+
+
+def encode_positions(positions: List[int]) -> bytes:
+    """
+    Encodes increasing positions as the variable-byte gaps between them.
+    """
+    buffer = bytearray()
+    previous = 0
+    for position in positions:
+        append_varbyte(buffer, position - previous)
+        previous = position
+    return bytes(buffer)
+
+
+def decode_positions(data, start: int = 0, end: int = None) -> List[int]:
+    """
+    Decodes the positions written by 'encode_positions' between 'start' and 'end' in the data.
+    """
+    if end is None:
+        end = len(data)
+    positions = []
+    position = 0
+    while start < end:
+        gap, start = read_varbyte(data, start)
+        position += gap
+        positions.append(position)
+    return positions
+
+
+class Positions_MMap:
+    """
+    READ-ONLY POSITIONS FILE.
+    Gives the positions of the term in the document of each PL entry, found by PL identifier and index in the PL.
+    Layout:
+      - header;
+      - identifiers of the PLs, in increasing order (8 bytes each);
+      - index of the first entry of each PL in the list of all entries, one more than PLs (8 bytes each);
+      - offset of the positions of each entry in the data, one more than entries (8 bytes each);
+      - data: positions of each entry, encoded by 'encode_positions'.
+    """
+
+    MAGIC = b"POS1"
+    _HEADER = struct.Struct("<4sQQ")  # MAGIC, number of PLs, number of entries.
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.file = open(filename, mode="rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, nb_pls, nb_entries = self._HEADER.unpack_from(self.mmap)
+        if magic != self.MAGIC:
+            raise RuntimeError(f"not a positions file: {filename}")
+        offset = self._HEADER.size
+        self.pl_ids = np.frombuffer(self.mmap, dtype="<u8", count=nb_pls, offset=offset)
+        offset += self.pl_ids.nbytes
+        self.first_entries = np.frombuffer(self.mmap, dtype="<u8", count=nb_pls + 1, offset=offset)
+        offset += self.first_entries.nbytes
+        self.entries_offsets = np.frombuffer(self.mmap, dtype="<u8", count=nb_entries + 1, offset=offset)
+        offset += self.entries_offsets.nbytes
+        self.data_start = offset
+
+    def get_positions(self, pl_id: int, index: int) -> List[int]:
+        """
+        Returns the positions of the entry at the given index of the PL.
+        """
+        pl_index = int(np.searchsorted(self.pl_ids, pl_id))
+        entry = int(self.first_entries[pl_index]) + index
+        start = self.data_start + int(self.entries_offsets[entry])
+        end = self.data_start + int(self.entries_offsets[entry + 1])
+        return decode_positions(self.mmap, start, end)
+
+    def close(self) -> None:
+        self.pl_ids = self.first_entries = self.entries_offsets = None
+        self.mmap.close()
+        self.file.close()
+
+    @classmethod
+    def write(cls, filename: str, pls: Iterable[Tuple[int, List[bytes]]]) -> None:
+        """
+        Writes the positions file from pairs of <PL identifier, encoded positions of each entry of the PL>.
+        """
+        pls = sorted(pls, key=lambda item: item[0])
+        pl_ids = np.array([pl_id for pl_id, _ in pls], dtype="<u8")
+        first_entries = np.zeros(len(pls) + 1, dtype="<u8")
+        np.cumsum([len(entries) for _, entries in pls], out=first_entries[1:])
+        all_entries = [encoded for _, entries in pls for encoded in entries]
+        entries_offsets = np.zeros(len(all_entries) + 1, dtype="<u8")
+        np.cumsum([len(encoded) for encoded in all_entries], out=entries_offsets[1:])
+
+        with open(filename, "wb") as f:
+            f.write(cls._HEADER.pack(cls.MAGIC, len(pl_ids), len(all_entries)))
+            f.write(pl_ids.tobytes())
+            f.write(first_entries.tobytes())
+            f.write(entries_offsets.tobytes())
+            f.write(b"".join(all_entries))
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from inverted_file import RequestResult
+
+CacheKey = Tuple[FrozenSet[str], bool, Optional[int]]
+
+
+class QueryCache:
+    """
+    LRU cache of request results.
+    Keys are the set of normalized tokens of the request (see 'utilities.convert_str_to_tokens'),
+    so the same keywords in another order or case share their results.
+    Results are only valid for one generation of the index: when it changes, the cache is emptied.
+    The memory used by the results is estimated, not measured.
+    """
+
+    RESULT_SIZE = 200  # Estimated memory of a RequestResult and its Document, in bytes (without the title).
+
+    def __init__(self, max_entries: int = 1024, max_memory: int = 64 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self.generation: str = None
+        self.entries: "OrderedDict[CacheKey, Tuple[List[RequestResult], int]]" = OrderedDict()
+        self.memory = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(tokens: List[str], conjonctive: bool = False, k: int = None) -> CacheKey:
+        return frozenset(tokens), conjonctive, k
+
+    def get(self, key: CacheKey, generation: str) -> Optional[List[RequestResult]]:
+        """
+        Returns a copy of the cached results, or None if they are not in the cache.
+        """
+        self._check_generation(generation)
+        item = self.entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return list(item[0])
+
+    def put(self, key: CacheKey, generation: str, results: List[RequestResult]) -> None:
+        self._check_generation(generation)
+        size = sum(self.RESULT_SIZE + len(req_res.doc.title) for req_res in results)
+        if size > self.max_memory:
+            return
+
+        if key in self.entries:
+            self.memory -= self.entries.pop(key)[1]
+        self.entries[key] = (list(results), size)
+        self.memory += size
+
+        while len(self.entries) > self.max_entries or self.memory > self.max_memory:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.memory -= evicted_size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.memory = 0
+
+    def _check_generation(self, generation: str) -> None:
+        if generation != self.generation:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.generation = generation
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self.entries),
+            "memory": self.memory,
+            "generation": self.generation,
+        }
@@ -0,0 +1,193 @@
+"""
+Long-running query server: the Inverted File is loaded once and answers many requests.
+Protocol: one JSON object per line in both directions.
+  - request: {"request": "keywords", "conjonctive": false, "k": null}
+  - response: {"results": [{"id": 1, "no": "LA...", "title": "...", "score": 12}, ...]} or {"error": "message"}
+  - statistics of the query cache: {"stats": true}, answered by {"stats": {"hits": 0, ...}, "pl_cache": ...}
+    "pl_cache" holds the statistics of the PL cache, if the PL of the Inverted File is a PL_Cached.
+A new build of the index replaces its files: the server then reopens them (see 'QueryServer').
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, Callable, Dict, List, Tuple
+
+import utilities
+from inverted_file import InvertedFile
+from pl_cache import PL_Cached
+from query_cache import QueryCache
+
+STREAM_LIMIT = 64 * 1024 * 1024  # Maximal length of a line, responses can list many documents.
+
+
+class QueryServer:
+    def __init__(
+            self, inverted_file: InvertedFile, query_cache: QueryCache = None,
+            reopen: Callable[[], InvertedFile] = None) -> None:
+        """
+        If 'reopen' is given, the generation file of the IF is checked before each request. Once a new build
+        replaced it, 'reopen' gives the new IF: its new generation misses the results cached for the previous one.
+        """
+        self.inverted_file = inverted_file
+        self.query_cache = query_cache
+        self.reopen = reopen
+        if reopen:
+            self.generation_file = f"{inverted_file.pl.filename}{InvertedFile.GENERATION_FILE_SUFFIX}"
+            self.generation_stat = self._stat_generation_file()
+
+    def _stat_generation_file(self) -> Tuple[int, int]:
+        """
+        Returns the inode and the modification time of the generation file: renaming a new file over it changes them.
+        """
+        try:
+            stat = os.stat(self.generation_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _reopen_if_rebuilt(self) -> None:
+        generation_stat = self._stat_generation_file()
+        if generation_stat == self.generation_stat:
+            return
+        # The previous files are unmapped once the arrays read from them are freed.
+        self.inverted_file = self.reopen()
+        self.generation_stat = generation_stat
+
+    def answer(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Runs the request described by the message and returns the response message.
+        Raises ValueError if the message is not a valid request.
+        """
+        if not isinstance(message, dict):
+            raise ValueError("a message must be a JSON object")
+        if self.reopen:
+            self._reopen_if_rebuilt()
+        if message.get("stats"):
+            return {
+                "stats": self.query_cache.stats() if self.query_cache else None,
+                "pl_cache": self.inverted_file.pl.stats() if isinstance(self.inverted_file.pl, PL_Cached) else None,
+            }
+
+        if not isinstance(message.get("request"), str):
+            raise ValueError("'request' must be a string")
+        k = message.get("k")
+        # bool is a subclass of int.
+        if k is not None and (not isinstance(k, int) or isinstance(k, bool) or k < 1):
+            raise ValueError(f"wrong parameter for k: {k!r}")
+        user_keywords = utilities.convert_str_to_tokens(message["request"])
+        conjonctive = bool(message.get("conjonctive"))
+
+        results = None
+        if self.query_cache:
+            cache_key = QueryCache.make_key(user_keywords, conjonctive, k)
+            results = self.query_cache.get(cache_key, self.inverted_file.generation)
+        if results is None:
+            if conjonctive:
+                results = self.inverted_file.request_words_conjonctive(user_keywords, k=k)
+            else:
+                results = self.inverted_file.request_words_disjonctive(user_keywords, k=k)
+            if self.query_cache:
+                self.query_cache.put(cache_key, self.inverted_file.generation, results)
+
+        return {
+            "results": [
+                {"id": req_res.doc.id, "no": req_res.doc.no, "title": req_res.doc.title, "score": req_res.score}
+                for req_res in results]
+        }
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Requests are answered one at a time: they only use the CPU, so concurrency comes from the event loop
+        # interleaving the clients between requests.
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.answer(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, unix_path: str = None) -> None:
+        """
+        Listens on the Unix socket if a path is given, else on the TCP address. Never returns.
+        """
+        if unix_path:
+            server = await asyncio.start_unix_server(self._handle_client, path=unix_path, limit=STREAM_LIMIT)
+        else:
+            server = await asyncio.start_server(self._handle_client, host, port, limit=STREAM_LIMIT)
+        async with server:
+            await server.serve_forever()
+
+
+class QueryClient:
+    """
+    Connection to a QueryServer. Requests are sent one after the other.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str, port: int, unix_path: str = None):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(path=unix_path, limit=STREAM_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=STREAM_LIMIT)
+        return cls(reader, writer)
+
+    async def request(self, request: str, conjonctive: bool = False, k: int = None) -> Dict[str, Any]:
+        return await self.send({"request": request, "conjonctive": conjonctive, "k": k})
+
+    async def send(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        self.writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by the server")
+        return json.loads(line)
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def generate_load(
+        host: str, port: int, unix_path: str, requests: List[str], nb_connections: int, nb_requests: int,
+        conjonctive: bool = False, k: int = None) -> Dict[str, float]:
+    """
+    Sends 'nb_requests' requests over 'nb_connections' concurrent connections, cycling through 'requests'.
+    Returns the throughput in requests per second and latency percentiles in milliseconds.
+    """
+    latencies: List[float] = []
+    next_request = 0
+
+    async def run_connection():
+        nonlocal next_request
+        client = await QueryClient.connect(host, port, unix_path)
+        while next_request < nb_requests:
+            request = requests[next_request % len(requests)]
+            next_request += 1
+            start = utilities.timepoint()
+            await client.request(request, conjonctive=conjonctive, k=k)
+            latencies.append(1000 * (utilities.timepoint() - start))
+        await client.close()
+
+    start = utilities.timepoint()
+    await asyncio.gather(*(run_connection() for _ in range(nb_connections)))
+    runtime = utilities.timepoint() - start
+
+    return {
+        "requests": len(latencies),
+        "qps": len(latencies) / runtime,
+        "p50_ms": utilities.percentile(latencies, 50),
+        "p99_ms": utilities.percentile(latencies, 99),
+    }
@@ -0,0 +1,259 @@
+import json
+import math
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from doc_register import DocRegister
+from inverted_file import InvertedFile, RequestResult
+from main import parse_files
+from pl import PL_Arrays, PLEntry, ReadOnlyPL
+from voc import VOC_Hashmap
+
+
+class SegmentedIndex:
+    """
+    On-disk index made of immutable segments, each one with its own VOC, PL and Doc Register.
+    New files are indexed in a new segment, without reading the existing ones.
+
+    The PLs of the segments store the number of occurences of the terms instead of their scores.
+    Scores are computed at request time with the number of documents and the PL sizes of the whole index,
+    so they are the same as in a single IF built on all the files, and adding a segment rescores nothing.
+    A document must not be indexed in two segments.
+    """
+
+    MANIFEST_FILE = "segments.json"
+    MERGE_FACTOR = 4  # Number of segments of similar sizes merged together by 'merge'.
+
+    def __init__(self, folder: str, voc_type: type = VOC_Hashmap, pl_format: str = "raw") -> None:
+        """
+        Opens the segmented index of that folder, which is created if it does not exist.
+        """
+        self.folder = Path(folder)
+        self.voc_type = voc_type
+        self.pl_format = pl_format
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+        manifest_file = self.folder / self.MANIFEST_FILE
+        if manifest_file.exists():
+            manifest = json.loads(manifest_file.read_text())
+        else:
+            manifest = {"segments": [], "next_segment": 0, "generation": uuid.uuid4().hex}
+        self.segments_names: List[str] = manifest["segments"]
+        self.next_segment: int = manifest["next_segment"]
+        # Identifies the content of the index: it changes each time a segment is added or merged.
+        self.generation: str = manifest["generation"]
+        self.segments: List[InvertedFile] = [self._open_segment(name) for name in self.segments_names]
+
+    def _segment_files(self, name: str) -> Tuple[str, str, str]:
+        return tuple(str(self.folder / f"{name}.{extension}") for extension in ("voc", "pl", "reg"))
+
+    def _open_segment(self, name: str) -> InvertedFile:
+        return InvertedFile.read_from_files(*self._segment_files(name), voc_type=self.voc_type)
+
+    def _write_segment(self, inverted_file: InvertedFile) -> str:
+        """
+        Sorts the PLs of the IF by docID and writes it as a new segment. Returns the name of the segment.
+        Block maximal scores are computed on the occurences, see '_ScoredSegmentPL'.
+        """
+        for voc_entry in inverted_file.voc.iterate():
+            doc_ids, occurences = inverted_file.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size)
+            order = np.argsort(doc_ids, kind="stable")
+            inverted_file.pl.set_pl_array(voc_entry.pl_id, doc_ids[order], occurences[order])
+            voc_entry.update_max_scores(doc_ids[order], occurences[order])
+
+        name = f"segment_{self.next_segment:06d}"
+        self.next_segment += 1
+        inverted_file.write_to_files(*self._segment_files(name), pl_format=self.pl_format)
+        return name
+
+    def _write_manifest(self) -> None:
+        """
+        Replaces the manifest at once, so that a crash leaves either the previous or the new list of segments.
+        """
+        self.generation = uuid.uuid4().hex
+        manifest = {"segments": self.segments_names, "next_segment": self.next_segment, "generation": self.generation}
+        temporary_file = self.folder / f"{self.MANIFEST_FILE}.tmp"
+        temporary_file.write_text(json.dumps(manifest))
+        os.replace(temporary_file, self.folder / self.MANIFEST_FILE)
+
+    def add_segment(self, files: List[str], parser: str = "stream", workers: int = 1) -> str:
+        """
+        Indexes the files in a new segment. Returns the name of the segment.
+        Raises ValueError if a document of the files is already indexed: nothing is written then.
+        """
+        inverted_file = InvertedFile(voc=self.voc_type(), pl=PL_Arrays())
+        parse_files(files, inverted_file, parser=parser, workers=workers)
+        self._check_new_documents(inverted_file.register)
+        name = self._write_segment(inverted_file)
+
+        self.segments_names.append(name)
+        self.segments.append(self._open_segment(name))
+        self._write_manifest()
+        return name
+
+    def _check_new_documents(self, register: DocRegister) -> None:
+        """
+        Raises ValueError if a docID of the register is indexed twice in it, or is already indexed in a segment.
+        """
+        doc_ids = [doc.id for doc in register.iterate()]
+        if len(set(doc_ids)) != len(doc_ids):
+            raise ValueError("the files index the same document twice")
+        for name, segment in zip(self.segments_names, self.segments):
+            for doc_id in doc_ids:
+                if segment.register.get_by_id(doc_id) is not None:
+                    raise ValueError(f"document {doc_id} is already indexed in {name}")
+
+    def merge(self, merge_all: bool = False) -> int:
+        """
+        Size-tiered merge: segments are grouped in tiers by their number of documents (powers of MERGE_FACTOR),
+        and MERGE_FACTOR segments of the same tier are merged into one, until no tier has that many segments.
+        If 'merge_all', all segments are merged into one.
+        Returns the number of merges.
+        """
+        nb_merges = 0
+        while len(self.segments) > 1:
+            if merge_all:
+                positions = list(range(len(self.segments)))
+            else:
+                tiers: Dict[int, List[int]] = {}
+                for position, segment in enumerate(self.segments):
+                    tier = int(math.log(max(len(segment.register), 1), self.MERGE_FACTOR))
+                    tiers.setdefault(tier, []).append(position)
+                full_tiers = [positions for _, positions in sorted(tiers.items())
+                              if len(positions) >= self.MERGE_FACTOR]
+                if not full_tiers:
+                    break
+                positions = full_tiers[0][:self.MERGE_FACTOR]
+            self._merge_segments(positions)
+            nb_merges += 1
+        return nb_merges
+
+    def _merge_segments(self, positions: List[int]) -> None:
+        """
+        Replaces the segments at those positions by a single segment, at the position of the first one.
+        """
+        inverted_file = InvertedFile(voc=self.voc_type(), pl=PL_Arrays())
+        for position in positions:
+            segment = self.segments[position]
+            postings = ((word, *segment.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size))
+                        for word, voc_entry in segment.voc.iterate2())
+            inverted_file.merge_partial_index(segment.register.iterate(), postings)
+        name = self._write_segment(inverted_file)
+
+        old_names = [self.segments_names[position] for position in positions]
+        for position in sorted(positions, reverse=True):
+            self.segments[position].close()
+            del self.segments[position]
+            del self.segments_names[position]
+        self.segments_names.insert(positions[0], name)
+        self.segments.insert(positions[0], self._open_segment(name))
+        self._write_manifest()
+
+        for old_name in old_names:
+            for filename in self._segment_files(old_name):
+                for path in (Path(filename), Path(f"{filename}{InvertedFile.GENERATION_FILE_SUFFIX}")):
+                    if path.exists():
+                        path.unlink()
+
+    def __len__(self) -> int:
+        """
+        Number of documents of all segments.
+        """
+        return sum(len(segment.register) for segment in self.segments)
+
+    def _scored_segments(self, words: List[str]) -> List[InvertedFile]:
+        """
+        Returns, for each segment, an IF limited to the terms of the request whose PL gives the global scores.
+        """
+        # Segments of an index share the normalizer of its terms.
+        terms = list(set(self.segments[0].prepare_word(word) for word in words)) if self.segments else []
+        nb_docs = len(self)
+        pl_sizes = {
+            term: sum(segment.voc[term].pl_size for segment in self.segments if term in segment.voc)
+            for term in terms}
+
+        scored_segments = []
+        for segment in self.segments:
+            voc = VOC_Hashmap()
+            pls_global_sizes = {}
+            for term in terms:
+                if term not in segment.voc:
+                    continue
+                voc_entry = segment.voc[term]
+                pls_global_sizes[voc_entry.pl_id] = pl_sizes[term]
+                voc.add_entry(term, voc_entry.pl_id, voc_entry.pl_size)
+                # Scores grow with occurences if idf >= 0 and decrease otherwise: the bound is at one of the ends.
+                block_max_scores = InvertedFile.compute_pl_scores(
+                    np.array(voc_entry.block_max_scores), nb_docs, pl_sizes[term])
+                min_score = InvertedFile.compute_pl_scores(np.array([1]), nb_docs, pl_sizes[term])[0]
+                voc[term].block_max_scores = np.maximum(block_max_scores, min_score).tolist()
+                voc[term].max_score = max(voc[term].block_max_scores)
+                voc[term].block_last_doc_ids = voc_entry.block_last_doc_ids
+
+            scored_segment = InvertedFile(
+                voc=voc, pl=_ScoredSegmentPL(segment.pl, nb_docs, pls_global_sizes), normalizer=segment.normalizer)
+            scored_segment.register = segment.register
+            scored_segments.append(scored_segment)
+        return scored_segments
+
+    def request_words_disjonctive(self, words: List[str], k: int = None) -> List[RequestResult]:
+        """
+        Makes an "OR" request of the words on each segment and merges the results.
+        """
+        return self._merge_results(
+            [segment.request_words_disjonctive(words, k=k) for segment in self._scored_segments(words)], k)
+
+    def request_words_conjonctive(self, words: List[str], k: int = None) -> List[RequestResult]:
+        """
+        Makes an "AND" request of the words on each segment and merges the results.
+        """
+        return self._merge_results(
+            [segment.request_words_conjonctive(words, k=k) for segment in self._scored_segments(words)], k)
+
+    @staticmethod
+    def _merge_results(results_of_segments: List[List[RequestResult]], k: int) -> List[RequestResult]:
+        """
+        A document is in a single segment, so results are only sorted again by descending score.
+        Top-k results are sorted by descending score then by ascending docID, as 'InvertedFile._request_top_k'.
+        """
+        results = [req_res for results in results_of_segments for req_res in results]
+        if k is None:
+            results.sort(key=lambda req_res: req_res.score, reverse=True)
+            return results
+        results.sort(key=lambda req_res: (-req_res.score, req_res.doc.id))
+        return results[:k]
+
+
+class _ScoredSegmentPL(ReadOnlyPL):
+    """
+    Converts the occurences stored in the PLs of a segment to scores.
+    'pls_global_sizes' gives the size of each PL in the whole index, only these PLs can be read.
+    """
+
+    def __init__(self, pl: ReadOnlyPL, nb_docs: int, pls_global_sizes: Dict[int, int]) -> None:
+        super().__init__(filename=pl.filename)
+        self.pl = pl
+        self.nb_docs = nb_docs
+        self.idfs = {pl_id: math.log(nb_docs / (1 + size)) for pl_id, size in pls_global_sizes.items()}
+        self.pls_global_sizes = pls_global_sizes
+
+    def _score(self, pl_id: int, occurences: int) -> int:
+        # Same operations as 'InvertedFile.compute_pl_scores'.
+        return int(100 * (1 + math.log(occurences)) * self.idfs[pl_id])
+
+    def get_pl(self, pl_id: int, size: int) -> List[PLEntry]:
+        return [
+            PLEntry(docID=pl_entry.docID, score=self._score(pl_id, pl_entry.score))
+            for pl_entry in self.pl.get_pl(pl_id, size)]
+
+    def get_entry(self, pl_id: int, size: int, index: int) -> PLEntry:
+        pl_entry = self.pl.get_entry(pl_id, size, index)
+        return PLEntry(docID=pl_entry.docID, score=self._score(pl_id, pl_entry.score))
+
+    def get_pl_array(self, pl_id: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        doc_ids, occurences = self.pl.get_pl_array(pl_id, size)
+        return doc_ids, InvertedFile.compute_pl_scores(occurences, self.nb_docs, self.pls_global_sizes[pl_id])
@@ -0,0 +1,209 @@
+import heapq
+import pickle
+import shutil
+import tempfile
+from array import array
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+import instrumentation
+from document import Document
+from inverted_file import InvertedFile
+from pl import ReadOnlyPL, create_pl_writer, open_pl
+from voc import VOC
+
+
+class SPIMIInvertedFile(InvertedFile):
+    """
+    Inverted File built with a bounded amount of memory (Single-Pass In-Memory Indexing).
+    Postings are accumulated in memory until the budget is reached,
+    then they are sorted by term and flushed to a "run" file on disk.
+    Runs are compacted by size tiers while flushing, so that their number only grows with the logarithm
+    of the number of blocks.
+    'write_to_files' merges all runs and writes the scored PLs straight into the PL file.
+    The IF cannot be queried before it is saved.
+    """
+
+    # Rough estimations of the memory used by the in-memory block, in bytes.
+    _POSTING_SIZE = 2 * array("I").itemsize  # docID and occurences in the array of the term
+    _TERM_SIZE = 200  # dict slot, term string, array header
+    RUNS_PER_TIER = 8  # Number of runs of a tier merged into one run of the next tier.
+    MERGE_FAN_IN = 64  # Maximal number of runs read at once: each one has an open file and a read buffer.
+
+    def __init__(self, voc: VOC, max_memory: int, runs_folder: str = None) -> None:
+        super().__init__(voc=voc, pl=None)
+        self.max_memory = max_memory
+        self.runs_folder = Path(tempfile.mkdtemp(prefix="spimi_runs_", dir=runs_folder))
+        self.runs: List[Tuple[Path, int]] = []  # Run files in the order of their docIDs, with their tier.
+        self.nb_run_files = 0  # Number of run files written, to name the next one.
+
+        # Current in-memory block: for each term, docIDs and occurences interleaved.
+        self.block: Dict[str, array] = {}
+        self.block_memory = 0
+
+    def notify_word_appeared(self, word: str, docID: int, occurences: int) -> None:
+        block_pl = self._get_block_pl(word)
+        block_pl.append(docID)
+        block_pl.append(occurences)
+        self._add_block_postings(1)
+
+    def merge_partial_index(
+            self, documents: Iterable[Document], postings: Iterable[Tuple[str, np.ndarray, np.ndarray]]) -> None:
+        for doc in documents:
+            self.register_document(doc)
+        for word, doc_ids, occurences in postings:
+            interleaved = np.empty(2 * len(doc_ids), dtype=np.uint32)
+            interleaved[0::2] = doc_ids
+            interleaved[1::2] = occurences
+            self._get_block_pl(word).frombytes(interleaved.tobytes())
+            self._add_block_postings(len(doc_ids))
+
+    def _get_block_pl(self, word: str) -> array:
+        """
+        Returns the interleaved PL of the term in the in-memory block, created if needed.
+        """
+        block_pl = self.block.get(word)
+        if block_pl is None:
+            block_pl = array("I")
+            self.block[word] = block_pl
+            self.block_memory += self._TERM_SIZE + len(word)
+        return block_pl
+
+    def _add_block_postings(self, nb_postings: int) -> None:
+        """
+        Accounts for postings added to the in-memory block, and flushes it once the budget is reached.
+        """
+        self.block_memory += nb_postings * self._POSTING_SIZE
+        if instrumentation.ENABLED:
+            instrumentation.count("postings", nb_postings)
+
+        if self.block_memory >= self.max_memory:
+            self.flush_block()
+
+    def flush_block(self) -> None:
+        """
+        Sorts the in-memory block by term and writes it to a new run file.
+        """
+        if not self.block:
+            return
+
+        if instrumentation.ENABLED:
+            instrumentation.count("spimi/runs")
+        self.runs.append((self._write_run(sorted(self.block.items(), key=itemgetter(0))), 0))
+
+        self.block = {}
+        self.block_memory = 0
+        self._compact_runs()
+
+    def _compact_runs(self) -> None:
+        """
+        Size-tiered compaction: once the last RUNS_PER_TIER runs have the same tier, they are merged into a run
+        of the next tier. Tiers never grow along the list of runs, so only consecutive runs are merged.
+        """
+        while len(self.runs) >= self.RUNS_PER_TIER and self.runs[-self.RUNS_PER_TIER][1] == self.runs[-1][1]:
+            self._merge_runs_into_run(len(self.runs) - self.RUNS_PER_TIER, len(self.runs))
+
+    def _merge_runs_into_run(self, start: int, end: int) -> None:
+        """
+        Replaces the runs between 'start' and 'end' by a single run, of the tier above theirs.
+        """
+        if instrumentation.ENABLED:
+            instrumentation.count("spimi/merged_runs")
+        runs = self.runs[start:end]
+        run_file = self._write_run(self._merge_runs([run_file for run_file, _ in runs]))
+        for merged_run_file, _ in runs:
+            merged_run_file.unlink()
+        self.runs[start:end] = [(run_file, max(tier for _, tier in runs) + 1)]
+
+    def _write_run(self, items: Iterable[Tuple[str, array]]) -> Path:
+        """
+        Writes the PLs of the terms, sorted by term, to a new run file. Returns its path.
+        """
+        run_file = self.runs_folder / f"run{self.nb_run_files}.bin"
+        self.nb_run_files += 1
+        with open(run_file, "wb") as f:
+            pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            for item in items:
+                pickler.dump(item)
+        return run_file
+
+    def _write_chunk(
+            self, new_pl: ReadOnlyPL, words: List[str], pls_arrays: List[Tuple[np.ndarray, np.ndarray]], D: int
+    ) -> None:
+        """
+        Scores the PLs of the words, given by their docIDs and occurences, then writes them and adds them to the VOC.
+        """
+        for word, (doc_ids, _) in zip(words, pls_arrays):
+            self.voc.add_entry(word, 0, len(doc_ids))
+        voc_entries = [self.voc[word] for word in words]
+        for voc_entry, (doc_ids, scores) in zip(voc_entries, self.sort_and_score_pls(pls_arrays, voc_entries, D)):
+            voc_entry.pl_id = new_pl.add_array(doc_ids, scores)
+
+    @classmethod
+    def _read_run(cls, run_file: Path) -> Iterable[Tuple[str, array]]:
+        with open(run_file, "rb") as f:
+            unpickler = pickle.Unpickler(f)
+            while True:
+                try:
+                    yield unpickler.load()
+                except EOFError:
+                    return
+
+    @classmethod
+    def _merge_runs(cls, runs: List[Path]) -> Iterable[Tuple[str, array]]:
+        """
+        K-way merge of the runs: yields each term with its PL in all runs, sorted by term.
+        PLs are concatenated in run order for a given term so that the docIDs stay ordered like in a serial build.
+        """
+        merged_runs = heapq.merge(*[cls._read_run(run_file) for run_file in runs], key=itemgetter(0))
+        for word, items in groupby(merged_runs, key=itemgetter(0)):
+            _, postings = next(items)
+            for _, block_pl in items:
+                postings.extend(block_pl)
+            yield word, postings
+
+    def compute_scores(self, convert_to_int: bool = True):
+        """
+        Scores are computed while merging the runs in 'write_to_files'. Here we only flush the last block.
+        """
+        self.flush_block()
+
+    def generate_mmap_pl(self, pl_file: str, pl_format: str = "raw", compute_scores: bool = False):
+        """
+        K-way merge of the runs. The PL of each term is scored then written to the PL file, whatever 'compute_scores'.
+        PLs are scored by chunks of about WRITE_CHUNK_SIZE postings.
+        If there are more than MERGE_FAN_IN runs, groups of MERGE_FAN_IN consecutive runs are first merged into
+        intermediate runs, in as many passes as needed.
+        """
+        self.flush_block()
+        D = len(self.register)  # Number total of documents
+        new_pl = create_pl_writer(pl_file, pl_format)
+
+        while len(self.runs) > self.MERGE_FAN_IN:
+            # From the last group, so that merging a group does not move the next ones.
+            for start in reversed(range(0, len(self.runs), self.MERGE_FAN_IN)):
+                if len(self.runs) - start > 1:
+                    self._merge_runs_into_run(start, min(start + self.MERGE_FAN_IN, len(self.runs)))
+
+        words: List[str] = []
+        pls_arrays: List[Tuple[np.ndarray, np.ndarray]] = []
+        chunk_size = 0
+        for word, merged_pl in self._merge_runs([run_file for run_file, _ in self.runs]):
+            # DocIDs and occurences are interleaved in the PLs of the runs.
+            postings = np.frombuffer(merged_pl, dtype=np.uint32)
+            words.append(word)
+            pls_arrays.append((postings[0::2], postings[1::2]))
+            chunk_size += len(postings) // 2
+            if chunk_size >= self.WRITE_CHUNK_SIZE:
+                self._write_chunk(new_pl, words, pls_arrays, D)
+                words, pls_arrays, chunk_size = [], [], 0
+        self._write_chunk(new_pl, words, pls_arrays, D)
+
+        new_pl.close()
+        self.pl = open_pl(pl_file)
+        shutil.rmtree(self.runs_folder, ignore_errors=True)
+        self.runs = []
@@ -0,0 +1,138 @@
+"""
+Porter stemming algorithm, as described in:
+M.F. Porter, "An algorithm for suffix stripping", Program 14(3), 1980.
+"""
+
+from typing import Callable, List, Tuple
+
+
+def _is_consonant(word: str, i: int) -> bool:
+    if word[i] in "aeiou":
+        return False
+    if word[i] == "y":
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(stem: str) -> int:
+    """
+    Number 'm' of vowels-consonants sequences in the stem, which is written [C](VC){m}[V].
+    """
+    m = 0
+    previous_is_vowel = False
+    for i in range(len(stem)):
+        is_vowel = not _is_consonant(stem, i)
+        if previous_is_vowel and not is_vowel:
+            m += 1
+        previous_is_vowel = is_vowel
+    return m
+
+
+def _contains_vowel(stem: str) -> bool:
+    return any(not _is_consonant(stem, i) for i in range(len(stem)))
+
+
+def _ends_with_double_consonant(word: str) -> bool:
+    return len(word) >= 2 and word[-1] == word[-2] and _is_consonant(word, len(word) - 1)
+
+
+def _ends_with_cvc(word: str) -> bool:
+    """
+    The word ends with consonant-vowel-consonant, the last consonant not being w, x or y (ex: hop, not snow).
+    """
+    return (len(word) >= 3 and _is_consonant(word, len(word) - 3) and not _is_consonant(word, len(word) - 2)
+            and _is_consonant(word, len(word) - 1) and word[-1] not in "wxy")
+
+
+def _replace_suffix(word: str, rules: List[Tuple[str, str]], condition: Callable[[str], bool]) -> str:
+    """
+    Replaces the longest suffix of the rules ending the word, if what precedes it satisfies the condition.
+    """
+    for suffix, replacement in rules:
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            return stem + replacement if condition(stem) else word
+    return word
+
+
+def _by_decreasing_length(rules: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return sorted(rules, key=lambda rule: -len(rule[0]))
+
+
+_STEP_2_RULES = _by_decreasing_length([
+    ("ational", "ate"), ("tional", "tion"), ("enci", "ence"), ("anci", "ance"), ("izer", "ize"), ("abli", "able"),
+    ("alli", "al"), ("entli", "ent"), ("eli", "e"), ("ousli", "ous"), ("ization", "ize"), ("ation", "ate"),
+    ("ator", "ate"), ("alism", "al"), ("iveness", "ive"), ("fulness", "ful"), ("ousness", "ous"), ("aliti", "al"),
+    ("iviti", "ive"), ("biliti", "ble")])
+_STEP_3_RULES = _by_decreasing_length([
+    ("icate", "ic"), ("ative", ""), ("alize", "al"), ("iciti", "ic"), ("ical", "ic"), ("ful", ""), ("ness", "")])
+_STEP_4_RULES = _by_decreasing_length([
+    (suffix, "") for suffix in (
+        "al", "ance", "ence", "er", "ic", "able", "ible", "ant", "ement", "ment", "ent", "ion", "ou", "ism", "ate",
+        "iti", "ous", "ive", "ize")])
+
+
+def _step_1(word: str) -> str:
+    # Step 1a: plurals.
+    if word.endswith("sses") or word.endswith("ies"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+
+    # Step 1b: past participles.
+    removed_suffix = False
+    if word.endswith("eed"):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    elif word.endswith("ed") and _contains_vowel(word[:-2]):
+        word = word[:-2]
+        removed_suffix = True
+    elif word.endswith("ing") and _contains_vowel(word[:-3]):
+        word = word[:-3]
+        removed_suffix = True
+    if removed_suffix:
+        if word.endswith("at") or word.endswith("bl") or word.endswith("iz"):
+            word += "e"
+        elif _ends_with_double_consonant(word) and word[-1] not in "lsz":
+            word = word[:-1]
+        elif _measure(word) == 1 and _ends_with_cvc(word):
+            word += "e"
+
+    # Step 1c.
+    if word.endswith("y") and _contains_vowel(word[:-1]):
+        word = word[:-1] + "i"
+    return word
+
+
+def _step_4(word: str) -> str:
+    if word.endswith("ion"):
+        stem = word[:-3]
+        if _measure(stem) > 1 and stem[-1:] in ("s", "t"):
+            return stem
+        return word
+    return _replace_suffix(word, _STEP_4_RULES, lambda stem: _measure(stem) > 1)
+
+
+def _step_5(word: str) -> str:
+    if word.endswith("e"):
+        stem = word[:-1]
+        m = _measure(stem)
+        if m > 1 or (m == 1 and not _ends_with_cvc(stem)):
+            word = stem
+    if word.endswith("ll") and _measure(word) > 1:
+        word = word[:-1]
+    return word
+
+
+def porter_stem(word: str) -> str:
+    """
+    Returns the stem of a lowercase word. Words of 2 letters or less and words with other characters
+    than ASCII letters (numbers, "aaron's"...) are returned unchanged.
+    """
+    if len(word) <= 2 or not (word.isascii() and word.isalpha()):
+        return word
+    word = _step_1(word)
+    word = _replace_suffix(word, _STEP_2_RULES, lambda stem: _measure(stem) > 0)
+    word = _replace_suffix(word, _STEP_3_RULES, lambda stem: _measure(stem) > 0)
+    word = _step_4(word)
+    return _step_5(word)
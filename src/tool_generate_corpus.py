@@ -0,0 +1,155 @@
+"""
+Generates a synthetic corpus of "la******.xml" files, in the same shape as the fixed LA Times files:
+<customroot><DOC><DOCNO>...<DOCID>...<DATE>...<HEADLINE><P>...<TEXT><P>...</DOC>...</customroot>
+
+Words are drawn from a vocabulary following a Zipf law: the stop words are the most frequent words,
+followed by pronounceable made-up words. Document lengths follow a log-normal distribution.
+Each file is generated from the seed and its number only, so a corpus is the same whatever the number of workers,
+and a bigger corpus with the same seed starts with the same files.
+"""
+
+import argparse
+import math
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from utilities import DATASETS_FOLDER, get_stop_words
+
+_CONSONANTS = "bcdfghjklmnprstvz"
+_VOWELS = "aeiou"
+_SYLLABLES = [consonant + vowel for consonant in _CONSONANTS for vowel in _VOWELS]
+
+HEADLINE_LENGTH = (3, 12)  # Minimal and maximal number of words of a headline.
+PARAGRAPH_LENGTH = (20, 80)  # Minimal and maximal number of words of a paragraph.
+SENTENCE_LENGTH = (6, 25)  # Minimal and maximal number of words of a sentence.
+
+
+def make_vocabulary(size: int) -> List[str]:
+    """
+    Returns 'size' distinct words, by decreasing frequency: the stop words, then made-up words.
+    """
+    stop_words = sorted(word for word in get_stop_words() if word.isalpha())
+    vocabulary = stop_words[:size]
+    stop_words = set(stop_words)
+    number = 0
+    while len(vocabulary) < size:
+        # The syllables of a word are the digits of its number in base len(_SYLLABLES).
+        syllables = []
+        remainder = number
+        while True:
+            syllables.append(_SYLLABLES[remainder % len(_SYLLABLES)])
+            remainder //= len(_SYLLABLES)
+            if not remainder:
+                break
+        word = "".join(syllables)
+        if word not in stop_words:
+            vocabulary.append(word)
+        number += 1
+    return vocabulary
+
+
+def zipf_cdf(size: int, exponent: float) -> np.ndarray:
+    """
+    Cumulative probabilities of the ranks 1 to 'size', the probability of rank r being proportional to r^-exponent.
+    """
+    probabilities = np.arange(1, size + 1, dtype=np.float64) ** -exponent
+    cdf = np.cumsum(probabilities)
+    return cdf / cdf[-1]
+
+
+def _write_text(rng: np.random.Generator, words: List[str], paragraphs: List[str]) -> None:
+    """
+    Splits the words in sentences (capitalized first word, final dot) and paragraphs.
+    A paragraph is written on a single line, as line breaks are removed when parsing.
+    """
+    start = 0
+    while start < len(words):
+        end = min(len(words), start + int(rng.integers(PARAGRAPH_LENGTH[0], PARAGRAPH_LENGTH[1] + 1)))
+        sentence_start = start
+        while sentence_start < end:
+            sentence_end = min(end, sentence_start + int(rng.integers(SENTENCE_LENGTH[0], SENTENCE_LENGTH[1] + 1)))
+            words[sentence_start] = words[sentence_start].capitalize()
+            words[sentence_end - 1] += "."
+            sentence_start = sentence_end
+        paragraphs.append(" ".join(words[start:end]))
+        start = end
+
+
+def generate_file(
+        file_number: int, first_docid: int, nb_docs: int, args, vocabulary: List[str], cdf: np.ndarray) -> str:
+    """
+    Writes the file of that number, with 'nb_docs' documents starting at 'first_docid'. Returns its path.
+    """
+    rng = np.random.default_rng([args.seed, file_number])
+    # mean of a log-normal distribution = exp(mu + sigma^2 / 2)
+    mu = math.log(args.mean_length) - args.length_sigma ** 2 / 2
+    lengths = np.maximum(1, rng.lognormal(mu, args.length_sigma, nb_docs).astype(np.int64))
+    headline_lengths = rng.integers(HEADLINE_LENGTH[0], HEADLINE_LENGTH[1] + 1, nb_docs)
+    ranks = np.searchsorted(cdf, rng.random(int(lengths.sum() + headline_lengths.sum())))
+    all_words = [vocabulary[rank] for rank in np.minimum(ranks, len(vocabulary) - 1).tolist()]
+
+    name = f"la{file_number:06d}"
+    parts = ["<customroot>"]
+    position = 0
+    for i in range(nb_docs):
+        headline = " ".join(all_words[position:position + headline_lengths[i]])
+        position += headline_lengths[i]
+        text_paragraphs: List[str] = []
+        _write_text(rng, all_words[position:position + lengths[i]], text_paragraphs)
+        position += lengths[i]
+
+        parts.append(f"<DOC>\n<DOCNO> {name.upper()}-{i:04d} </DOCNO>\n<DOCID> {first_docid + i} </DOCID>\n")
+        parts.append("<DATE>\n<P>\nJanuary 1, 1989, Sunday\n</P>\n</DATE>\n")
+        parts.append(f"<HEADLINE>\n<P>\n{headline}\n</P>\n</HEADLINE>\n<TEXT>\n")
+        parts.extend(f"<P>\n{paragraph}\n</P>\n" for paragraph in text_paragraphs)
+        parts.append("</TEXT>\n</DOC>\n")
+    parts.append("</customroot>")
+
+    path = Path(args.output) / f"{name}.xml"
+    path.write_text("".join(parts))
+    return str(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", "-o", help="Folder of the files", type=str, default=str(DATASETS_FOLDER))
+    parser.add_argument("--docs", "-d", help="Number of documents", type=int, default=10000)
+    parser.add_argument("--docs_per_file", help="Number of documents of each file", type=int, default=500)
+    parser.add_argument("--vocabulary", help="Number of distinct words", type=int, default=100000)
+    parser.add_argument("--zipf", help="Exponent of the Zipf law of the words", type=float, default=1.1)
+    parser.add_argument("--mean_length", help="Mean number of words of a text", type=float, default=250)
+    parser.add_argument(
+        "--length_sigma", help="Standard deviation of the logarithm of the lengths of texts", type=float, default=0.8)
+    parser.add_argument("--seed", help="Seed of the random generators", type=int, default=0)
+    parser.add_argument(
+        "--first_file", help="Number of the first file (files are named la000000.xml, la000001.xml...)",
+        type=int, default=0)
+    parser.add_argument("--workers", "-w", help="Number of processes writing files", type=int, default=1)
+    args = parser.parse_args()
+    if args.first_file + (args.docs - 1) // args.docs_per_file >= 10 ** 6:
+        parser.error("file numbers must have at most 6 digits")
+
+    Path(args.output).mkdir(parents=True, exist_ok=True)
+    vocabulary = make_vocabulary(args.vocabulary)
+    cdf = zipf_cdf(args.vocabulary, args.zipf)
+
+    # DocIDs follow the file numbers, so that corpora generated with other --first_file do not overlap.
+    files = [
+        (args.first_file + i, 1 + (args.first_file + i) * args.docs_per_file,
+         min(args.docs_per_file, args.docs - i * args.docs_per_file))
+        for i in range((args.docs + args.docs_per_file - 1) // args.docs_per_file)]
+    write_file = partial(generate_file, args=args, vocabulary=vocabulary, cdf=cdf)
+    if args.workers > 1:
+        with Pool(processes=args.workers) as pool:
+            paths = pool.starmap(write_file, files)
+    else:
+        paths = [write_file(*file) for file in files]
+    print(f"Generated {args.docs} documents in {len(paths)} files in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
+import math
 import pickle
 import random
 import re
 import time
 from pathlib import Path
-from typing import Any, List, Set
+from typing import Any, List, Set, Tuple
+
+import numpy as np
 
 DATASETS_FOLDER = Path(__file__).parent.parent / "datasets"
 PATTERN = re.compile(r"la[0-9]{6}.xml")
@@ -85,6 +88,76 @@ def read_pyobj_from_disk(filename: str) -> Any:
         return pickle.load(f)
 
 
+def parse_size(size: str) -> int:
+    """
+    Converts a human-readable amount of bytes like "512M" or "2GiB" to an amount of bytes.
+    Units are powers of 1024.
+    """
+    match = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]*)?)\s*([KMGT]?)(?:i?B)?\s*", size, flags=re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid size: '{size}'")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
+
+
+def append_varbyte(buffer: bytearray, number: int) -> None:
+    """
+    Appends a non-negative number to the buffer in variable-byte encoding:
+    7 bits per byte, the high bit is set if more bytes follow.
+    """
+    while number >= 0x80:
+        buffer.append((number & 0x7F) | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+
+def encode_varbytes(numbers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encodes non-negative numbers lower than 2^35 like 'append_varbyte', all at once.
+    Returns the bytes of all numbers, one after the other, and the number of bytes of each number.
+    """
+    numbers = np.asarray(numbers, dtype=np.uint64)
+    lengths = np.ones(len(numbers), dtype=np.int64)
+    for shift in (7, 14, 21, 28):
+        lengths += numbers >= (1 << shift)
+    starts = np.cumsum(lengths) - lengths
+    result = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for byte in range(int(lengths.max(initial=0))):
+        has_byte = lengths > byte
+        values = (numbers[has_byte] >> np.uint64(7 * byte)) & np.uint64(0x7F)
+        # The high bit is set if more bytes follow.
+        values |= (lengths[has_byte] > byte + 1).astype(np.uint64) << np.uint64(7)
+        result[starts[has_byte] + byte] = values
+    return result, lengths
+
+
+def read_varbyte(data, position: int) -> Tuple[int, int]:
+    """
+    Reads a number written by 'append_varbyte' at the given position of the data.
+    Returns the number and the position following it.
+    """
+    number = 0
+    shift = 0
+    byte = data[position]
+    while byte & 0x80:
+        number |= (byte & 0x7F) << shift
+        shift += 7
+        position += 1
+        byte = data[position]
+    return number | (byte << shift), position + 1
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Returns the p-th percentile (0 to 100) of the values, with the nearest-rank method.
+    """
+    if not values:
+        return float("nan")
+    sorted_values = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
 def fmt(num: int, suffix: str = 'B') -> str:
     """
     From https://stackoverflow.com/a/1094933
@@ -1,7 +1,14 @@
-from collections import defaultdict
-from typing import Dict, Iterable, List, Tuple
+import bisect
+import mmap
+import os
+import struct
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
 
-from utilities import read_pyobj_from_disk, write_pyobj_to_disk
+import numpy as np
+
+import instrumentation
+from utilities import append_varbyte, read_pyobj_from_disk, read_varbyte, write_pyobj_to_disk
 
 
 class VOCEntry:
@@ -11,12 +18,76 @@ class VOCEntry:
     Identifier = how to retrieve it (interpretation changes depending on the PL data structure).
     """
 
+    SCORES_BLOCK_SIZE = 64  # Number of consecutive PL entries sharing a maximal score in 'block_max_scores'.
+
     def __init__(self, pl_identifier: int, size_pl: int) -> None:
         self.pl_id = pl_identifier
         self.pl_size = size_pl
+        # Upper bounds of the scores in the PL, used to skip postings in top-k requests.
+        self.max_score: int = None
+        self.block_max_scores: List[int] = None
+        # DocID of the last entry of each block, so that skipping a block does not read the PL.
+        self.block_last_doc_ids: List[int] = None
+
+    def update_max_scores(self, doc_ids: Sequence[int], scores: Sequence[int]) -> None:
+        """
+        Sets the maximal scores of the whole PL and of each block of SCORES_BLOCK_SIZE entries,
+        and the last docID of each block.
+        """
+        blocks_starts = np.arange(0, len(scores), self.SCORES_BLOCK_SIZE)
+        self.block_max_scores = np.maximum.reduceat(np.asarray(scores), blocks_starts).tolist()
+        self.block_last_doc_ids = np.asarray(doc_ids)[
+            np.minimum(blocks_starts + self.SCORES_BLOCK_SIZE, len(doc_ids)) - 1].tolist()
+        self.max_score = max(self.block_max_scores, default=0)
+
+    @classmethod
+    def update_all_max_scores(cls, voc_entries: List["VOCEntry"], doc_ids: np.ndarray, scores: np.ndarray) -> None:
+        """
+        Same as 'update_max_scores' for each entry, 'doc_ids' and 'scores' being the concatenations of their PLs.
+        """
+        pl_sizes = np.array([voc_entry.pl_size for voc_entry in voc_entries], dtype=np.int64)
+        nb_blocks = (pl_sizes + cls.SCORES_BLOCK_SIZE - 1) // cls.SCORES_BLOCK_SIZE
+        first_blocks = np.cumsum(nb_blocks) - nb_blocks
+        pl_starts = np.cumsum(pl_sizes) - pl_sizes
+        # Start of each block: start of its PL, plus its number in the PL times the size of a block.
+        blocks_starts = np.repeat(pl_starts - first_blocks * cls.SCORES_BLOCK_SIZE, nb_blocks) + \
+            np.arange(nb_blocks.sum()) * cls.SCORES_BLOCK_SIZE
+        # End of each block: the start of the next one, or the end of its PL.
+        blocks_ends = np.minimum(blocks_starts + cls.SCORES_BLOCK_SIZE, np.repeat(pl_starts + pl_sizes, nb_blocks))
+        blocks_max_scores = np.maximum.reduceat(scores, blocks_starts).tolist() if len(scores) else []
+        blocks_last_doc_ids = doc_ids[blocks_ends - 1].tolist() if len(doc_ids) else []
+        for voc_entry, first_block, nb_pl_blocks in zip(voc_entries, first_blocks.tolist(), nb_blocks.tolist()):
+            voc_entry.block_max_scores = blocks_max_scores[first_block:first_block + nb_pl_blocks]
+            voc_entry.block_last_doc_ids = blocks_last_doc_ids[first_block:first_block + nb_pl_blocks]
+            voc_entry.max_score = max(voc_entry.block_max_scores, default=0)
+
+    def append_blocks(self, data: bytearray) -> None:
+        """
+        Appends the maximal score and the last docID of each block to the data, as pairs of variable-byte numbers.
+        The last docIDs are stored as gaps from the previous block.
+        """
+        previous_doc_id = 0
+        for block_max_score, block_last_doc_id in zip(self.block_max_scores or [], self.block_last_doc_ids or []):
+            append_varbyte(data, block_max_score)
+            append_varbyte(data, block_last_doc_id - previous_doc_id)
+            previous_doc_id = block_last_doc_id
+
+    def read_blocks(self, data: Sequence[int], position: int, end: int) -> None:
+        """
+        Sets the blocks of the entry from the pairs written by 'append_blocks' in data[position:end].
+        """
+        self.block_max_scores = []
+        self.block_last_doc_ids = []
+        block_last_doc_id = 0
+        while position < end:
+            block_max_score, position = read_varbyte(data, position)
+            doc_id_gap, position = read_varbyte(data, position)
+            block_last_doc_id += doc_id_gap
+            self.block_max_scores.append(block_max_score)
+            self.block_last_doc_ids.append(block_last_doc_id)
 
     def __str__(self) -> str:
-        return f"VOCEntry[pl_id={self.pl_id}, pl_size={self.pl_size}]"
+        return f"VOCEntry[pl_id={self.pl_id}, pl_size={self.pl_size}, max_score={self.max_score}]"
 
 
 class VOC:
@@ -45,9 +116,9 @@ class VOC:
     def __getitem__(self, term: str) -> VOCEntry:
         return self.get_pl_infos(term)
 
-    def increment_pl_size(self, term: str):
+    def increment_pl_size(self, term: str, increment: int = 1):
         """
-        Just increment by 1 the size of the PL of the given term.
+        Just increment by 1 (or by 'increment') the size of the PL of the given term.
         """
         raise NotImplementedError()
 
@@ -79,6 +150,12 @@ class VOC:
     def from_disk(cls, name: str) -> None:
         raise NotImplementedError()
 
+    def close(self) -> None:
+        """
+        Releases the file of a VOC read by 'from_disk'.
+        """
+        pass
+
 
 class VOC_Hashmap(VOC):
 
@@ -93,9 +170,9 @@ class VOC_Hashmap(VOC):
     def get_pl_infos(self, term: str) -> VOCEntry:
         return self.voc.get(term)
 
-    def increment_pl_size(self, term: str) -> None:
+    def increment_pl_size(self, term: str, increment: int = 1) -> None:
         voc_term = self.voc.get(term)
-        voc_term.pl_size += 1
+        voc_term.pl_size += increment
 
     def add_entry(self, term: str, pl_identifier: int, size: int = 1):
         voc_item = VOCEntry(pl_identifier=pl_identifier, size_pl=size)
@@ -119,6 +196,164 @@ class VOC_Hashmap(VOC):
         return newvoc
 
 
+class VOC_FrontCoded(VOC):
+    """
+    VOC saved as a sorted and front-coded term file, which is searched directly in a memory-mapped file.
+    On construction, it is built in memory like VOC_Hashmap. 'from_disk' only maps the file, so it is read-only.
+    File layout:
+      - header: MAGIC, number of terms, number of blocks;
+      - blocks of TERMS_PER_BLOCK terms. The first term of a block is stored entirely, the others only store
+        the length of the prefix they share with the previous term and the rest of their bytes.
+        Each term is followed by its VOCEntry (PL id, PL size, max score, size of its blocks,
+        max score and last docID of each block);
+      - offset of each block in the file, for a binary search over the first terms of the blocks.
+    All numbers are in variable-byte encoding, except the header and the blocks offsets.
+    """
+
+    MAGIC = b"VOF2"
+    TERMS_PER_BLOCK = 16
+    _HEADER = struct.Struct("<4sQQ")
+
+    def __init__(self) -> None:
+        super(VOC_FrontCoded, self).__init__()
+        # Associates a word with infos about the PL, until the VOC is saved.
+        self.voc: Dict[str, VOCEntry] = {}
+        self.mmap: mmap.mmap = None
+        self.blocks_offsets: np.ndarray = None
+
+    def has_term(self, term: str) -> bool:
+        return self.get_pl_infos(term) is not None
+
+    def get_pl_infos(self, term: str) -> VOCEntry:
+        if self.mmap is None:
+            return self.voc.get(term)
+
+        encoded_term = term.encode("utf-8")
+        # Binary search of the last block whose first term is not greater than the term.
+        low, high = 0, len(self.blocks_offsets)
+        while low < high:
+            middle = (low + high) // 2
+            if self._read_first_term(middle) <= encoded_term:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+
+        for block_term, voc_entry in self._read_block(low - 1):
+            if block_term == encoded_term:
+                return voc_entry
+            if block_term > encoded_term:
+                break
+        return None
+
+    def increment_pl_size(self, term: str, increment: int = 1) -> None:
+        self._check_writable()
+        self.voc[term].pl_size += increment
+
+    def add_entry(self, term: str, pl_identifier: int, size: int = 1):
+        self._check_writable()
+        self.voc[term] = VOCEntry(pl_identifier=pl_identifier, size_pl=size)
+
+    def iterate(self) -> Iterable[VOCEntry]:
+        for _, entry in self.iterate2():
+            yield entry
+
+    def iterate2(self) -> Iterable[Tuple[str, VOCEntry]]:
+        if self.mmap is None:
+            yield from self.voc.items()
+            return
+        for block in range(len(self.blocks_offsets)):
+            for block_term, voc_entry in self._read_block(block):
+                yield block_term.decode("utf-8"), voc_entry
+
+    def to_disk(self, name: str) -> None:
+        self._check_writable()
+        sorted_terms = sorted((term.encode("utf-8"), voc_entry) for term, voc_entry in self.voc.items())
+        blocks_offsets = []
+        data = bytearray()
+        previous_term = b""
+        for i, (term, voc_entry) in enumerate(sorted_terms):
+            if i % self.TERMS_PER_BLOCK == 0:
+                blocks_offsets.append(self._HEADER.size + len(data))
+                prefix_length = 0
+            else:
+                prefix_length = len(os.path.commonprefix([previous_term, term]))
+            append_varbyte(data, prefix_length)
+            append_varbyte(data, len(term) - prefix_length)
+            data += term[prefix_length:]
+            previous_term = term
+
+            append_varbyte(data, voc_entry.pl_id)
+            append_varbyte(data, voc_entry.pl_size)
+            append_varbyte(data, voc_entry.max_score or 0)
+            blocks_data = bytearray()
+            voc_entry.append_blocks(blocks_data)
+            append_varbyte(data, len(blocks_data))
+            data += blocks_data
+
+        with open(name, "wb") as f:
+            f.write(self._HEADER.pack(self.MAGIC, len(sorted_terms), len(blocks_offsets)))
+            f.write(data)
+            f.write(np.array(blocks_offsets, dtype="<u8").tobytes())
+
+    @classmethod
+    def from_disk(cls, name: str):
+        newvoc = VOC_FrontCoded()
+        newvoc.voc = None
+        newvoc.file = open(name, mode="rb")
+        newvoc.mmap = mmap.mmap(newvoc.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, nb_blocks = cls._HEADER.unpack_from(newvoc.mmap)
+        if magic != cls.MAGIC:
+            raise RuntimeError(f"'{name}' is not a front-coded VOC file")
+        blocks_offsets_size = nb_blocks * np.dtype("<u8").itemsize
+        newvoc.blocks_offsets = np.frombuffer(
+            newvoc.mmap, dtype="<u8", count=nb_blocks, offset=len(newvoc.mmap) - blocks_offsets_size)
+        return newvoc
+
+    def close(self) -> None:
+        if self.mmap is not None:
+            self.blocks_offsets = None  # A view of the mapped file.
+            self.mmap.close()
+            self.file.close()
+
+    def _check_writable(self) -> None:
+        if self.mmap is not None:
+            raise RuntimeError("read-only VOC")
+
+    def _read_first_term(self, block: int) -> bytes:
+        position = int(self.blocks_offsets[block])
+        _, position = read_varbyte(self.mmap, position)  # Prefix length is 0.
+        term_length, position = read_varbyte(self.mmap, position)
+        return self.mmap[position:position + term_length]
+
+    def _read_block(self, block: int) -> Iterable[Tuple[bytes, VOCEntry]]:
+        if instrumentation.ENABLED:
+            instrumentation.count("voc/blocks_read")
+        data = self.mmap
+        position = int(self.blocks_offsets[block])
+        if block + 1 < len(self.blocks_offsets):
+            end = int(self.blocks_offsets[block + 1])
+        else:
+            end = len(data) - len(self.blocks_offsets) * np.dtype("<u8").itemsize
+
+        term = b""
+        while position < end:
+            prefix_length, position = read_varbyte(data, position)
+            suffix_length, position = read_varbyte(data, position)
+            term = term[:prefix_length] + data[position:position + suffix_length]
+            position += suffix_length
+
+            pl_id, position = read_varbyte(data, position)
+            pl_size, position = read_varbyte(data, position)
+            voc_entry = VOCEntry(pl_identifier=pl_id, size_pl=pl_size)
+            voc_entry.max_score, position = read_varbyte(data, position)
+            blocks_size, position = read_varbyte(data, position)
+            voc_entry.read_blocks(data, position, position + blocks_size)
+            position += blocks_size
+            yield term, voc_entry
+
+
 # https://pythonhosted.org/BTrees/
 # https://btrees.readthedocs.io/en/latest/
 
@@ -126,143 +361,301 @@ class VOC_Hashmap(VOC):
 
 # https://pypi.org/project/bintrees/
 
-# https://www.tutorialspoint.com/python_data_structure/python_binary_tree.htm#:~:text=To%20insert%20into%20a%20tree,used%20to%20print%20the%20tree.
-
 class VOC_BTree(VOC):
+    """
+    VOC as a B+tree: terms are sorted in the leaves, which are chained, and internal nodes only guide the search.
+    All operations are iterative, so the tree stays balanced whatever the insertion order.
+    On construction, the tree is built in memory. 'to_disk' writes it as a file of PAGE_SIZE pages,
+    and 'from_disk' returns a read-only VOC which reads pages on demand through a small LRU cache.
+    File layout:
+      - page 0: header;
+      - leaf pages, in the order of their terms. A leaf entry is a term followed by its VOCEntry;
+      - internal pages, level by level up to the root. An internal page has one more child than keys,
+        each key is the first term of the following child;
+      - after the pages, the blocks (max score and last docID) of all VOCEntries, which could overflow a page.
+    Numbers and lengths in pages are in variable-byte encoding, except page numbers.
+    """
+
+    MAGIC = b"VOB2"
+    PAGE_SIZE = 4096
+    PAGE_CACHE_SIZE = 64  # Maximal number of decoded pages kept in memory in read-only mode.
+    MAX_KEYS = 64  # Maximal number of keys of an in-memory node.
+
+    # Magic, page size, root page, first leaf page, number of terms, offset of the blocks.
+    _HEADER = struct.Struct("<4sIIIQQ")
+    _LEAF_HEADER = struct.Struct("<BHi")  # Page type, number of entries, next leaf page (-1 for the last one).
+    _INTERNAL_HEADER = struct.Struct("<BH")  # Page type, number of keys.
+    _CHILD = struct.Struct("<I")  # Page number of a child.
+    _LEAF_TYPE = 1
+    _INTERNAL_TYPE = 2
 
     class Node:
-        # Adapted from:
-        # https://www.tutorialspoint.com/python_data_structure/python_binary_tree.htm#:~:text=To%20insert%20into%20a%20tree,used%20to%20print%20the%20tree
-
-        class NodeData:
-            def __init__(self, term: str, voc_entry: VOCEntry) -> None:
-                self.term = term
-                self.voc_entry = voc_entry
-
-            def __lt__(self, other):
-                if type(other) is VOC_BTree.Node.NodeData:
-                    other = self.term
-                return self.term < other
-
-            def __gt__(self, other):
-                if type(other) is VOC_BTree.Node.NodeData:
-                    other = self.term
-                return self.term > other
-
-            def __nonzero__(self) -> bool:
-                return bool(self.term)
-
-            def __str__(self) -> str:
-                return f"NodeData[term={self.term}, entry={self.voc_entry}]"
-
-        def __init__(self, term: str = None, voc_entry: VOCEntry = None):
-            self.left: VOC_BTree.Node = None
-            self.right: VOC_BTree.Node = None
-            if term is None and voc_entry is None:
-                self.data = None  # = self.__class__.NodeData(term, voc_entry)
-            else:
-                self.data = VOC_BTree.Node.NodeData(term, voc_entry)
+        """
+        In-memory node. Leaves have 'values' and 'next', internal nodes have 'children'.
+        """
 
-        def insert(self, term: str, voc_entry: VOCEntry):
-            """
-            Inserts an entry with the given term and VOC Entry.
-            """
-            if self.data:
-                if term < self.data:
-                    if self.left is None:
-                        self.left = VOC_BTree.Node(term, voc_entry)
-                    else:
-                        self.left.insert(term, voc_entry)
-                elif term > self.data:
-                    if self.right is None:
-                        self.right = VOC_BTree.Node(term, voc_entry)
-                    else:
-                        self.right.insert(term, voc_entry)
-            else:
-                self.data = VOC_BTree.Node.NodeData(term, voc_entry)
+        def __init__(self, is_leaf: bool) -> None:
+            self.is_leaf = is_leaf
+            self.keys: List[str] = []
+            self.values: List[VOCEntry] = []
+            self.children: List[VOC_BTree.Node] = []
+            self.next: VOC_BTree.Node = None
 
-        def findval(self, value: str) -> VOCEntry:
+        def split(self) -> Tuple[str, "VOC_BTree.Node"]:
             """
-            Returns the VOC Entry if found, else return None.
+            Moves the second half of the node to a new sibling.
+            Returns the key separating them in the parent, and the sibling.
             """
-            if not self.data or not value:
-                return None
-
-            if value < self.data:
-                if self.left is None:
-                    return None
-                return self.left.findval(value)
-            elif value > self.data:
-                if self.right is None:
-                    return None
-                return self.right.findval(value)
-            else:
-                return self.data.voc_entry
-
-        def in_order_traversal(self, root=None) -> List[Tuple[str, VOCEntry]]:
-            # Adapted from:
-            # https://www.tutorialspoint.com/python_data_structure/python_tree_traversal_algorithms.htm
-            root: VOC_BTree.Node = root
-            res = []
-            if root:
-                left = self.in_order_traversal(root.left)
-                right = self.in_order_traversal(root.right)
-                if root.data:
-                    data = (root.data.term, root.data.voc_entry)
-                    res = [*left, data, *right]
-                else:
-                    res = [*left, *right]  # Normally it still results in an empty list.
-            return res
-
-        def PrintTree(self):
-            if self.left:
-                self.left.PrintTree()
-            print(self.data),
-            if self.right:
-                self.right.PrintTree()
-
-    class Tree(Node):
-        def __init__(self):
-            super().__init__()
+            middle = len(self.keys) // 2
+            sibling = VOC_BTree.Node(self.is_leaf)
+            if self.is_leaf:
+                sibling.keys, self.keys = self.keys[middle:], self.keys[:middle]
+                sibling.values, self.values = self.values[middle:], self.values[:middle]
+                sibling.next, self.next = self.next, sibling
+                return sibling.keys[0], sibling
+            separator = self.keys[middle]
+            sibling.keys, self.keys = self.keys[middle + 1:], self.keys[:middle]
+            sibling.children, self.children = self.children[middle + 1:], self.children[:middle + 1]
+            return separator, sibling
 
     def __init__(self) -> None:
-        super(self.__class__, self).__init__()
-        self.tree = VOC_BTree.Tree()
+        super(VOC_BTree, self).__init__()
+        self.root = VOC_BTree.Node(is_leaf=True)
+        self.nb_terms = 0
+
+        # Read-only mode, see 'from_disk'.
+        self.file = None
+        self.header: Tuple = None
+        self.page_cache: OrderedDict = None
 
     def has_term(self, term: str) -> bool:
-        return bool(self.tree.findval(term))
+        return self.get_pl_infos(term) is not None
 
     def get_pl_infos(self, term: str) -> VOCEntry:
-        return self.tree.findval(term)
-
-    def increment_pl_size(self, term: str):
-        voc_entry = self.tree.findval(term)
+        if self.file is not None:
+            return self._find_in_pages(term)
+
+        node = self.root
+        while not node.is_leaf:
+            node = node.children[bisect.bisect_right(node.keys, term)]
+        i = bisect.bisect_left(node.keys, term)
+        if i < len(node.keys) and node.keys[i] == term:
+            return node.values[i]
+        return None
+
+    def increment_pl_size(self, term: str, increment: int = 1):
+        voc_entry = self.get_pl_infos(term)
         if voc_entry:
-            voc_entry.pl_size += 1
+            voc_entry.pl_size += increment
         else:
             raise KeyError(f"Term '{term}' not found")
 
     def add_entry(self, term: str, pl_identifier: int, size: int = 1):
+        if self.file is not None:
+            raise RuntimeError("read-only VOC")
         voc_entry = VOCEntry(pl_identifier=pl_identifier, size_pl=size)
-        self.tree.insert(term, voc_entry)
+
+        # Go down to the leaf, remembering the path to split the parents if needed.
+        path: List[Tuple[VOC_BTree.Node, int]] = []
+        node = self.root
+        while not node.is_leaf:
+            i = bisect.bisect_right(node.keys, term)
+            path.append((node, i))
+            node = node.children[i]
+
+        i = bisect.bisect_left(node.keys, term)
+        if i < len(node.keys) and node.keys[i] == term:
+            node.values[i] = voc_entry
+            return
+        node.keys.insert(i, term)
+        node.values.insert(i, voc_entry)
+        self.nb_terms += 1
+
+        while len(node.keys) > self.MAX_KEYS:
+            separator, sibling = node.split()
+            if path:
+                parent, i = path.pop()
+                parent.keys.insert(i, separator)
+                parent.children.insert(i + 1, sibling)
+                node = parent
+            else:
+                self.root = VOC_BTree.Node(is_leaf=False)
+                self.root.keys = [separator]
+                self.root.children = [node, sibling]
+                break
 
     def iterate(self) -> Iterable[VOCEntry]:
-        for term, voc_entry in self.tree.in_order_traversal(self.tree):
+        for _, voc_entry in self.iterate2():
             yield voc_entry
 
     def iterate2(self) -> Iterable[Tuple[str, VOCEntry]]:
-        for x in self.tree.in_order_traversal(self.tree):
-            yield x
+        """
+        Walks through the chain of leaves, so terms are sorted.
+        """
+        if self.file is not None:
+            page_no = self.header[3]
+            while page_no >= 0:
+                _, keys, entries, page_no = self._read_page(page_no)
+                for key, entry in zip(keys, entries):
+                    yield key.decode("utf-8"), self._make_voc_entry(entry)
+            return
+
+        node = self.root
+        while not node.is_leaf:
+            node = node.children[0]
+        while node:
+            yield from zip(node.keys, node.values)
+            node = node.next
 
     def to_disk(self, name: str):
-        return write_pyobj_to_disk(self.tree, name)
+        page_size = self.PAGE_SIZE
+        pages: List[bytes] = [b""]  # The header is written at the end.
+        blocks_data = bytearray()
+
+        # Leaves, filled as much as possible.
+        level: List[Tuple[bytes, int]] = []  # First key and page number of each page of the level.
+        page_keys: List[bytes] = []
+        page_data = bytearray()
+        for term, voc_entry in self.iterate2():
+            key = term.encode("utf-8")
+            entry_data = bytearray()
+            append_varbyte(entry_data, len(key))
+            entry_data += key
+            append_varbyte(entry_data, voc_entry.pl_id)
+            append_varbyte(entry_data, voc_entry.pl_size)
+            append_varbyte(entry_data, voc_entry.max_score or 0)
+            blocks_start = len(blocks_data)
+            voc_entry.append_blocks(blocks_data)
+            append_varbyte(entry_data, blocks_start)
+            append_varbyte(entry_data, len(blocks_data) - blocks_start)
+
+            if page_keys and self._LEAF_HEADER.size + len(page_data) + len(entry_data) > page_size:
+                level.append((page_keys[0], len(pages)))
+                pages.append(self._LEAF_HEADER.pack(self._LEAF_TYPE, len(page_keys), len(pages) + 1) + page_data)
+                page_keys, page_data = [], bytearray()
+            if self._LEAF_HEADER.size + len(entry_data) > page_size:
+                raise RuntimeError(f"term '{term}' does not fit in a page")
+            page_keys.append(key)
+            page_data += entry_data
+        level.append((page_keys[0] if page_keys else b"", len(pages)))
+        pages.append(self._LEAF_HEADER.pack(self._LEAF_TYPE, len(page_keys), -1) + page_data)
+        first_leaf_page = level[0][1]
+
+        # Internal levels, until there is only one page left: the root.
+        while len(level) > 1:
+            upper_level: List[Tuple[bytes, int]] = []
+            i = 0
+            while i < len(level):
+                first_key, first_child = level[i]
+                page_data = bytearray(self._CHILD.pack(first_child))
+                nb_keys = 0
+                i += 1
+                while i < len(level):
+                    key, child = level[i]
+                    child_data = bytearray()
+                    append_varbyte(child_data, len(key))
+                    child_data += key + self._CHILD.pack(child)
+                    if self._INTERNAL_HEADER.size + len(page_data) + len(child_data) > page_size:
+                        break
+                    page_data += child_data
+                    nb_keys += 1
+                    i += 1
+                upper_level.append((first_key, len(pages)))
+                pages.append(self._INTERNAL_HEADER.pack(self._INTERNAL_TYPE, nb_keys) + page_data)
+            level = upper_level
+        root_page = level[0][1]
+
+        pages[0] = self._HEADER.pack(
+            self.MAGIC, page_size, root_page, first_leaf_page, self.nb_terms, len(pages) * page_size)
+        with open(name, "wb") as f:
+            for page in pages:
+                f.write(page.ljust(page_size, b"\0"))
+            f.write(blocks_data)
 
     @classmethod
     def from_disk(cls, name: str):
         newvoc = VOC_BTree()
-        newvoc.tree = read_pyobj_from_disk(name)
+        newvoc.root = None
+        newvoc.file = open(name, mode="rb")
+        newvoc.header = cls._HEADER.unpack(newvoc.file.read(cls._HEADER.size))
+        magic, newvoc.PAGE_SIZE, _, _, newvoc.nb_terms, _ = newvoc.header
+        if magic != cls.MAGIC:
+            raise RuntimeError(f"'{name}' is not a B-tree VOC file")
+        newvoc.page_cache = OrderedDict()
         return newvoc
 
+    def close(self) -> None:
+        if self.file is not None:
+            self.page_cache.clear()
+            self.file.close()
+
+    def _read_page(self, page_no: int) -> Tuple:
+        """
+        Returns the decoded page, from the cache if possible:
+          - for a leaf: (True, keys, entries, next leaf page), entries being tuples of numbers;
+          - for an internal page: (False, keys, children).
+        """
+        page = self.page_cache.get(page_no)
+        if page is not None:
+            self.page_cache.move_to_end(page_no)
+            return page
+
+        if instrumentation.ENABLED:
+            instrumentation.count("voc/pages_read")
+        data = os.pread(self.file.fileno(), self.PAGE_SIZE, page_no * self.PAGE_SIZE)
+        keys: List[bytes] = []
+        if data[0] == self._LEAF_TYPE:
+            _, nb_entries, next_page = self._LEAF_HEADER.unpack_from(data)
+            position = self._LEAF_HEADER.size
+            entries = []
+            for _ in range(nb_entries):
+                key_length, position = read_varbyte(data, position)
+                keys.append(data[position:position + key_length])
+                position += key_length
+                entry = []
+                for _ in range(5):  # PL id, PL size, max score, offset and length of the blocks.
+                    number, position = read_varbyte(data, position)
+                    entry.append(number)
+                entries.append(tuple(entry))
+            page = (True, keys, entries, next_page)
+        else:
+            _, nb_keys = self._INTERNAL_HEADER.unpack_from(data)
+            position = self._INTERNAL_HEADER.size
+            children = [self._CHILD.unpack_from(data, position)[0]]
+            position += self._CHILD.size
+            for _ in range(nb_keys):
+                key_length, position = read_varbyte(data, position)
+                keys.append(data[position:position + key_length])
+                position += key_length
+                children.append(self._CHILD.unpack_from(data, position)[0])
+                position += self._CHILD.size
+            page = (False, keys, children)
+
+        self.page_cache[page_no] = page
+        if len(self.page_cache) > self.PAGE_CACHE_SIZE:
+            self.page_cache.popitem(last=False)
+        return page
+
+    def _find_in_pages(self, term: str) -> VOCEntry:
+        key = term.encode("utf-8")
+        page = self._read_page(self.header[2])
+        while not page[0]:
+            _, keys, children = page
+            page = self._read_page(children[bisect.bisect_right(keys, key)])
+        _, keys, entries, _ = page
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return self._make_voc_entry(entries[i])
+        return None
+
+    def _make_voc_entry(self, entry: Tuple[int, ...]) -> VOCEntry:
+        pl_id, pl_size, max_score, blocks_offset, blocks_length = entry
+        voc_entry = VOCEntry(pl_identifier=pl_id, size_pl=pl_size)
+        voc_entry.max_score = max_score
+        data = os.pread(self.file.fileno(), blocks_length, self.header[5] + blocks_offset)
+        voc_entry.read_blocks(data, 0, blocks_length)
+        return voc_entry
+
 
 if __name__ == "__main__":
     vocb = VOC_BTree()
@@ -279,16 +672,12 @@ if __name__ == "__main__":
         print(f"Term {term} is in voc btree: {vocb.has_term(term)}")
 
     print("iterate2")
-    print([item for item in vocb.iterate2()])
-
-    print()
-    print("PrintTree")
-    vocb.tree.PrintTree()
+    print([(term, str(voc_entry)) for term, voc_entry in vocb.iterate2()])
 
     from pathlib import Path
     temp_file_path = Path("voctest.bin")
     vocb.to_disk(temp_file_path)
     vocb2 = VOC_BTree.from_disk(temp_file_path)
-    print("PrintTree 2")
-    vocb2.tree.PrintTree()
+    print("iterate2 from disk")
+    print([(term, str(voc_entry)) for term, voc_entry in vocb2.iterate2()])
     temp_file_path.unlink(True)
@@ -0,0 +1,19 @@
+"""
+Small corpus files for the tests, in the format of the LA Times files.
+"""
+
+from pathlib import Path
+from typing import Dict
+
+
+def write_corpus_file(path: Path, texts: Dict[int, str]) -> str:
+    """
+    Writes a file with one document for each docID and text. Returns its path.
+    """
+    parts = ["<customroot>"]
+    for doc_id, text in texts.items():
+        parts.append(f"<DOC>\n<DOCNO> LA000000-{doc_id:04d} </DOCNO>\n<DOCID> {doc_id} </DOCID>\n")
+        parts.append(f"<HEADLINE>\n<P>\nheadline\n</P>\n</HEADLINE>\n<TEXT>\n<P>\n{text}\n</P>\n</TEXT>\n</DOC>\n")
+    parts.append("</customroot>")
+    path.write_text("".join(parts))
+    return str(path)
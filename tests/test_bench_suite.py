@@ -0,0 +1,42 @@
+"""
+The benchmark suite reports a slowed down request measure as a regression, although each request is short.
+"""
+
+import json
+import sys
+import time
+from argparse import Namespace
+from pathlib import Path
+
+from corpus import write_corpus_file
+from inverted_file import InvertedFile
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+import bench_suite  # noqa: E402
+
+
+def test_slow_requests_are_regressions(tmp_path, monkeypatch):
+    monkeypatch.setattr(bench_suite, "VOC_TYPES", ["VOC_Hashmap"])
+    monkeypatch.setattr(bench_suite, "PL_FORMATS", ["raw"])
+    texts = {doc_id: " ".join(f"w{(doc_id * word) % 31}" for word in range(1, 10)) for doc_id in range(100)}
+    files = [write_corpus_file(tmp_path / "la000000.xml", texts)]
+    args = Namespace(repeat=3, warmup=0, seed=0)
+    bench_suite.bench_build_and_save(args, files, tmp_path)
+
+    baseline_file = tmp_path / "baseline.json"
+    baseline_file.write_text(json.dumps({"results": bench_suite.bench_load_and_requests(args, tmp_path)}))
+
+    request_words_conjonctive = InvertedFile.request_words_conjonctive
+
+    def slow_request_words_conjonctive(self, words, k=None):
+        time.sleep(0.005)
+        return request_words_conjonctive(self, words, k)
+
+    monkeypatch.setattr(InvertedFile, "request_words_conjonctive", slow_request_words_conjonctive)
+    results = bench_suite.bench_load_and_requests(args, tmp_path)
+    # Each request is shorter than 'min_duration', but all the runs of a measure are not.
+    assert all(1 / result["per_second"] < 0.1 for result in results if result["name"].startswith("request/"))
+    regressions = bench_suite.compare_to_baseline(results, str(baseline_file), tolerance=0.25, min_duration=0.1)
+    assert sorted(regressions) == [f"request/VOC_Hashmap/raw/{frequency_class}/and"
+                                   for frequency_class in sorted(bench_suite.FREQUENCY_CLASSES)]
@@ -0,0 +1,40 @@
+"""
+A build with several workers gives the same PLs as a serial build, in memory and with SPIMI.
+"""
+
+import numpy as np
+import pytest
+
+from corpus import write_corpus_file
+from inverted_file import InvertedFile
+from main import build_if
+from pl import PL_Arrays
+from voc import VOC_Hashmap
+
+
+@pytest.mark.parametrize("max_memory", [0, 1024])
+def test_parallel_build(tmp_path, max_memory):
+    files = []
+    for file_index in range(4):
+        texts = {doc_id: " ".join(f"w{(doc_id * word) % 23}" for word in range(1, 12))
+                 for doc_id in range(file_index * 50, (file_index + 1) * 50)}
+        files.append(write_corpus_file(tmp_path / f"la{file_index:06d}.xml", texts))
+
+    inverted_files = []
+    for workers in (1, 2):
+        inverted_file = build_if(VOC_Hashmap(), None if max_memory else PL_Arrays(), 0, False, files=files,
+                                 workers=workers, max_memory=max_memory)
+        index_files = [str(tmp_path / f"workers_{workers}.{suffix}") for suffix in ("voc", "pl", "reg")]
+        inverted_file.write_to_files(*index_files)
+        inverted_files.append(InvertedFile.read_from_files(*index_files, voc_type=VOC_Hashmap))
+
+    serial, parallel = inverted_files
+    assert [doc.id for doc in serial.register.iterate()] == [doc.id for doc in parallel.register.iterate()]
+    assert sorted(term for term, _ in serial.voc.iterate2()) == sorted(term for term, _ in parallel.voc.iterate2())
+    for term, voc_entry in serial.voc.iterate2():
+        parallel_voc_entry = parallel.voc[term]
+        assert parallel_voc_entry.pl_size == voc_entry.pl_size
+        for serial_array, parallel_array in zip(
+                serial.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size),
+                parallel.pl.get_pl_array(parallel_voc_entry.pl_id, parallel_voc_entry.pl_size)):
+            assert np.array_equal(serial_array, parallel_array)
@@ -0,0 +1,71 @@
+"""
+The query server keeps answering while the index is rebuilt in its files, then uses the new index.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from corpus import write_corpus_file
+from inverted_file import InvertedFile
+from main import build_if
+from pl import PL_Arrays
+from query_cache import QueryCache
+from query_server import QueryClient, QueryServer
+from voc import VOC_FrontCoded
+
+
+def build_index(folder: Path, texts: Dict[int, str]) -> None:
+    """
+    Other documents are added, as a term of all documents would have a negative score.
+    """
+    texts = {**{doc_id: "otter" for doc_id in range(30)}, **texts}
+    files = [write_corpus_file(folder / "la000000.xml", texts)]
+    inverted_file = build_if(VOC_FrontCoded(), PL_Arrays(), 0, False, files=files)
+    inverted_file.write_to_files(
+        str(folder / "index.voc"), str(folder / "index.pl"), str(folder / "index.reg"), pl_format="compressed")
+
+
+def open_index(folder: Path) -> InvertedFile:
+    return InvertedFile.read_from_files(
+        str(folder / "index.voc"), str(folder / "index.pl"), str(folder / "index.reg"), voc_type=VOC_FrontCoded)
+
+
+def result_ids(response: Dict) -> List[int]:
+    return sorted(result["id"] for result in response["results"])
+
+
+def test_rebuild_while_serving(tmp_path):
+    build_index(tmp_path, {doc_id: "zebra" for doc_id in range(10)})
+    server = QueryServer(open_index(tmp_path), QueryCache(max_entries=16), reopen=lambda: open_index(tmp_path))
+    unix_path = str(tmp_path / "server.sock")
+
+    async def run() -> None:
+        serving = asyncio.ensure_future(server.serve(None, 0, unix_path))
+        while not Path(unix_path).exists():
+            await asyncio.sleep(0.01)
+        client = await QueryClient.connect(None, 0, unix_path)
+        try:
+            assert result_ids(await client.request("zebra")) == list(range(10))
+            assert result_ids(await client.request("quokka")) == []
+
+            previous_inverted_file = server.inverted_file
+            voc_entry = previous_inverted_file.voc["zebra"]
+            doc_ids, scores = previous_inverted_file.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size)
+            build_index(tmp_path, {doc_id: "quokka" for doc_id in range(10, 15)})
+            # The files mapped by the server are not overwritten.
+            new_doc_ids, new_scores = previous_inverted_file.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size)
+            assert np.array_equal(doc_ids, new_doc_ids) and np.array_equal(scores, new_scores)
+
+            # The cached results of the previous index are not used.
+            assert result_ids(await client.request("quokka")) == list(range(10, 15))
+            assert result_ids(await client.request("zebra")) == []
+            assert server.inverted_file is not previous_inverted_file
+        finally:
+            await client.close()
+            serving.cancel()
+
+    asyncio.run(run())
+    assert not list(tmp_path.glob(f"*{InvertedFile.TEMPORARY_FILE_SUFFIX}"))
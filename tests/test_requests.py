@@ -0,0 +1,48 @@
+"""
+Requests on a small in-memory IF.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from corpus import write_corpus_file
+from inverted_file import InvertedFile
+from main import build_if
+from pl import PL_Arrays
+from voc import VOC_Hashmap
+
+
+@pytest.fixture(scope="module")
+def inverted_file(tmp_path_factory) -> InvertedFile:
+    folder: Path = tmp_path_factory.mktemp("corpus")
+    texts = {doc_id: "zebra" if doc_id % 2 == 0 else "otter" for doc_id in range(20)}
+    texts.update({20: "zebra quokka", 21: "quokka"})
+    return build_if(VOC_Hashmap(), PL_Arrays(), 0, False, files=[write_corpus_file(folder / "la000000.xml", texts)])
+
+
+def result_ids(results) -> list:
+    return sorted(req_res.doc.id for req_res in results)
+
+
+def test_conjonctive_ignores_stop_words(inverted_file):
+    assert result_ids(inverted_file.request_words_conjonctive(["the", "zebra", "quokka"])) == [20]
+    assert result_ids(inverted_file.request_words_conjonctive(["the"])) == []
+
+
+@pytest.fixture(scope="module")
+def porter_inverted_file(tmp_path_factory) -> InvertedFile:
+    folder: Path = tmp_path_factory.mktemp("corpus")
+    texts = {doc_id: "otter" for doc_id in range(20)}
+    texts.update({20: "they agreed terms", 21: "terms agreed", 22: "the ones running"})
+    return build_if(
+        VOC_Hashmap(), PL_Arrays(), 0, False, files=[write_corpus_file(folder / "la000000.xml", texts)],
+        with_positions=True, normalizer="porter")
+
+
+def test_phrase_with_stemming(porter_inverted_file):
+    # "agreed" is stemmed to "agre", which would be stemmed again to "agr".
+    assert result_ids(porter_inverted_file.request_words_phrase(["agreed"])) == [20, 21]
+    assert result_ids(porter_inverted_file.request_words_phrase(["agreed", "terms"])) == [20]
+    # "ones" is stemmed to "on", which is a stop word.
+    assert result_ids(porter_inverted_file.request_words_phrase(["ones", "running"])) == [22]
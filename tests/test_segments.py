@@ -0,0 +1,28 @@
+"""
+Requests on a segmented index, before and after merging its segments.
+"""
+
+from corpus import write_corpus_file
+from segments import SegmentedIndex
+from voc import VOC_FrontCoded
+
+
+def result_ids(results) -> list:
+    return sorted(req_res.doc.id for req_res in results)
+
+
+def test_merge_closes_segments(tmp_path):
+    index = SegmentedIndex(str(tmp_path / "index"), voc_type=VOC_FrontCoded)
+    for file_number in range(3):
+        texts = {doc_id: "zebra" if doc_id % 3 == file_number else "otter" for doc_id in range(10)}
+        texts = {file_number * 10 + doc_id: text for doc_id, text in texts.items()}
+        index.add_segment([write_corpus_file(tmp_path / f"la00000{file_number}.xml", texts)])
+    results = result_ids(index.request_words_conjonctive(["the", "zebra"]))
+    assert results == [0, 3, 6, 9, 11, 14, 17, 22, 25, 28]
+
+    segments = list(index.segments)
+    assert index.merge(merge_all=True) == 1
+    for segment in segments:
+        assert segment.voc.mmap.closed and segment.register.mmap.closed
+    assert len(list((tmp_path / "index").glob("segment_*"))) == 4  # VOC, PL, register and generation files.
+    assert result_ids(index.request_words_conjonctive(["the", "zebra"])) == results
@@ -0,0 +1,46 @@
+"""
+A SPIMI build gives the same PLs as an in-memory build, whatever the number of runs merged at once.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from corpus import write_corpus_file
+from inverted_file import InvertedFile
+from main import build_if
+from pl import PL_Arrays
+from spimi import SPIMIInvertedFile
+from voc import VOC_Hashmap
+
+
+def index_files(folder: Path, name: str):
+    return str(folder / f"{name}.voc"), str(folder / f"{name}.pl"), str(folder / f"{name}.reg")
+
+
+@pytest.mark.parametrize("merge_fan_in, runs_per_tier", [(2, 1000), (3, 2), (64, 8)])
+def test_bounded_merge(tmp_path, monkeypatch, merge_fan_in, runs_per_tier):
+    monkeypatch.setattr(SPIMIInvertedFile, "MERGE_FAN_IN", merge_fan_in)
+    monkeypatch.setattr(SPIMIInvertedFile, "RUNS_PER_TIER", runs_per_tier)
+    texts = {doc_id: " ".join(f"w{(doc_id * word) % 37}" for word in range(1, 20)) for doc_id in range(300)}
+    files = [write_corpus_file(tmp_path / "la000000.xml", texts)]
+
+    build_if(VOC_Hashmap(), PL_Arrays(), 0, False, files=files).write_to_files(*index_files(tmp_path, "memory"))
+    # A budget of a few postings: many runs are written, then compacted.
+    spimi_inverted_file = build_if(VOC_Hashmap(), None, 0, False, files=files, max_memory=1024)
+    tiers = [tier for _, tier in spimi_inverted_file.runs]
+    assert spimi_inverted_file.nb_run_files > merge_fan_in
+    assert all(tiers.count(tier) < runs_per_tier for tier in tiers)
+    spimi_inverted_file.write_to_files(*index_files(tmp_path, "spimi"))
+
+    memory = InvertedFile.read_from_files(*index_files(tmp_path, "memory"), voc_type=VOC_Hashmap)
+    spimi = InvertedFile.read_from_files(*index_files(tmp_path, "spimi"), voc_type=VOC_Hashmap)
+    assert sorted(term for term, _ in memory.voc.iterate2()) == sorted(term for term, _ in spimi.voc.iterate2())
+    for term, voc_entry in memory.voc.iterate2():
+        spimi_voc_entry = spimi.voc[term]
+        for memory_array, spimi_array in zip(
+                memory.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size),
+                spimi.pl.get_pl_array(spimi_voc_entry.pl_id, spimi_voc_entry.pl_size)):
+            assert np.array_equal(memory_array, spimi_array)
+        assert spimi_voc_entry.block_max_scores == voc_entry.block_max_scores
@@ -0,0 +1,85 @@
+"""
+Top-k "OR" requests (Block-Max WAND) must give the same results as scoring all postings, while scoring fewer.
+"""
+
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import instrumentation
+import voc
+from corpus import write_corpus_file
+from inverted_file import InvertedFile
+from main import build_if
+from pl import PL_Arrays
+from voc import VOC_Hashmap, VOCEntry
+
+NB_DOCS = 2000
+
+
+def write_corpus(folder: Path) -> List[str]:
+    """
+    "zebra" is in half of the documents with a low score, "quokka" is in a few ones with a high score.
+    """
+    texts = {}
+    for doc_id in range(NB_DOCS):
+        words = ["zebra"] * (doc_id % 3 + 1) if doc_id % 2 == 0 else ["otter"]
+        if doc_id % 97 == 0:
+            words += ["quokka"] * (doc_id % 5 + 1)
+        texts[doc_id] = " ".join(words)
+    return [write_corpus_file(folder / "la000000.xml", texts)]
+
+
+@pytest.fixture(scope="module")
+def index_folder(tmp_path_factory) -> Path:
+    folder = tmp_path_factory.mktemp("index")
+    files = write_corpus(folder)
+    for voc_type in (VOC_Hashmap, voc.VOC_FrontCoded, voc.VOC_BTree):
+        for pl_format in ("raw", "compressed"):
+            inverted_file = build_if(voc_type(), PL_Arrays(), 0, False, files=files)
+            name = str(folder / f"{voc_type.__name__}.{pl_format}")
+            inverted_file.write_to_files(f"{name}.voc", f"{name}.pl", f"{name}.reg", pl_format=pl_format)
+    return folder
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    monkeypatch.setattr(instrumentation, "ENABLED", True)
+    instrumentation.reset()
+    yield instrumentation._counters
+    instrumentation.reset()
+
+
+def read_index(folder: Path, voc_type_name: str, pl_format: str) -> InvertedFile:
+    name = str(folder / f"{voc_type_name}.{pl_format}")
+    return InvertedFile.read_from_files(
+        f"{name}.voc", f"{name}.pl", f"{name}.reg", voc_type=getattr(voc, voc_type_name))
+
+
+@pytest.mark.parametrize("pl_format", ["raw", "compressed"])
+@pytest.mark.parametrize("voc_type_name", ["VOC_Hashmap", "VOC_FrontCoded", "VOC_BTree"])
+def test_block_last_doc_ids(index_folder, voc_type_name, pl_format):
+    inverted_file = read_index(index_folder, voc_type_name, pl_format)
+    for term in ("zebra", "otter", "quokka"):
+        voc_entry = inverted_file.voc[term]
+        doc_ids, _ = inverted_file.pl.get_pl_array(voc_entry.pl_id, voc_entry.pl_size)
+        blocks_ends = list(range(VOCEntry.SCORES_BLOCK_SIZE, voc_entry.pl_size, VOCEntry.SCORES_BLOCK_SIZE))
+        assert voc_entry.block_last_doc_ids == [doc_ids[end - 1] for end in blocks_ends] + [doc_ids[-1]]
+
+
+@pytest.mark.parametrize("pl_format", ["raw", "compressed"])
+@pytest.mark.parametrize("voc_type_name", ["VOC_Hashmap", "VOC_FrontCoded", "VOC_BTree"])
+def test_top_k_skips_postings(index_folder, counters, voc_type_name, pl_format):
+    inverted_file = read_index(index_folder, voc_type_name, pl_format)
+    words = ["zebra", "quokka"]
+    all_results = inverted_file.request_words_disjonctive(words)
+    all_results.sort(key=lambda req_res: (-req_res.score, req_res.doc.id))
+
+    for k in (1, 10):
+        instrumentation.reset()
+        results = inverted_file.request_words_disjonctive(words, k=k)
+        assert [(req_res.doc.id, req_res.score) for req_res in results] == \
+            [(req_res.doc.id, req_res.score) for req_res in all_results[:k]]
+        pls_total = sum(inverted_file.voc[word].pl_size for word in words)
+        assert 0 < counters["request/or/top_k/postings_scored"] < pls_total